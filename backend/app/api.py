@@ -8,6 +8,7 @@ from app.controllers import (
     user_router,
     admin_router,
     filter_router,
+    metrics_router,
 )
 
 api_router = APIRouter()
@@ -19,5 +20,6 @@ api_router.include_router(prediction_router)
 api_router.include_router(user_router)
 api_router.include_router(admin_router)
 api_router.include_router(filter_router)
+api_router.include_router(metrics_router)
 
 __all__ = ["api_router"]
@@ -14,16 +14,50 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite:///data/app.db"
+    DB_POOL_SIZE: int = 20  # Per worker process (covers the 40-thread request pool in bursts with overflow)
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_SINGLE_WRITER: bool = False  # Route hot-path inserts through one group-committing writer thread
+    DB_WRITER_MAX_BATCH: int = 256  # Writes folded into one COMMIT
+    DB_MIGRATION_LOCK_TIMEOUT_SECONDS: float = 300.0  # Workers wait this long for the one running migrations
+    USAGE_LOG_BUFFER_ENABLED: bool = True  # Write-behind usage_logs (no DB write on the predict path)
+    USAGE_LOG_FLUSH_INTERVAL_SECONDS: float = 1.0
+    USAGE_LOG_FLUSH_BATCH: int = 500  # Rows per executemany INSERT; a full batch flushes early
+    USAGE_LOG_MAX_BUFFERED: int = 50000  # Beyond this (DB stalled) the backlog goes straight to disk
+    USAGE_LOG_SPILL_PATH: str = "data/usage_spill.jsonl"  # Per worker: usage_spill.<pid>.jsonl
+
+    # SQLite profile (applied on every connection)
+    SQLITE_JOURNAL_MODE: str = "WAL"  # Readers never block the writer; "" keeps the file's mode
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # In WAL: fsync at checkpoints only, still crash-safe
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KB: int = 32768
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_TEMP_STORE: str = "MEMORY"
     
     # JWT
     JWT_SECRET_KEY: str = "your-secret-key-change-in-production"
     JWT_ALGORITHM: str = "HS256"
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    AUTH_TOKEN_CACHE_SIZE: int = 10000  # Verified tokens kept per worker
+    AUTH_REVOCATION_REFRESH_SECONDS: float = 30.0  # Reload of disabled users (is_active = 0)
+    ADMIN_PRINCIPAL_CACHE_TTL_SECONDS: float = 15.0  # Max delay for promotions/bans on other workers
+    ADMIN_STATS_CACHE_SOFT_TTL_SECONDS: float = 30.0  # Older dashboard snapshots are served and refreshed in background
+    ADMIN_STATS_CACHE_HARD_TTL_SECONDS: float = 600.0  # Older ones are recomputed in the request
+
+    # Password hashing (bcrypt in a dedicated pool)
+    PASSWORD_BCRYPT_ROUNDS: int = 0  # 0 = calibrate to PASSWORD_HASH_TARGET_MS at startup (12-16)
+    PASSWORD_HASH_TARGET_MS: float = 250.0
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 16  # Running + queued; beyond this sign-ins get 503
+    PASSWORD_HASH_USE_PROCESSES: bool = False  # Process pool instead of threads
     
     # Google OAuth
     GOOGLE_CLIENT_ID: str = ""
     GOOGLE_CLIENT_SECRET: str = ""
     GOOGLE_REDIRECT_URI: str = "http://localhost:8000/api/auth/google/callback"
+    GOOGLE_TOKEN_URL: str = "https://oauth2.googleapis.com/token"
+    GOOGLE_USERINFO_URL: str = "https://www.googleapis.com/oauth2/v2/userinfo"
+    GOOGLE_HTTP_TIMEOUT: float = 10.0
     
     # MoMo Payment
     MOMO_PARTNER_CODE: str = "MOMO"
@@ -32,12 +66,31 @@ class Settings(BaseSettings):
     MOMO_ENDPOINT: str = "https://test-payment.momo.vn/v2/gateway/api/create"
     MOMO_REDIRECT_URL: str = "http://localhost:8000/api/payment/success"
     MOMO_IPN_URL: str = "http://localhost:8000/api/payment/momo/ipn"
+    MOMO_HTTP_TIMEOUT: float = 30.0
+
+    # Outbound HTTP (shared pooled clients for Google/MoMo)
+    HTTP_CLIENT_HTTP2: bool = True  # Needs httpx[http2]
+    HTTP_CLIENT_CONNECT_TIMEOUT: float = 5.0
+    HTTP_CLIENT_POOL_TIMEOUT: float = 5.0  # Wait for a free pooled connection
+    HTTP_CLIENT_MAX_CONNECTIONS: int = 50
+    HTTP_CLIENT_MAX_KEEPALIVE: int = 20
+    HTTP_CLIENT_KEEPALIVE_EXPIRY: float = 60.0
+    HTTP_CLIENT_RETRIES: int = 2
+    HTTP_CLIENT_BACKOFF_BASE: float = 0.2  # Seconds; full jitter, doubled per attempt
     
     # ML Model
     MODEL_PATH: str = "mobilenetv2_dangerous_objects.pth"
     MODEL_IMG_SIZE: int = 224
+    MODEL_VERSION: str = ""  # Recorded on prediction events; "" = sha256 prefix of the weights file
 
     MODEL_CLASSES: list = ["Máu me", "Vũ khí", "Chiến tranh", "Nhạy cảm"]
+    # Model class -> extension filter category (frontend detection.service.ts CLASS_MAPPING)
+    MODEL_CLASS_CATEGORIES: dict = {
+        "Máu me": "violence",
+        "Vũ khí": "toxicity",
+        "Chiến tranh": "vice",
+        "Nhạy cảm": "sensitive",
+    }
     
     # Subscription Plans
     PLAN_FREE_MONTHLY_QUOTA: int = 100
@@ -47,6 +100,49 @@ class Settings(BaseSettings):
     PLAN_PLUS_PRICE: int = 99000  # VND
     PLAN_PRO_PRICE: int = 299000  # VND
     
+    # Quota reservation strategy: "ledger" (single node), "lease" (multi-node, opt-in) or "direct"
+    QUOTA_STRATEGY: str = "ledger"
+
+    # Quota leases: blocks checked out from the DB per node
+    QUOTA_LEASE_TARGET_SECONDS: float = 10.0  # Lease size = request rate * this
+    QUOTA_LEASE_MIN_UNITS: int = 0  # 0 = idle users reserve straight from the DB
+    QUOTA_LEASE_MAX_UNITS: int = 200
+    QUOTA_LEASE_TTL_SECONDS: float = 30.0  # Unused leases are returned after this idle time
+
+    # Active-subscription cache (per worker)
+    SUBSCRIPTION_CACHE_TTL_SECONDS: float = 30.0  # Max staleness across workers
+    SUBSCRIPTION_CACHE_MAX_ENTRIES: int = 10000
+
+    # Quota write-behind ledger (per worker)
+    QUOTA_LEDGER_FLUSH_INTERVAL_MS: int = 500
+    QUOTA_LEDGER_MAX_PENDING: int = 100  # Unflushed units per subscription per worker
+    QUOTA_LEDGER_SAFETY_MARGIN: int = 1000  # Below this remaining quota, reserve directly in DB
+    QUOTA_CYCLE_REFRESH_SECONDS: float = 30.0  # How soon other workers see the monthly reset
+    
+    # Rate limiting (limits per route/plan: app/middleware/rate_limit.py)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" (per worker) or "sqlite" (shared by workers on the host)
+    RATE_LIMIT_SQLITE_PATH: str = "data/ratelimit.db"
+    RATE_LIMIT_TRUST_FORWARDED: bool = False  # Use X-Forwarded-For (only behind a trusted proxy)
+
+    # Background jobs (one worker at a time, via the job_locks table)
+    JOBS_ENABLED: bool = True
+    JOB_EXPIRE_INTERVAL_SECONDS: float = 60.0
+    JOB_QUOTA_RESET_INTERVAL_SECONDS: float = 300.0
+    JOB_USAGE_ROLLUP_INTERVAL_SECONDS: float = 60.0  # Catch-up only; buffered logs are rolled up on flush
+    JOB_LOCK_TTL_SECONDS: float = 600.0  # Longest expected run; lock holder failover delay
+    JOB_BATCH_SIZE: int = 1000  # Rows per bulk statement/transaction
+
+    # Admin analytics sketches (updated by the usage rollup)
+    ANALYTICS_HLL_PRECISION: int = 12  # 2^p registers per day; ~1.04/sqrt(2^p) error on DAU/WAU/MAU
+    ANALYTICS_LATENCY_ACCURACY: float = 0.01  # DDSketch relative error on latency quantiles
+
+    # Monitoring
+    METRICS_MULTIPROC_DIR: str = "data/metrics"  # Shared by workers when run.py --workers > 1
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_MS: int = 50
+    LOOP_LAG_THRESHOLD_MS: int = 100  # Capture the loop stack when blocked longer than this
+    
     class Config:
         env_file = BACKEND_ROOT / ".env"
         env_file_encoding = "utf-8"
@@ -4,6 +4,7 @@ from app.controllers.subscription_controller import router as subscription_route
 from app.controllers.prediction_controller import router as prediction_router
 from app.controllers.user_controller import router as user_router
 from app.controllers.filter_controller import router as filter_router
+from app.controllers.metrics_controller import router as metrics_router
 
 from app.controllers.admin_controller import router as admin_router
 
@@ -15,5 +16,6 @@ __all__ = [
     "user_router",
     "admin_router",
     "filter_router",
+    "metrics_router",
 ]
 
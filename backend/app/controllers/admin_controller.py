@@ -1,19 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import datetime
+import os
 
-from app.database import get_db
+from app.database import SessionLocal, get_db
 from app.services.admin_service import AdminService
+from app.services.admin_stats_cache import admin_stats_cache
 from app.schemas.admin import (
-    OverviewStats, UsageStats, AccuracyStats, TopCategory, 
+    OverviewStats, EndpointLatency, UsageStats, AccuracyStats, TopCategory, 
     Activity, Report, ReportAction,
     AdminUserList, AdminUserUpdate, SystemSettingItem, SystemSettingsUpdate
 )
-# Assuming there is a get_current_user dependency, likely in app.controllers.auth_controller or app.middleware
-# Based on user_controller.py check, I will find out where it is.
-# For now I will assume it's available or I'll check user_controller first.
-from app.controllers.auth_controller import get_current_user
-from app.models.user import User
+from app.middleware.auth_middleware import get_current_user_id
+from app.repositories.user_repository import UserRepository
+from app.services.principal_cache import Principal, principal_cache
+from app.monitoring import profiling
+from app.monitoring.loop_monitor import loop_monitor
 
 router = APIRouter(
     prefix="/admin",
@@ -21,32 +24,68 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-# Admin dependency (simple check for now, can be expanded)
-def get_current_admin(current_user: User = Depends(get_current_user)):
-    if not current_user.is_admin:
+# Admin dependency: authorizes from the principal cache, the DB is read only on a miss
+def get_current_admin(
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+) -> Principal:
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        flags = UserRepository(db).get_principal(user_id)
+        if flags is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        principal = Principal(user_id, *flags)
+        principal_cache.put(principal)
+    if not principal.is_active:
+        raise HTTPException(status_code=403, detail="Account is disabled")
+    if not principal.is_admin:
         raise HTTPException(status_code=403, detail="Admin privileges required")
-    return current_user
+    return principal
+
+def _cached_stats(response: Response, key: tuple, compute):
+    """
+    Dashboard result from admin_stats_cache (stale-while-revalidate), Age header = snapshot age.
+    ``compute`` gets its own session: it may run in the background after this request ends.
+    """
+    def run():
+        db = SessionLocal()
+        try:
+            return compute(db)
+        finally:
+            db.close()
+
+    value, age = admin_stats_cache.get(key, run)
+    response.headers["Age"] = str(int(age))
+    return value
 
 @router.get("/stats/overview", response_model=OverviewStats)
 def get_overview_stats(
+    response: Response,
+    current_user: Principal = Depends(get_current_admin)
+):
+    return _cached_stats(response, ("overview",), AdminService.get_overview_stats)
+
+@router.get("/stats/latency", response_model=List[EndpointLatency])
+def get_latency_stats(
+    hours: int = Query(24, ge=1, le=24 * 31),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin)
 ):
-    return AdminService.get_overview_stats(db)
+    return AdminService.get_latency_stats(db, hours)
 
 @router.get("/stats/usage", response_model=UsageStats)
 def get_usage_stats(
+    response: Response,
     range: str = "30d",
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin)
 ):
-    return AdminService.get_usage_stats(db, range)
+    return _cached_stats(response, ("usage", range), lambda db: AdminService.get_usage_stats(db, range))
 
 @router.get("/stats/accuracy", response_model=AccuracyStats)
 def get_accuracy_stats(
     range: str = "30d",
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin)
 ):
     return AdminService.get_accuracy_stats(db, range)
 
@@ -54,17 +93,18 @@ def get_accuracy_stats(
 def get_top_categories(
     range: str = "30d",
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin)
 ):
     return AdminService.get_top_categories(db, range)
 
 @router.get("/activities", response_model=List[Activity])
 def get_recent_activities(
-    limit: int = 5,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin)
+    response: Response,
+    limit: int = Query(5, ge=1, le=100),
+    current_user: Principal = Depends(get_current_admin)
 ):
-    return AdminService.get_recent_activities(db, limit)
+    return _cached_stats(response, ("activities", limit),
+                         lambda db: AdminService.get_recent_activities(db, limit))
 
 @router.get("/reports")
 def get_reports(
@@ -75,7 +115,7 @@ def get_reports(
     category: Optional[str] = None,
     search: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin)
 ):
     return AdminService.get_reports(db, page, limit, status, date_range, category, search)
 
@@ -89,7 +129,7 @@ def get_users(
     status: Optional[str] = None,
     role: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin)
 ):
     return AdminService.get_users(db, page, limit, search, status, role)
 
@@ -98,14 +138,14 @@ def update_user_status(
     user_id: int,
     update_data: AdminUserUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin)
 ):
     return AdminService.update_user_status(db, user_id, update_data)
 
 @router.get("/settings", response_model=List[SystemSettingItem])
 def get_system_settings(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin)
 ):
     return AdminService.get_system_settings(db)
 
@@ -113,6 +153,70 @@ def get_system_settings(
 def update_system_settings(
     settings_update: SystemSettingsUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin)
 ):
     return AdminService.update_system_settings(db, settings_update)
+
+
+def _artifact(payload: bytes, filename: str, media_type: str) -> Response:
+    return Response(
+        content=payload,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Worker-Pid": str(os.getpid()),
+        },
+    )
+
+
+@router.post("/profile/cpu")
+async def profile_cpu(
+    seconds: float = Query(10.0, gt=0, le=profiling.MAX_CAPTURE_SECONDS),
+    mode: str = Query("sampler", pattern="^(sampler|cprofile)$"),
+    interval_ms: float = Query(5.0, ge=1.0, le=100.0),
+    current_user: Principal = Depends(get_current_admin)
+):
+    """
+    Time-boxed CPU capture of the worker that serves this request.
+    sampler: collapsed stacks of all threads; cprofile: pstats of the event-loop thread.
+    """
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    try:
+        with profiling.capture_slot():
+            if mode == "cprofile":
+                payload = await profiling.capture_cprofile(seconds)
+                return _artifact(payload, f"profile-{os.getpid()}-{stamp}.pstats", "application/octet-stream")
+            payload = await profiling.capture_stack_samples(seconds, interval_ms / 1000)
+            return _artifact(payload, f"stacks-{os.getpid()}-{stamp}.collapsed.txt", "text/plain")
+    except profiling.CaptureBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/profile/torch")
+async def profile_torch(
+    batches: int = Query(5, ge=1, le=profiling.MAX_TORCH_BATCHES),
+    timeout: float = Query(30.0, gt=0, le=profiling.MAX_CAPTURE_SECONDS),
+    current_user: Principal = Depends(get_current_admin)
+):
+    """Chrome trace (torch.profiler) of the next N inference batches on this worker"""
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    try:
+        with profiling.capture_slot():
+            profiling.torch_trace.arm(batches)
+            payload = await profiling.torch_trace.collect(timeout)
+    except profiling.CaptureBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if payload is None:
+        raise HTTPException(status_code=504, detail="No inference batches ran before the timeout")
+    return _artifact(payload, f"torch-trace-{os.getpid()}-{stamp}.json", "application/json")
+
+
+@router.get("/diagnostics/event-loop")
+def get_event_loop_diagnostics(current_user: Principal = Depends(get_current_admin)):
+    """Recent loop lag percentiles and stacks captured while the loop was blocked (this worker)"""
+    return {
+        "pid": os.getpid(),
+        "lag_ms": {f"p{int(q * 100)}": round(v * 1000, 2) for q, v in loop_monitor.percentiles().items()},
+        "threshold_ms": loop_monitor.threshold * 1000,
+        "stalls": loop_monitor.recent_stalls(),
+    }
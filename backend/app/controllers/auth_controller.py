@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.config import get_settings
 from app.services.auth_service import AuthService
+from app.services.password_hasher import HasherOverloaded
 from app.schemas.auth import UserRegister, UserLogin, Token, UserResponse, GoogleAuthRequest
 from app.middleware.auth_middleware import get_current_user_id
 
@@ -12,9 +13,17 @@ router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 settings = get_settings()
 
 
+def _hasher_busy(e: HasherOverloaded) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": "1"},
+    )
+
+
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
 def register(user_data: UserRegister, db: Session = Depends(get_db)):
-    """Register new user with email and password"""
+    """Register new user with email and password (sync: runs in the threadpool, bcrypt in its own pool)"""
     auth_service = AuthService(db)
     
     try:
@@ -25,6 +34,8 @@ def register(user_data: UserRegister, db: Session = Depends(get_db)):
         )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except HasherOverloaded as e:
+        raise _hasher_busy(e)
     
     access_token = auth_service.create_access_token(user.id)
     return Token(access_token=access_token)
@@ -35,7 +46,10 @@ def login(credentials: UserLogin, db: Session = Depends(get_db)):
     """Login with email and password"""
     auth_service = AuthService(db)
     
-    user = auth_service.login(credentials.email, credentials.password)
+    try:
+        user = auth_service.login(credentials.email, credentials.password)
+    except HasherOverloaded as e:
+        raise _hasher_busy(e)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
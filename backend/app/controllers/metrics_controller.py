@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+
+from app.monitoring.metrics import render_latest
+
+router = APIRouter(tags=["Monitoring"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint (aggregated across workers)"""
+    payload, content_type = render_latest()
+    return Response(content=payload, media_type=content_type)
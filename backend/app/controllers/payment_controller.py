@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import httpx
 import json
 
-from app.database import get_db
+from app.database import get_async_db
 from app.services.payment_service import PaymentService
 from app.config import get_settings
 from app.schemas.payment import TopupRequest, TopupResponse
@@ -17,7 +17,7 @@ settings = get_settings()
 @router.post("/topup", response_model=TopupResponse)
 async def create_topup(
     topup_data: TopupRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_id: int = Depends(get_current_user_id)
 ):
     """Create MoMo payment for topup (requires authentication)"""
@@ -41,7 +41,7 @@ async def create_topup(
 
 
 @router.post("/momo/ipn")
-async def momo_ipn(request: Request, db: Session = Depends(get_db)):
+async def momo_ipn(request: Request, db: AsyncSession = Depends(get_async_db)):
     """MoMo IPN callback endpoint (webhook)"""
     payment_service = PaymentService(db)
     
@@ -54,7 +54,7 @@ async def momo_ipn(request: Request, db: Session = Depends(get_db)):
             return {"resultCode": 0, "message": "IPN endpoint is ready"}
         
         ipn_data = json.loads(raw_body_str)
-        success = payment_service.process_ipn(ipn_data)
+        success = await payment_service.process_ipn(ipn_data)
         
         return {
             "partnerCode": ipn_data.get("partnerCode"),
@@ -67,8 +67,11 @@ async def momo_ipn(request: Request, db: Session = Depends(get_db)):
     except json.JSONDecodeError:
         return {"resultCode": 1, "message": "Invalid JSON"}
     except ValueError as e:
+        await db.rollback()
         return {"resultCode": 1, "message": f"Validation failed: {str(e)}"}
     except Exception as e:
+        # Handled here, so get_async_db would otherwise commit a half-applied IPN
+        await db.rollback()
         return {"resultCode": 1, "message": "Processing failed"}
 
 
@@ -1,15 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+import hashlib
 import time
+from datetime import datetime
 import logging
 import json
 
-from app.database import get_db
-from app.services.subscription_service import SubscriptionService
+from app.database import get_async_db
+from app.services.subscription_service import AsyncSubscriptionService
 from app.services.ml_inference_service import MLInferenceService
-from app.repositories.usage_log_repository import UsageLogRepository
+from app.services.db_writer import db_writer
+from app.services.usage_log_buffer import usage_log_buffer
+from app.services.user_stats import record_prediction_stats
+from app.repositories.usage_log_repository import UsageLogRepository, AsyncUsageLogRepository
+from app.repositories.prediction_event_repository import (
+    PredictionEventRepository, AsyncPredictionEventRepository, class_mask
+)
 from app.schemas.prediction import PredictionResponse
 from app.middleware.auth_middleware import get_current_user_id
+from app.monitoring.timing import track_stage, current_timings
 
 router = APIRouter(prefix="/api/v1", tags=["Prediction"])
 
@@ -20,29 +29,10 @@ ml_service = MLInferenceService()
 logger = logging.getLogger(__name__)
 
 
-@router.post("/predict", response_model=PredictionResponse)
-async def predict(
-    file: UploadFile = File(...),
-    threshold: float = 0.5,
-    db: Session = Depends(get_db),
-    user_id: int = Depends(get_current_user_id)
-):
-    """Predict dangerous objects in image (requires authentication and quota)"""
-    
-    # Check quota
-    subscription_service = SubscriptionService(db)
-    quota_check = subscription_service.check_quota(user_id)
-    
-    if not quota_check["allowed"]:
-        raise HTTPException(status_code=403, detail=quota_check["reason"])
-    
-    # Validate threshold
-    if threshold <= 0.0 or threshold >= 1.0:
-        raise HTTPException(status_code=400, detail="Threshold must be in (0, 1)")
-    
-    # Read image
+async def _read_image(file: UploadFile) -> bytes:
     try:
-        image_bytes = await file.read()
+        with track_stage("upload_read"):
+            image_bytes = await file.read()
         if not image_bytes or len(image_bytes) < 100:
             logger.warning(f"Empty or too small image received: {len(image_bytes) if image_bytes else 0} bytes")
             raise HTTPException(status_code=400, detail="Empty or invalid image file")
@@ -51,40 +41,102 @@ async def predict(
     except Exception as e:
         logger.error(f"Failed to read image: {e}")
         raise HTTPException(status_code=400, detail="Failed to read image")
-    
-    # Perform inference
-    start_time = time.time()
+    return image_bytes
+
+
+def _run_inference(image_bytes: bytes, threshold: float) -> dict:
     try:
-        result = ml_service.predict(image_bytes, threshold)
+        return ml_service.predict(image_bytes, threshold)
     except ValueError as e:
         logger.warning(f"Invalid image format: {e}, size: {len(image_bytes)} bytes")
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Inference failed: {e}")
         raise HTTPException(status_code=500, detail=f"Inference failed: {str(e)}")
+
+
+@router.post("/predict", response_model=PredictionResponse)
+async def predict(
+    file: UploadFile = File(...),
+    threshold: float = 0.5,
+    db: AsyncSession = Depends(get_async_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Predict dangerous objects in image (requires authentication and quota)"""
     
-    response_time = (time.time() - start_time) * 1000  # ms
+    # Validate threshold
+    if threshold <= 0.0 or threshold >= 1.0:
+        raise HTTPException(status_code=400, detail="Threshold must be in (0, 1)")
+    
+    # Reserve quota (check + increment in one atomic UPDATE)
+    subscription_service = AsyncSubscriptionService(db)
+    with track_stage("quota"):
+        reservation = await subscription_service.reserve_quota(user_id)
+    
+    if not reservation["allowed"]:
+        raise HTTPException(status_code=403, detail=reservation["reason"])
     
-    # Increment usage
-    subscription_service.increment_usage(quota_check["subscription_id"])
+    try:
+        image_bytes = await _read_image(file)
+        start_time = time.time()
+        result = _run_inference(image_bytes, threshold)
+    except Exception:
+        # No prediction was served: give the reserved unit back
+        with track_stage("quota"):
+            await subscription_service.refund_quota(reservation["subscription_id"],
+                                                    via_allocator=reservation["via_allocator"])
+        raise
     
-    # Log usage
-    usage_log_repo = UsageLogRepository(db)
-    usage_log_repo.create(
+    response_time = (time.time() - start_time) * 1000  # ms (model call only)
+    
+    # Log usage (+ typed prediction event)
+    prediction = dict(
+        blocked=bool(result["active"]),  # Blocked when at least one dangerous class was detected
+        class_mask=class_mask(result["classes"], result["active"]),
+        max_prob=max(result["probabilities"], default=0.0),
+        threshold=threshold,
+        model_version=ml_service.model_version,
+        image_digest=hashlib.sha256(image_bytes).hexdigest(),
+    )
+    timings = current_timings()
+    request_time = timings.elapsed() * 1000 if timings else response_time  # ms (whole request so far)
+    usage_log = dict(
         user_id=user_id,
         endpoint="/api/v1/predict",
         method="POST",
         status_code=200,
         response_time_ms=response_time,
-        meta_data=json.dumps({"blocked": not result["active"], "classes": result["classes"]})
+        meta_data=json.dumps({
+            "blocked": prediction["blocked"],
+            "active": result["active"],
+            "plan": reservation["plan"],
+            "request_time_ms": round(request_time, 2),
+        })
     )
+    with track_stage("usage_log"):
+        if usage_log_buffer.running:
+            # Write-behind: batched INSERT off the request path
+            usage_log_buffer.record(**usage_log, prediction=prediction)
+        else:
+            event = dict(prediction, user_id=user_id, created_at=datetime.utcnow())
+            if db_writer.running:
+                # Queued to the single writer: one COMMIT for every log row in its batch
+                def write(session):
+                    UsageLogRepository(session).add(**usage_log)
+                    PredictionEventRepository(session).add(**event)
+                    record_prediction_stats(session.connection(), [event])
+                await db_writer.write(write)
+            else:
+                await AsyncUsageLogRepository(db).create(**usage_log)
+                await AsyncPredictionEventRepository(db).create(**event)
+                await db.run_sync(lambda session: record_prediction_stats(session.connection(), [event]))
     
     # Return result with remaining quota
     return PredictionResponse(
         classes=result["classes"],
         probabilities=result["probabilities"],
         active=result["active"],
-        quota_remaining=quota_check["remaining"] - 1
+        quota_remaining=reservation["remaining"]
     )
 
 
@@ -21,7 +21,9 @@ def get_current_subscription(
     if not subscription:
         raise HTTPException(status_code=404, detail="No active subscription found")
     
-    return subscription
+    response = SubscriptionResponse.model_validate(subscription)
+    response.used_quota = subscription_service.get_used_quota(subscription)
+    return response
 
 
 @router.post("/purchase", response_model=SubscriptionResponse)
@@ -1,8 +1,14 @@
 from pathlib import Path
-from sqlalchemy import create_engine
+from time import perf_counter
+from typing import AsyncIterator, Callable, List, Union
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.config import get_settings
+from app.monitoring import db_stats
+from app.monitoring.timing import record_stage
 
 settings = get_settings()
 
@@ -26,28 +32,193 @@ def _resolve_database_url(raw_url: str) -> str:
     return raw_url
 
 
+def _is_file_sqlite(url: str) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url
+
+
+def sqlite_pragmas() -> List[str]:
+    """PRAGMAs run on every new SQLite connection (production profile from settings)"""
+    pragmas = [
+        f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}",
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE}",
+        # Negative cache_size is in KiB; the page cache is per connection
+        f"PRAGMA cache_size={-int(settings.SQLITE_CACHE_SIZE_KB)}",
+        f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}",
+    ]
+    if settings.SQLITE_JOURNAL_MODE:
+        # Persistent in the file, but cheap to re-assert per connection
+        pragmas.insert(0, f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    return pragmas
+
+
+def _engine_kwargs(url: str) -> dict:
+    if not url.startswith("sqlite"):
+        return {"pool_size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_MAX_OVERFLOW,
+                "pool_timeout": settings.DB_POOL_TIMEOUT, "pool_pre_ping": True}
+    kwargs = {"connect_args": {"check_same_thread": False}}
+    if _is_file_sqlite(url):
+        # Pool sized for one worker process: request threadpool + background threads
+        # (lease renewer, revocation refresh, job runner, DB writer)
+        kwargs.update(pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW,
+                      pool_timeout=settings.DB_POOL_TIMEOUT)
+    return kwargs
+
+
+def _async_url(url: str) -> str:
+    """Same database through an asyncio driver (sqlite -> aiosqlite)"""
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+
+def _instrument(target, url: str) -> None:
+    """Pragmas + statement/commit accounting on a sync Engine (or an AsyncEngine's sync_engine)"""
+    if _is_file_sqlite(url):
+        @event.listens_for(target, "connect")
+        def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for pragma in sqlite_pragmas():
+                    cursor.execute(pragma)
+            finally:
+                cursor.close()
+
+    @event.listens_for(target, "before_cursor_execute")
+    def _statement_started(conn, cursor, statement, parameters, context, executemany):
+        context._statement_started = perf_counter()
+
+    @event.listens_for(target, "after_cursor_execute")
+    def _statement_finished(conn, cursor, statement, parameters, context, executemany):
+        db_stats.record_statement(perf_counter() - context._statement_started)
+
+    @event.listens_for(target, "commit")
+    def _transaction_committed(conn):
+        db_stats.record_commit()
+
+
+def _commit_started(session: Session):
+    session.info["commit_started"] = perf_counter()
+
+
+def _commit_finished(session: Session):
+    # Flush + COMMIT time, attributed to the "commit" stage of timed requests
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        record_stage("commit", perf_counter() - started)
+
+
 db_url = _resolve_database_url(settings.DATABASE_URL)
 
-engine = create_engine(
-    db_url,
-    connect_args={"check_same_thread": False} if "sqlite" in db_url else {}
+engine = create_engine(db_url, **_engine_kwargs(db_url))
+_instrument(engine, db_url)
+
+# expire_on_commit=False: objects stay readable after a mid-request commit without re-SELECTs
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Async path for the hot async endpoints (predict, topup, IPN): DB I/O no longer
+# blocks the event loop. Scripts, jobs and sync endpoints keep SessionLocal.
+async_db_url = _async_url(db_url)
+
+_async_kwargs = _engine_kwargs(db_url)
+if _is_file_sqlite(db_url):
+    # aiosqlite defaults to NullPool: a new connection + thread per session
+    _async_kwargs["poolclass"] = AsyncAdaptedQueuePool
+async_engine = create_async_engine(async_db_url, **_async_kwargs)
+_instrument(async_engine.sync_engine, db_url)
+
+
+class AsyncBackedSession(Session):
+    """Sync Session driven by AsyncSession (own class so the commit timing events apply once)"""
+
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, sync_session_class=AsyncBackedSession, autoflush=False, expire_on_commit=False
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _flushed(session: Session, flush_context):
+    session.info["pending_writes"] = True
+
+
+def _orm_execute(orm_execute_state):
+    # Bulk insert()/update()/delete() statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["pending_writes"] = True
+
+
+def _transaction_ended(session: Session, *args):
+    session.info.pop("pending_writes", None)
+
+
+def run_after_commit(session: Union[Session, AsyncSession], callback: Callable[[], None]) -> None:
+    """
+    Run ``callback`` once the current transaction has committed (e.g. cache
+    invalidation, so no reader can cache the pre-commit row again); dropped on rollback.
+    """
+    if isinstance(session, AsyncSession):
+        session = session.sync_session
+    session.info.setdefault("after_commit", []).append(callback)
+
+
+def _run_after_commit(session: Session):
+    for callback in session.info.pop("after_commit", ()):
+        callback()
+
+
+def _drop_after_commit(session: Session, *args):
+    session.info.pop("after_commit", None)
+
+
+def has_pending_writes(session: Session) -> bool:
+    """Whether the current transaction wrote anything (read-only requests skip COMMIT)"""
+    return bool(session.new or session.dirty or session.deleted or session.info.get("pending_writes"))
+
+
+for _session_target in (SessionLocal, AsyncBackedSession):
+    event.listen(_session_target, "before_commit", _commit_started)
+    event.listen(_session_target, "after_commit", _commit_finished)
+    event.listen(_session_target, "after_flush", _flushed)
+    event.listen(_session_target, "do_orm_execute", _orm_execute)
+    event.listen(_session_target, "after_commit", _transaction_ended)
+    event.listen(_session_target, "after_soft_rollback", _transaction_ended)
+    event.listen(_session_target, "after_commit", _run_after_commit)
+    event.listen(_session_target, "after_rollback", _drop_after_commit)
+
 
 Base = declarative_base()
 
 
 def get_db() -> Session:
-    """Dependency for getting DB session"""
+    """
+    Dependency for getting DB session, one unit of work per request: repositories
+    only flush, the request commits once at the end (rolls back if it raised)
+    """
     db = SessionLocal()
     try:
         yield db
+        if has_pending_writes(db):
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
     finally:
         db.close()
 
 
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Async get_db: same unit of work on an AsyncSession"""
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            if has_pending_writes(db.sync_session):
+                await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+
 def init_db():
-    """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
+    """Bring the schema up to date (versioned migrations, safe to call from every worker)"""
+    from app.migrations import MIGRATIONS, migrate
+    migrate(engine, MIGRATIONS, lock_timeout=settings.DB_MIGRATION_LOCK_TIMEOUT_SECONDS)
 
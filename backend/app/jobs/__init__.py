@@ -0,0 +1,14 @@
+from app.config import get_settings
+from app.database import SessionLocal
+from app.jobs.runner import JobRunner, PeriodicJob
+from app.jobs.subscription_jobs import expire_subscriptions, reset_monthly_quota
+from app.jobs.usage_jobs import rollup_usage
+
+settings = get_settings()
+
+job_runner = JobRunner(SessionLocal, lock_ttl=settings.JOB_LOCK_TTL_SECONDS)
+job_runner.add("expire_subscriptions", settings.JOB_EXPIRE_INTERVAL_SECONDS, expire_subscriptions)
+job_runner.add("reset_monthly_quota", settings.JOB_QUOTA_RESET_INTERVAL_SECONDS, reset_monthly_quota)
+job_runner.add("usage_rollup", settings.JOB_USAGE_ROLLUP_INTERVAL_SECONDS, rollup_usage)
+
+__all__ = ["job_runner", "JobRunner", "PeriodicJob"]
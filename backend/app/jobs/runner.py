@@ -0,0 +1,93 @@
+"""In-process periodic job runner, started from the app lifespan.
+
+Every worker runs the scheduler, but a job only executes on the worker that
+holds its row in ``job_locks``. The holder extends the lock on every run and
+keeps it for ``interval + lock_ttl``, so other workers (on any node) take over
+only after it shut down (lock released) or died (lock expired). Jobs are
+plain sync functions ``job(db)`` and run in a thread.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from app.monitoring.metrics import JOB_RUNS
+from app.repositories.job_lock_repository import JobLockRepository
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob(NamedTuple):
+    name: str
+    interval: float
+    func: Callable[[Session], object]
+
+
+class JobRunner:
+    def __init__(self, session_factory: Callable[[], Session], lock_ttl: float, tick: float = 1.0):
+        self._session_factory = session_factory
+        self.lock_ttl = lock_ttl
+        self.tick = tick
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._jobs: List[PeriodicJob] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, name: str, interval: float, func: Callable[[Session], object]) -> None:
+        self._jobs.append(PeriodicJob(name, interval, func))
+
+    def start(self) -> None:
+        # Resolved here: the worker pid is only final after uvicorn forks
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await asyncio.to_thread(self._release_all)
+
+    def _release_all(self) -> None:
+        db = self._session_factory()
+        try:
+            locks = JobLockRepository(db)
+            for job in self._jobs:
+                locks.release(job.name, self.owner)
+        finally:
+            db.close()
+
+    async def _run(self) -> None:
+        next_run = {job.name: 0.0 for job in self._jobs}
+        while True:
+            for job in self._jobs:
+                if time.monotonic() >= next_run[job.name]:
+                    next_run[job.name] = time.monotonic() + job.interval
+                    await asyncio.to_thread(self.run_once, job)
+            await asyncio.sleep(self.tick)
+
+    def run_once(self, job: PeriodicJob) -> bool:
+        """Run ``job`` if this worker gets its lock; returns whether it ran"""
+        db = self._session_factory()
+        try:
+            if not JobLockRepository(db).try_acquire(job.name, self.owner, job.interval + self.lock_ttl):
+                JOB_RUNS.labels(job.name, "skipped").inc()
+                return False
+            try:
+                result = job.func(db)
+                db.commit()
+                JOB_RUNS.labels(job.name, "ok").inc()
+                logger.info("Job %s finished: %s", job.name, result)
+            except Exception:
+                db.rollback()
+                JOB_RUNS.labels(job.name, "error").inc()
+                logger.exception("Job %s failed", job.name)
+            return True
+        finally:
+            db.close()
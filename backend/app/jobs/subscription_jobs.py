@@ -0,0 +1,73 @@
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models.subscription import SubscriptionStatus
+from app.models.system_setting import QUOTA_CYCLE_KEY, QUOTA_RESET_PROGRESS_KEY
+from app.repositories.subscription_repository import SubscriptionRepository
+from app.repositories.system_setting_repository import SystemSettingRepository
+from app.services.quota_cycle import quota_cycle_watcher
+from app.services.subscription_cache import subscription_cache
+
+settings = get_settings()
+
+
+def expire_subscriptions(db: Session) -> dict:
+    """
+    Expire every due ACTIVE/CANCELLED subscription and give users left without a
+    plan a FREE one, one batch per transaction (bulk UPDATE + batch INSERT).
+    """
+    repo = SubscriptionRepository(db)
+    expired = downgraded = 0
+    while True:
+        now = datetime.utcnow()
+        due = repo.get_due_for_expiry(now, settings.JOB_BATCH_SIZE)
+        if not due:
+            break
+        user_ids = {subscription.user_id for subscription in due}
+        # Same rule as get_active_subscription: FREE only if the expiring plan is the user's latest
+        needs_free = sorted(user_ids - repo.get_user_ids_with_newer_current(due, now))
+        repo.bulk_create_free(needs_free, settings.PLAN_FREE_MONTHLY_QUOTA)
+        expired += repo.bulk_update_status([subscription.id for subscription in due], SubscriptionStatus.EXPIRED)
+        db.commit()
+        downgraded += len(needs_free)
+        for user_id in user_ids:
+            subscription_cache.invalidate(user_id)
+    return {"expired": expired, "downgraded": downgraded}
+
+
+def current_quota_cycle(now: datetime) -> str:
+    return now.strftime("%Y-%m")
+
+
+def reset_monthly_quota(db: Session) -> dict:
+    """
+    Reset used_quota of all subscriptions once per calendar month (UTC).
+    The finished cycle is stored in system_settings so the reset runs once
+    across workers and restarts; the first run only records the cycle.
+    Progress ("<cycle>:<last id>") is saved with every chunk, so a reset cut
+    short resumes where it stopped instead of starting over. Workers pick up
+    the new cycle through quota_cycle_watcher and drop their allocator state.
+    """
+    system_settings = SystemSettingRepository(db)
+    cycle = current_quota_cycle(datetime.utcnow())
+    last_cycle = system_settings.get_value(QUOTA_CYCLE_KEY)
+    if last_cycle == cycle:
+        quota_cycle_watcher.observe(cycle)
+        return {"cycle": cycle, "reset": 0}
+
+    reset = 0
+    if last_cycle is not None:
+        progress_cycle, _, last_id = (system_settings.get_value(QUOTA_RESET_PROGRESS_KEY) or "").partition(":")
+        after_id = int(last_id) if progress_cycle == cycle else 0
+
+        def save_progress(high: int) -> None:
+            system_settings.set_value(QUOTA_RESET_PROGRESS_KEY, f"{cycle}:{high}",
+                                      "Quota reset in progress: cycle and last subscription id done")
+
+        reset = SubscriptionRepository(db).reset_usage_chunked(settings.JOB_BATCH_SIZE, after_id, save_progress)
+    system_settings.set_value(QUOTA_CYCLE_KEY, cycle, "Last quota cycle (YYYY-MM) whose used_quota was reset")
+    db.commit()
+    quota_cycle_watcher.observe(cycle)
+    return {"cycle": cycle, "reset": reset}
@@ -0,0 +1,19 @@
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.services.usage_rollup import run_rollup
+
+settings = get_settings()
+
+
+def rollup_usage(db: Session) -> dict:
+    """
+    Catch the usage rollups up with usage_logs (rows not written through the
+    buffer, or history after the tables were added), one chunk per transaction.
+    """
+    folded = 0
+    while True:
+        count = run_rollup(db.get_bind(), settings.JOB_BATCH_SIZE)
+        folded += count
+        if count < settings.JOB_BATCH_SIZE:
+            return {"rolled_up": folded}
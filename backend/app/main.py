@@ -1,4 +1,5 @@
 import logging
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
@@ -6,8 +7,21 @@ from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 
 from app.config import get_settings
-from app.database import init_db
+from app.database import async_engine, init_db
 from app.api import api_router
+from app.middleware.timing_middleware import RequestTimingMiddleware
+from app.middleware.query_stats_middleware import QueryStatsMiddleware
+from app.middleware.rate_limit_middleware import RateLimitMiddleware
+from app.monitoring.metrics import mark_worker_dead
+from app.monitoring.loop_monitor import loop_monitor
+from app.jobs import job_runner
+from app.services.subscription_service import get_quota_allocator
+from app.services.quota_cycle import quota_cycle_watcher
+from app.services.token_cache import revoked_users
+from app.services.password_hasher import password_hasher
+from app.services.http_clients import http_clients
+from app.services.db_writer import db_writer
+from app.services.usage_log_buffer import usage_log_buffer
 
 settings = get_settings()
 
@@ -16,7 +30,37 @@ settings = get_settings()
 async def lifespan(app: FastAPI):
     """Initialize database on startup"""
     init_db()
+    if settings.DB_SINGLE_WRITER:
+        db_writer.start()
+    if settings.USAGE_LOG_BUFFER_ENABLED:
+        usage_log_buffer.start()
+    revoked_users.start()
+    password_hasher.start()
+    http_clients.start()
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    quota_allocator = get_quota_allocator()
+    if quota_allocator is not None:
+        quota_allocator.start()
+        quota_cycle_watcher.start()
+    if settings.JOBS_ENABLED:
+        job_runner.start()
     yield
+    if settings.JOBS_ENABLED:
+        await job_runner.stop()
+    if quota_allocator is not None:
+        quota_cycle_watcher.stop()
+        quota_allocator.stop()
+    if settings.LOOP_MONITOR_ENABLED:
+        await loop_monitor.stop()
+    revoked_users.stop()
+    password_hasher.stop()
+    await http_clients.stop()
+    if settings.USAGE_LOG_BUFFER_ENABLED:
+        usage_log_buffer.stop()
+    db_writer.stop()
+    await async_engine.dispose()
+    mark_worker_dead(os.getpid())
 
 
 app = FastAPI(
@@ -25,6 +69,10 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Token-bucket throttling per IP/user; innermost so 429s still get CORS headers
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 # CORS middleware - Allow Chrome Extension access
 app.add_middleware(
     CORSMiddleware,
@@ -40,6 +88,12 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Per-request SQL statement/commit accounting
+app.add_middleware(QueryStatsMiddleware)
+
+# Per-stage latency metrics for the hot endpoints
+app.add_middleware(RequestTimingMiddleware)
+
 # Register routers via a single api router
 app.include_router(api_router)
 
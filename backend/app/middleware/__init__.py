@@ -1,6 +1,6 @@
 from app.middleware.auth_middleware import get_current_user_id
+from app.middleware.timing_middleware import RequestTimingMiddleware
+from app.middleware.query_stats_middleware import QueryStatsMiddleware
+from app.middleware.rate_limit_middleware import RateLimitMiddleware
 
-__all__ = ["get_current_user_id"]
-
-
-
+__all__ = ["get_current_user_id", "RequestTimingMiddleware", "QueryStatsMiddleware", "RateLimitMiddleware"]
@@ -1,41 +1,38 @@
 from fastapi import HTTPException, Security, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
 from typing import Optional
 
-from app.database import get_db
-from app.services.auth_service import AuthService
+from app.services.token_cache import revoked_users, token_cache
+from app.monitoring.timing import track_stage
 
 security = HTTPBearer()
 
 
 def get_current_user_id(
-    credentials: HTTPAuthorizationCredentials = Security(security),
-    db: Session = Depends(get_db)
+    credentials: HTTPAuthorizationCredentials = Security(security)
 ) -> int:
-    """Extract and validate JWT token, return user_id"""
+    """Extract and validate JWT token, return user_id (no DB session needed)"""
     token = credentials.credentials
     
-    auth_service = AuthService(db)
-    user_id = auth_service.decode_token(token)
+    with track_stage("auth"):
+        user_id = token_cache.verify(token)
     
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if revoked_users.is_revoked(user_id):
+        raise HTTPException(status_code=403, detail="Account is disabled")
     
     return user_id
 
 
 def get_optional_user_id(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
-    db: Session = Depends(get_db)
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))
 ) -> Optional[int]:
     """Extract user_id if token provided, otherwise return None"""
     if not credentials:
         return None
     
-    token = credentials.credentials
-    auth_service = AuthService(db)
-    return auth_service.decode_token(token)
-
-
-
+    user_id = token_cache.verify(credentials.credentials)
+    if user_id is None or revoked_users.is_revoked(user_id):
+        return None
+    return user_id
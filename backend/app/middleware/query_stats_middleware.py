@@ -0,0 +1,32 @@
+import logging
+
+from app.monitoring.db_stats import begin_scope, current_stats, end_scope, observe, over_budget
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStatsMiddleware:
+    """Pure ASGI middleware that counts SQL statements/commits per request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = begin_scope()
+        stats = current_stats()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            end_scope(token)
+            # Label by route template so path params don't explode cardinality
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            observe(endpoint, stats)
+            if over_budget(endpoint, stats):
+                logger.warning("Query budget exceeded on %s %s: %s", scope["method"], endpoint, stats)
+            else:
+                logger.debug("%s %s: %s", scope["method"], endpoint, stats)
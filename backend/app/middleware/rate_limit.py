@@ -0,0 +1,216 @@
+"""Token buckets for RateLimitMiddleware.
+
+Limits are declared per route group, per client IP and per plan (keyed by
+user id). Buckets live in a ``MemoryBucketStore`` (per worker, default) or a
+``SqliteBucketStore`` shared by all workers on the host.
+"""
+import logging
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.models.subscription import PlanType
+
+logger = logging.getLogger(__name__)
+
+
+class Limit(NamedTuple):
+    capacity: int  # Burst size
+    per_second: float  # Refill rate
+
+    @property
+    def window(self) -> int:
+        """Seconds to refill an empty bucket (the ``w`` of RateLimit-Policy)"""
+        return max(1, math.ceil(self.capacity / self.per_second))
+
+
+def per_minute(requests: int, burst: Optional[int] = None) -> Limit:
+    return Limit(capacity=burst or requests, per_second=requests / 60)
+
+
+class RouteLimits(NamedTuple):
+    ip: Limit
+    user: Dict[PlanType, Limit]  # Empty: anonymous route, IP limit only
+
+
+RATE_LIMITS: Dict[str, RouteLimits] = {
+    "predict": RouteLimits(
+        ip=per_minute(1200, burst=100),
+        user={
+            PlanType.FREE: per_minute(60, burst=20),
+            PlanType.PLUS: per_minute(300, burst=50),
+            PlanType.PRO: per_minute(1200, burst=100),
+        },
+    ),
+    "auth": RouteLimits(ip=per_minute(20, burst=10), user={}),
+    "default": RouteLimits(
+        ip=per_minute(600, burst=100),
+        user={
+            PlanType.FREE: per_minute(300, burst=60),
+            PlanType.PLUS: per_minute(600, burst=100),
+            PlanType.PRO: per_minute(1200, burst=200),
+        },
+    ),
+}
+
+# (path prefix, route group); first match wins, "default" otherwise
+ROUTE_GROUPS: Tuple[Tuple[str, str], ...] = (
+    ("/api/v1/predict", "predict"),
+    ("/api/auth/", "auth"),
+)
+
+IDLE_SECONDS = 600  # Longer than every window above
+
+EXEMPT_PATHS = frozenset({"/", "/health", "/metrics", "/docs", "/openapi.json"})
+
+
+def route_group(path: str) -> str:
+    for prefix, group in ROUTE_GROUPS:
+        if path.startswith(prefix):
+            return group
+    return "default"
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    limit: Limit
+    remaining: int
+    reset: int  # Seconds until the bucket is full again
+    retry_after: int  # Seconds until one token is available (0 if allowed)
+
+
+def _refill(tokens: float, updated: float, limit: Limit, now: float) -> float:
+    return min(limit.capacity, tokens + (now - updated) * limit.per_second)
+
+
+def _decide(tokens: float, limit: Limit, cost: int, consume: bool = True) -> Tuple[float, Decision]:
+    allowed = tokens >= cost
+    if allowed and consume:
+        tokens -= cost
+    retry_after = 0 if allowed else math.ceil((cost - tokens) / limit.per_second)
+    reset = math.ceil((limit.capacity - tokens) / limit.per_second)
+    return tokens, Decision(allowed, limit, int(tokens), reset, retry_after)
+
+
+def _decide_all(tokens: List[float], limits: Sequence[Limit], cost: int) -> Tuple[List[float], List[Decision]]:
+    """Every bucket pays ``cost`` or none does: a request one bucket rejects costs nothing"""
+    consume = all(t >= cost for t in tokens)
+    results = [_decide(t, limit, cost, consume) for t, limit in zip(tokens, limits)]
+    return [t for t, _ in results], [decision for _, decision in results]
+
+
+class MemoryBucketStore:
+    """Per-worker buckets; full (idle) buckets are pruned when the table grows"""
+
+    blocking = False  # take() is safe to call on the event loop
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit, cost: int = 1) -> Decision:
+        return self.take_all([(key, limit)], cost)[0]
+
+    def take_all(self, buckets: Sequence[Tuple[str, Limit]], cost: int = 1) -> List[Decision]:
+        """Check every bucket, then take ``cost`` from all of them only if all allow it"""
+        now = time.monotonic()
+        with self._lock:
+            rows = []
+            for key, limit in buckets:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    if len(self._buckets) >= self.max_keys:
+                        self._prune(now)
+                    bucket = self._buckets[key] = [float(limit.capacity), now]
+                rows.append(bucket)
+            tokens = [_refill(bucket[0], bucket[1], limit, now) for bucket, (_, limit) in zip(rows, buckets)]
+            tokens, decisions = _decide_all(tokens, [limit for _, limit in buckets], cost)
+            for bucket, left in zip(rows, tokens):
+                bucket[0], bucket[1] = left, now
+        return decisions
+
+    def _prune(self, now: float) -> None:
+        # Caller holds self._lock. A bucket idle longer than any window is full again.
+        idle = [key for key, (tokens, updated) in self._buckets.items() if now - updated > IDLE_SECONDS]
+        for key in idle:
+            del self._buckets[key]
+        if len(self._buckets) >= self.max_keys:
+            self._buckets.clear()
+
+
+class SqliteBucketStore:
+    """
+    Buckets shared by every worker on the host, in a small SQLite file
+    (separate from the app DB so throttling never contends with app writes).
+    take() may wait on the file lock, so callers run it off the event loop. If
+    the file is unavailable the store fails open to per-worker memory buckets.
+    """
+
+    blocking = True
+    ERROR_LOG_INTERVAL = 60.0  # Seconds between "falling back" warnings
+
+    def __init__(self, path: str, timeout: float = 1.0):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._takes = 0
+        self._fallback = MemoryBucketStore()
+        self._last_error_log = 0.0
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")  # Losing buckets on power loss is harmless
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def take(self, key: str, limit: Limit, cost: int = 1) -> Decision:
+        return self.take_all([(key, limit)], cost)[0]
+
+    def take_all(self, buckets: Sequence[Tuple[str, Limit]], cost: int = 1) -> List[Decision]:
+        """See MemoryBucketStore.take_all; all buckets in one transaction"""
+        try:
+            return self._take_shared(buckets, cost)
+        except sqlite3.Error as e:
+            now = time.monotonic()
+            if now - self._last_error_log >= self.ERROR_LOG_INTERVAL:
+                self._last_error_log = now
+                logger.warning(f"Rate limit store {self.path} unavailable, using per-worker buckets: {e}")
+            return self._fallback.take_all(buckets, cost)
+
+    def _take_shared(self, buckets: Sequence[Tuple[str, Limit]], cost: int) -> List[Decision]:
+        now = time.time()  # Wall clock: shared across processes
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")  # Raises (no transaction open) if the lock wait times out
+        try:
+            tokens = []
+            for key, limit in buckets:
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens.append(_refill(row[0], row[1], limit, now) if row else float(limit.capacity))
+            tokens, decisions = _decide_all(tokens, [limit for _, limit in buckets], cost)
+            conn.executemany(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                [(key, left, now) for (key, _), left in zip(buckets, tokens)],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._takes += 1
+        if self._takes % 10_000 == 0:
+            conn.execute("DELETE FROM buckets WHERE updated < ?", (now - IDLE_SECONDS,))
+        return decisions
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import logging
+import sqlite3
+from typing import Optional, Tuple
+
+from app.config import get_settings
+from app.database import BACKEND_ROOT
+from app.middleware.rate_limit import (
+    EXEMPT_PATHS,
+    RATE_LIMITS,
+    Decision,
+    MemoryBucketStore,
+    SqliteBucketStore,
+    route_group,
+)
+from app.models.subscription import PlanType
+from app.monitoring.metrics import RATE_LIMITED
+from app.services.subscription_cache import subscription_cache
+from app.services.token_cache import token_cache
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+def build_bucket_store():
+    if settings.RATE_LIMIT_BACKEND == "sqlite":
+        path = BACKEND_ROOT / settings.RATE_LIMIT_SQLITE_PATH
+        try:
+            return SqliteBucketStore(str(path))
+        except sqlite3.Error as e:
+            logger.warning(f"Rate limit store {path} unavailable, using per-worker buckets: {e}")
+    return MemoryBucketStore()
+
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI token-bucket throttling per client IP and per user (JWT ``sub``),
+    with limits by route group and plan (see RATE_LIMITS). Every response gets
+    RateLimit-Limit/Remaining/Reset/Policy for the tightest bucket; throttled
+    requests get 429 with Retry-After before reaching the app.
+    """
+
+    def __init__(self, app, store=None):
+        self.app = app
+        self.store = store or build_bucket_store()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        group = route_group(scope["path"])
+        if self.store.blocking:
+            # Both bucket checks in one hop to a thread (the shared store may wait on its lock)
+            decision, key_type = await asyncio.to_thread(self._check, scope, group)
+        else:
+            decision, key_type = self._check(scope, group)
+
+        headers = [
+            (b"ratelimit-limit", str(decision.limit.capacity).encode()),
+            (b"ratelimit-remaining", str(decision.remaining).encode()),
+            (b"ratelimit-reset", str(decision.reset).encode()),
+            (b"ratelimit-policy", f"{decision.limit.capacity};w={decision.limit.window}".encode()),
+        ]
+        if not decision.allowed:
+            RATE_LIMITED.labels(group, key_type).inc()
+            await self._reject(send, decision, headers)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _check(self, scope, group: str) -> Tuple[Decision, str]:
+        """
+        Tightest decision over the IP bucket and the user's plan bucket. Both are
+        checked before either is charged, so a request one of them rejects costs nothing.
+        """
+        limits = RATE_LIMITS[group]
+        buckets = [(f"ip:{group}:{self._client_ip(scope)}", limits.ip)]
+        user_id = self._user_id(scope) if limits.user else None
+        if user_id is not None:
+            snapshot = subscription_cache.peek(user_id)
+            plan = snapshot.plan if snapshot else PlanType.FREE
+            buckets.append((f"user:{group}:{user_id}", limits.user[plan]))
+
+        decisions = self.store.take_all(buckets)
+        decision, key_type = decisions[0], "ip"
+        if len(decisions) > 1:
+            user_decision = decisions[1]
+            if decision.allowed and (not user_decision.allowed or user_decision.remaining < decision.remaining):
+                decision, key_type = user_decision, "user"
+        return decision, key_type
+
+    @staticmethod
+    def _client_ip(scope) -> str:
+        if settings.RATE_LIMIT_TRUST_FORWARDED:
+            forwarded = _header(scope, b"x-forwarded-for")
+            if forwarded:
+                return forwarded.split(b",")[0].strip().decode("latin-1")
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @staticmethod
+    def _user_id(scope) -> Optional[int]:
+        authorization = _header(scope, b"authorization")
+        if not authorization or not authorization[:7].lower() == b"bearer ":
+            return None
+        # Invalid tokens are throttled by IP only; the route itself answers 401
+        return token_cache.verify(authorization[7:].decode("latin-1"))
+
+    @staticmethod
+    async def _reject(send, decision: Decision, headers) -> None:
+        body = json.dumps({"detail": "Too many requests, please slow down"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": headers + [
+                (b"retry-after", str(decision.retry_after).encode()),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,48 @@
+from typing import Iterable
+
+from app.monitoring.metrics import QUEUE_DEPTH, REJECTIONS
+from app.monitoring.timing import begin_request, current_timings, end_request
+
+TIMED_PATHS = ("/api/v1/predict",)
+
+
+class RequestTimingMiddleware:
+    """
+    Pure ASGI middleware that records per-stage timings for selected endpoints
+    and returns them to the client in a Server-Timing header
+    """
+
+    def __init__(self, app, paths: Iterable[str] = TIMED_PATHS):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = scope["path"]
+        token = begin_request(endpoint)
+        timings = current_timings()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.server_timing().encode("latin-1")))
+                headers.append((b"timing-allow-origin", b"*"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        in_flight = QUEUE_DEPTH.labels(endpoint)
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            end_request(token)
+            timings.observe()
+            if status_code >= 400:
+                REJECTIONS.labels(endpoint, str(status_code)).inc()
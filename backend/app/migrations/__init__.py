@@ -0,0 +1,14 @@
+from app.migrations.runner import Migration, applied_versions, current_version, migrate
+from app.migrations.versions import MIGRATIONS
+from app.migrations.query_plans import HOT_QUERIES, PlanCheck, check_query_plans
+
+__all__ = [
+    "Migration",
+    "MIGRATIONS",
+    "migrate",
+    "applied_versions",
+    "current_version",
+    "HOT_QUERIES",
+    "PlanCheck",
+    "check_query_plans",
+]
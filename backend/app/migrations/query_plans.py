@@ -0,0 +1,78 @@
+"""EXPLAIN QUERY PLAN checks: the hot queries must be answered from their indexes (SQLite)"""
+from datetime import datetime
+from typing import List, NamedTuple
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.engine import Engine
+
+from app.models.prediction_event import PredictionEvent
+from app.models.subscription import Subscription, SubscriptionStatus
+from app.models.transaction import Transaction, TransactionStatus, TransactionType
+from app.models.usage_log import UsageLog
+
+_SINCE = datetime(2000, 1, 1)
+
+
+class PlanCheck(NamedTuple):
+    name: str
+    index: str
+    plan: List[str]
+
+    @property
+    def ok(self) -> bool:
+        # SQLite says "USING INDEX <name>" or "USING COVERING INDEX <name>"
+        return any(f"INDEX {self.index}" in step for step in self.plan)
+
+
+# (name, statement shaped like the repository/service query, index it must use)
+HOT_QUERIES = [
+    (
+        "usage_logs of a user in a period (UsageLogRepository.count_by_user_in_period)",
+        select(func.count(UsageLog.id)).where(UsageLog.user_id == 1, UsageLog.created_at >= _SINCE),
+        "ix_usage_logs_user_created",
+    ),
+    (
+        "active subscription (SubscriptionRepository.get_active_by_user)",
+        select(Subscription).where(
+            Subscription.user_id == 1,
+            or_(Subscription.status == SubscriptionStatus.ACTIVE,
+                Subscription.status == SubscriptionStatus.CANCELLED),
+        ).order_by(Subscription.created_at.desc()).limit(1),
+        "ix_subscriptions_user_status_created",
+    ),
+    (
+        "revenue (AdminService.get_overview_stats)",
+        select(func.sum(Transaction.amount)).where(
+            Transaction.status == TransactionStatus.SUCCESS,
+            Transaction.type.in_([TransactionType.TOPUP, TransactionType.PURCHASE]),
+        ),
+        "ix_transactions_status_type",
+    ),
+    (
+        "blocked predictions of a user",
+        select(func.count(PredictionEvent.id)).where(
+            PredictionEvent.user_id == 1, PredictionEvent.blocked.is_(True)
+        ),
+        "ix_prediction_events_user_blocked_created",
+    ),
+    (
+        "blocked predictions in a period (PredictionEventRepository.blocked_by_category)",
+        select(func.sum(PredictionEvent.class_mask)).where(
+            PredictionEvent.blocked.is_(True), PredictionEvent.created_at >= _SINCE
+        ),
+        "ix_prediction_events_blocked_created",
+    ),
+]
+
+
+def check_query_plans(bind: Engine) -> List[PlanCheck]:
+    """Run EXPLAIN QUERY PLAN for every HOT_QUERIES entry (SQLite only)"""
+    if bind.dialect.name != "sqlite":
+        raise RuntimeError("Query plan checks use SQLite's EXPLAIN QUERY PLAN")
+    checks = []
+    with bind.connect() as conn:
+        for name, statement, index in HOT_QUERIES:
+            sql = str(statement.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True}))
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+            checks.append(PlanCheck(name, index, [row[-1] for row in rows]))
+    return checks
@@ -0,0 +1,107 @@
+import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator, List, NamedTuple, Optional, Sequence, Set
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+# Own MetaData: not part of Base.metadata/create_all, only the runner touches it
+VERSION_TABLE = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+_PG_LOCK_KEY = 0x78647969  # pg_advisory_xact_lock key shared by every worker
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]  # Runs inside the migration transaction; must not commit
+
+
+def applied_versions(conn: Connection) -> Set[int]:
+    if not inspect(conn).has_table(VERSION_TABLE.name):
+        return set()
+    return set(conn.execute(select(VERSION_TABLE.c.version)).scalars())
+
+
+@contextmanager
+def _migration_lock(bind: Engine, timeout: float) -> Iterator[Connection]:
+    """
+    One transaction holding the database-wide migration lock: BEGIN IMMEDIATE on
+    SQLite (the write lock), a transaction-scoped advisory lock on PostgreSQL.
+    Other workers wait here, then find the migrations already applied.
+    """
+    if bind.dialect.name == "postgresql":
+        with bind.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _PG_LOCK_KEY})
+            yield conn
+        return
+    if bind.dialect.name != "sqlite":
+        with bind.begin() as conn:
+            yield conn
+        return
+
+    # Driver-level autocommit so BEGIN/COMMIT are ours (pysqlite would defer BEGIN to the first write)
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+                break
+            except OperationalError as e:
+                # busy_timeout expired while another worker migrates
+                if "locked" not in str(e) or time.monotonic() > deadline:
+                    raise
+                logger.info("Waiting for another worker to finish migrating")
+        try:
+            yield conn
+        except BaseException:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+        conn.exec_driver_sql("COMMIT")
+
+
+def migrate(bind: Engine, migrations: Sequence[Migration], lock_timeout: float = 300.0) -> List[int]:
+    """
+    Apply pending migrations in version order, all in one transaction under the
+    migration lock (safe when every worker calls it at startup). Returns the
+    versions applied by this call.
+    """
+    if not migrations:
+        return []
+    migrations = sorted(migrations, key=lambda m: m.version)
+
+    # Fast path for every worker but the first: nothing to do, no write lock taken
+    with bind.connect() as conn:
+        if {m.version for m in migrations} <= applied_versions(conn):
+            return []
+
+    applied: List[int] = []
+    with _migration_lock(bind, lock_timeout) as conn:
+        VERSION_TABLE.create(conn, checkfirst=True)
+        done = applied_versions(conn)
+        for migration in migrations:
+            if migration.version in done:
+                continue
+            logger.info("Applying migration %04d_%s", migration.version, migration.name)
+            migration.upgrade(conn)
+            conn.execute(insert(VERSION_TABLE).values(
+                version=migration.version, name=migration.name, applied_at=datetime.utcnow()
+            ))
+            applied.append(migration.version)
+    return applied
+
+
+def current_version(bind: Engine) -> Optional[int]:
+    with bind.connect() as conn:
+        return max(applied_versions(conn), default=None)
@@ -0,0 +1,135 @@
+"""
+Schema migrations, in order. Append new ones; never edit an applied one.
+
+Every upgrade is idempotent (create only what is missing), because databases
+created before versioning already have part of the schema and the baseline
+creates the current models on a fresh database.
+"""
+from typing import Iterable
+
+from sqlalchemy import Index, Table, func, insert, inspect, select, text
+from sqlalchemy.engine import Connection
+
+from app.database import Base
+from app.migrations.runner import Migration
+
+LEGACY_MODEL_VERSION = "legacy-usage-log"  # prediction_events backfilled from usage_logs.meta_data
+
+
+def _create_missing_indexes(conn: Connection, indexes: Iterable[Index]) -> None:
+    inspector = inspect(conn)
+    for index in indexes:
+        existing = {ix["name"] for ix in inspector.get_indexes(index.table.name)}
+        if index.name not in existing:
+            index.create(conn)
+
+
+def _index(table: Table, name: str) -> Index:
+    return next(ix for ix in table.indexes if ix.name == name)
+
+
+def baseline(conn: Connection) -> None:
+    """Tables of the current models (what init_db's create_all used to do)"""
+    import app.models  # noqa: F401  (register every model on Base.metadata)
+    Base.metadata.create_all(conn)
+
+
+def users_is_admin(conn: Connection) -> None:
+    """Was add_admin_column.py"""
+    columns = {column["name"] for column in inspect(conn).get_columns("users")}
+    if "is_admin" not in columns:
+        conn.execute(text("ALTER TABLE users ADD COLUMN is_admin INTEGER DEFAULT 0"))
+
+
+def hot_path_indexes(conn: Connection) -> None:
+    """Composite indexes for per-user usage, active subscription lookup and revenue reports"""
+    from app.models import Subscription, Transaction, UsageLog
+    _create_missing_indexes(conn, [
+        _index(UsageLog.__table__, "ix_usage_logs_user_created"),
+        _index(Subscription.__table__, "ix_subscriptions_user_status_created"),
+        _index(Transaction.__table__, "ix_transactions_status_type"),
+    ])
+
+
+def user_stat_counters(conn: Connection) -> None:
+    """Per-user statistics counters, backfilled from prediction_events"""
+    from app.models import PredictionEvent, UserStatCounter
+    from app.services.user_stats import record_prediction_stats
+    UserStatCounter.__table__.create(conn, checkfirst=True)
+    if conn.execute(select(func.count()).select_from(UserStatCounter.__table__)).scalar():
+        return
+    events = PredictionEvent.__table__
+    result = conn.execute(
+        select(events.c.user_id, events.c.created_at, events.c.blocked, events.c.class_mask)
+        .where(events.c.blocked.is_(True))
+    )
+    for chunk in result.mappings().partitions(10000):
+        record_prediction_stats(conn, chunk)
+
+
+def analytics_sketches(conn: Connection) -> None:
+    """Admin analytics sketches, backfilled from the usage_logs rows already rolled up"""
+    from app.models import AnalyticsSketch, SystemSetting, UsageLog
+    from app.services.analytics_sketches import update_sketches
+    from app.services.usage_rollup import WATERMARK_KEY
+    AnalyticsSketch.__table__.create(conn, checkfirst=True)
+    if conn.execute(select(func.count()).select_from(AnalyticsSketch.__table__)).scalar():
+        return
+    # Rows above the watermark get their sketches from the rollup itself
+    watermark = conn.execute(
+        select(SystemSetting.value).where(SystemSetting.key == WATERMARK_KEY)
+    ).scalar()
+    logs = UsageLog.__table__
+    result = conn.execute(
+        select(logs.c.user_id, logs.c.endpoint, logs.c.created_at, logs.c.response_time_ms)
+        .where(logs.c.id <= int(watermark or 0))
+    )
+    for chunk in result.partitions(10000):
+        update_sketches(conn, chunk)
+
+
+def legacy_prediction_events(conn: Connection) -> None:
+    """
+    prediction_events (and the user stat counters) for predict usage_logs rows
+    written before prediction_events existed, from their meta_data JSON
+    """
+    from app.config import get_settings
+    from app.models import PredictionEvent, UsageLog
+    from app.repositories.prediction_event_repository import class_mask
+    from app.services.usage_rollup import parse_meta, prediction_outcome
+    from app.services.user_stats import record_prediction_stats
+    classes = get_settings().MODEL_CLASSES
+    events = PredictionEvent.__table__
+    if conn.execute(select(events.c.id).where(events.c.model_version == LEGACY_MODEL_VERSION).limit(1)).first():
+        return
+    logs = UsageLog.__table__
+    query = select(logs.c.user_id, logs.c.created_at, logs.c.meta_data).where(
+        logs.c.endpoint == "/api/v1/predict", logs.c.status_code == 200
+    )
+    # Every predict since prediction_events went live wrote its own event
+    first_event = conn.execute(select(func.min(events.c.created_at))).scalar()
+    if first_event is not None:
+        query = query.where(logs.c.created_at < first_event)
+    result = conn.execute(query.order_by(logs.c.id))
+    for chunk in result.partitions(10000):
+        rows = []
+        for user_id, created_at, meta_data in chunk:
+            blocked, detected = prediction_outcome(parse_meta(meta_data))
+            rows.append({
+                "user_id": user_id, "created_at": created_at, "blocked": blocked,
+                "class_mask": class_mask(classes, detected), "max_prob": 0.0, "threshold": 0.5,
+                "model_version": LEGACY_MODEL_VERSION, "image_digest": "",
+            })
+        if rows:
+            conn.execute(insert(events), rows)
+            record_prediction_stats(conn, rows)
+
+
+MIGRATIONS = [
+    Migration(1, "baseline", baseline),
+    Migration(2, "users_is_admin", users_is_admin),
+    Migration(3, "hot_path_indexes", hot_path_indexes),
+    Migration(4, "user_stat_counters", user_stat_counters),
+    Migration(5, "analytics_sketches", analytics_sketches),
+    Migration(6, "legacy_prediction_events", legacy_prediction_events),
+]
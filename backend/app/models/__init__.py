@@ -3,7 +3,15 @@ from app.models.subscription import Subscription
 from app.models.transaction import Transaction
 from app.models.usage_log import UsageLog
 from app.models.user_settings import UserSettings
+from app.models.system_setting import SystemSetting
+from app.models.job_lock import JobLock
+from app.models.prediction_event import PredictionEvent
+from app.models.analytics_sketch import AnalyticsSketch
+from app.models.user_stat_counter import UserStatCounter
+from app.models.usage_rollup import UsageDailyRollup, UsageHourlyRollup
 
-__all__ = ["User", "Subscription", "Transaction", "UsageLog", "UserSettings"]
+__all__ = ["User", "Subscription", "Transaction", "UsageLog", "UserSettings", "SystemSetting", "JobLock",
+           "PredictionEvent", "UsageDailyRollup", "UsageHourlyRollup", "UserStatCounter",
+           "AnalyticsSketch"]
 
 
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, DateTime, LargeBinary, String
+from app.database import Base
+
+
+class AnalyticsSketch(Base):
+    """Serialized mergeable sketch per (kind, bucket, key) (maintained by app.services.analytics_sketches)"""
+    __tablename__ = "analytics_sketches"
+
+    kind = Column(String, primary_key=True)  # "users_daily" (HyperLogLog) or "latency_hourly" (DDSketch)
+    bucket = Column(DateTime, primary_key=True)  # UTC day or hour start
+    key = Column(String, primary_key=True)  # Endpoint for latency, "" for users
+    data = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
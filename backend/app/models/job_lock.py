@@ -0,0 +1,11 @@
+from sqlalchemy import Column, DateTime, String
+from app.database import Base
+
+
+class JobLock(Base):
+    """Lease-style lock so only one worker runs a background job at a time"""
+    __tablename__ = "job_locks"
+
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)  # "<hostname>:<pid>"
+    expires_at = Column(DateTime, nullable=False)
@@ -0,0 +1,25 @@
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String
+from datetime import datetime
+from app.database import Base
+
+
+class PredictionEvent(Base):
+    """Kết quả một lần predict (typed, index được) thay cho JSON trong usage_logs.meta_data"""
+    __tablename__ = "prediction_events"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    blocked = Column(Boolean, nullable=False)  # At least one class at/above the threshold
+    class_mask = Column(Integer, nullable=False, default=0)  # Bit i = settings.MODEL_CLASSES[i] detected
+    max_prob = Column(Float, nullable=False)
+    threshold = Column(Float, nullable=False)
+    model_version = Column(String, nullable=False)
+    image_digest = Column(String(64), nullable=False)  # sha256 hex of the uploaded bytes
+
+    __table_args__ = (
+        # Per-user stats (blocked counts by period, categories)
+        Index("ix_prediction_events_user_blocked_created", "user_id", "blocked", "created_at"),
+        # Admin aggregates over a time range
+        Index("ix_prediction_events_blocked_created", "blocked", "created_at"),
+    )
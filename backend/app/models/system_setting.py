@@ -1,6 +1,10 @@
 from sqlalchemy import Column, String, Text
 from app.database import Base
 
+# Quota cycle markers (see QuotaCycleWatcher, reset_monthly_quota)
+QUOTA_CYCLE_KEY = "quota_cycle"
+QUOTA_RESET_PROGRESS_KEY = "quota_reset_progress"
+
 class SystemSetting(Base):
     __tablename__ = "system_settings"
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -16,6 +16,10 @@ class UsageLog(Base):
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     meta_data = Column(String, nullable=True) # JSON string for flexibility
     
+    __table_args__ = (
+        Index("ix_usage_logs_user_created", "user_id", "created_at"),  # Per-user usage by period
+    )
+    
     # Relationships
     user = relationship("User", back_populates="usage_logs")
 
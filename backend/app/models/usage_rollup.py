@@ -0,0 +1,29 @@
+from sqlalchemy import Boolean, Column, Date, DateTime, Integer, String
+from app.database import Base
+
+# category of the row counting every request; other rows count requests where that class was detected
+ALL_CATEGORIES = ""
+
+
+class UsageDailyRollup(Base):
+    """usage_logs aggregated per UTC day (maintained by app.services.usage_rollup)"""
+    __tablename__ = "usage_rollup_daily"
+
+    day = Column(Date, primary_key=True)
+    endpoint = Column(String, primary_key=True)
+    plan = Column(String, primary_key=True)  # Plan at request time, "unknown" for old rows
+    blocked = Column(Boolean, primary_key=True)
+    category = Column(String, primary_key=True)
+    requests = Column(Integer, nullable=False, default=0)
+
+
+class UsageHourlyRollup(Base):
+    """Same dimensions as UsageDailyRollup, per UTC hour"""
+    __tablename__ = "usage_rollup_hourly"
+
+    hour = Column(DateTime, primary_key=True)
+    endpoint = Column(String, primary_key=True)
+    plan = Column(String, primary_key=True)
+    blocked = Column(Boolean, primary_key=True)
+    category = Column(String, primary_key=True)
+    requests = Column(Integer, nullable=False, default=0)
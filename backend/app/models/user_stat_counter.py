@@ -0,0 +1,16 @@
+from datetime import date
+from sqlalchemy import Column, Date, ForeignKey, Integer, String
+from app.database import Base
+
+ALL_TIME = date.min  # day of the bucket holding lifetime totals
+ALL_CATEGORIES = ""  # category of the bucket counting every blocked prediction
+
+
+class UserStatCounter(Base):
+    """Blocked predictions per user, UTC day and class (maintained by app.services.user_stats)"""
+    __tablename__ = "user_stat_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)  # ALL_TIME for the lifetime bucket
+    category = Column(String, primary_key=True)  # Model class name or ALL_CATEGORIES
+    blocked = Column(Integer, nullable=False, default=0)
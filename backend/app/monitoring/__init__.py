@@ -0,0 +1,4 @@
+from app.monitoring.metrics import render_latest, mark_worker_dead
+from app.monitoring.timing import track_stage, record_stage, current_timings
+
+__all__ = ["render_latest", "mark_worker_dead", "track_stage", "record_stage", "current_timings"]
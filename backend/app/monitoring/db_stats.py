@@ -0,0 +1,115 @@
+"""Statement/commit accounting fed by the engine events in app.database.
+
+Counts go to the request scope opened by QueryStatsMiddleware (per-request
+logs and metrics) and to process-wide totals used by ``query_budget``.
+"""
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict, Iterator, NamedTuple, Optional
+
+from app.monitoring.metrics import DB_COMMITS, DB_SECONDS, DB_STATEMENTS
+
+
+class QueryStats:
+    __slots__ = ("statements", "commits", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+        self.seconds = 0.0
+
+    def __repr__(self) -> str:
+        return f"statements={self.statements} commits={self.commits} db_ms={self.seconds * 1000:.1f}"
+
+
+class QueryBudget(NamedTuple):
+    statements: int
+    commits: int
+
+
+# Expected upper bounds for the hot endpoints; exceeding them is logged at
+# runtime and fails ``assert_query_budget`` in tests.
+QUERY_BUDGETS: Dict[str, QueryBudget] = {
+    "/api/v1/predict": QueryBudget(statements=4, commits=2),
+    "/api/user/profile": QueryBudget(statements=2, commits=0),
+    "/api/user/statistics": QueryBudget(statements=4, commits=0),
+    "/api/subscription/current": QueryBudget(statements=1, commits=0),
+}
+
+_totals = QueryStats()
+_totals_lock = threading.Lock()
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def begin_scope() -> Token:
+    return _current.set(QueryStats())
+
+
+def end_scope(token: Token) -> None:
+    _current.reset(token)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def record_statement(seconds: float) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.seconds += seconds
+    with _totals_lock:
+        _totals.statements += 1
+        _totals.seconds += seconds
+
+
+def record_commit() -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.commits += 1
+    with _totals_lock:
+        _totals.commits += 1
+
+
+def observe(endpoint: str, stats: QueryStats) -> None:
+    DB_STATEMENTS.labels(endpoint).observe(stats.statements)
+    DB_COMMITS.labels(endpoint).observe(stats.commits)
+    DB_SECONDS.labels(endpoint).observe(stats.seconds)
+
+
+def over_budget(endpoint: str, stats: QueryStats) -> bool:
+    budget = QUERY_BUDGETS.get(endpoint)
+    return budget is not None and (stats.statements > budget.statements or stats.commits > budget.commits)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(statements: Optional[int] = None, commits: Optional[int] = None) -> Iterator[QueryStats]:
+    """
+    Test helper: count every statement/commit issued while the block runs
+    (from any thread, e.g. TestClient requests) and fail if over budget.
+    """
+    used = QueryStats()
+    with _totals_lock:
+        start = (_totals.statements, _totals.commits, _totals.seconds)
+    try:
+        yield used
+    finally:
+        with _totals_lock:
+            used.statements = _totals.statements - start[0]
+            used.commits = _totals.commits - start[1]
+            used.seconds = _totals.seconds - start[2]
+    if statements is not None and used.statements > statements:
+        raise QueryBudgetExceeded(f"{used.statements} statements issued, budget is {statements} ({used})")
+    if commits is not None and used.commits > commits:
+        raise QueryBudgetExceeded(f"{used.commits} commits issued, budget is {commits} ({used})")
+
+
+def assert_query_budget(endpoint: str):
+    """``with assert_query_budget("/api/v1/predict"): client.post(...)``"""
+    budget = QUERY_BUDGETS[endpoint]
+    return query_budget(budget.statements, budget.commits)
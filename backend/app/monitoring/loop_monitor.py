@@ -0,0 +1,109 @@
+"""Event-loop lag watchdog.
+
+A probe coroutine sleeps for a fixed interval and records how late it wakes
+up (scheduling delay). A watchdog thread watches the probe's heartbeat; when
+the loop has not come back for longer than the threshold it grabs the loop
+thread's current stack, i.e. the blocking call that is holding the loop.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+from app.config import get_settings
+from app.monitoring.metrics import LOOP_LAG_QUANTILE, LOOP_LAG_SECONDS, LOOP_STALLS
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1,
+                 window: int = 1200, keep_stalls: int = 20):
+        self.interval = interval
+        self.threshold = threshold
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._stalls: Deque[Dict] = deque(maxlen=keep_stalls)
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+        self._thread = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._thread:
+            self._thread.join(timeout=1)
+
+    async def _probe(self) -> None:
+        loop = asyncio.get_running_loop()
+        observed = 0
+        while True:
+            started = loop.time()
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            LOOP_LAG_SECONDS.observe(lag)
+            self._samples.append(lag)
+            observed += 1
+            if observed % 20 == 0:
+                for q, value in self.percentiles().items():
+                    LOOP_LAG_QUANTILE.labels(str(q)).set(value)
+
+    def _watch(self) -> None:
+        reported = False
+        while not self._stop.wait(self.interval):
+            blocked_for = time.monotonic() - self._heartbeat - self.interval
+            if blocked_for <= self.threshold:
+                reported = False
+                continue
+            if reported:
+                continue
+            # Report each stall once, with the stack that is holding the loop
+            reported = True
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<unavailable>"
+            LOOP_STALLS.inc()
+            self._stalls.append({
+                "detected_at": datetime.utcnow().isoformat(),
+                "blocked_ms": round(blocked_for * 1000, 1),
+                "stack": stack,
+            })
+            logger.warning("Event loop blocked for %.0f ms, loop thread is at:\n%s",
+                           blocked_for * 1000, stack)
+
+    def percentiles(self) -> Dict[float, float]:
+        samples = sorted(self._samples)
+        if not samples:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in QUANTILES}
+
+    def recent_stalls(self) -> List[Dict]:
+        return list(self._stalls)
+
+
+loop_monitor = LoopLagMonitor(
+    interval=settings.LOOP_MONITOR_INTERVAL_MS / 1000,
+    threshold=settings.LOOP_LAG_THRESHOLD_MS / 1000,
+)
@@ -0,0 +1,127 @@
+"""Prometheus metrics exposed at /metrics.
+
+With several uvicorn workers (``run.py --workers N``) each process writes its
+samples into PROMETHEUS_MULTIPROC_DIR and the collector merges them on scrape.
+"""
+import os
+from typing import Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+STAGE_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+REQUEST_STAGE_SECONDS = Histogram(
+    "xdynamic_request_stage_seconds",
+    "Time spent in each stage of a request (stage=total covers the whole request)",
+    ["endpoint", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+
+REJECTIONS = Counter(
+    "xdynamic_rejections_total",
+    "Requests that ended with an error status",
+    ["endpoint", "status"],
+)
+
+RATE_LIMITED = Counter(
+    "xdynamic_rate_limited_total",
+    "Requests rejected with 429 by the rate limiter",
+    ["group", "key"],  # key: ip | user
+)
+
+CACHE_REQUESTS = Counter(
+    "xdynamic_cache_requests_total",
+    "In-process cache lookups",
+    ["cache", "result"],
+)
+
+INFERENCE_BATCH_SIZE = Histogram(
+    "xdynamic_inference_batch_size",
+    "Images per model forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+QUEUE_DEPTH = Gauge(
+    "xdynamic_queue_depth",
+    "Items currently waiting in an in-process queue",
+    ["queue"],
+    multiprocess_mode="livesum",
+)
+
+DB_STATEMENTS = Histogram(
+    "xdynamic_db_statements_per_request",
+    "SQL statements executed per request",
+    ["endpoint"],
+    buckets=(0, 1, 2, 4, 6, 8, 12, 16, 24, 32, 64),
+)
+
+DB_COMMITS = Histogram(
+    "xdynamic_db_commits_per_request",
+    "Transactions committed per request",
+    ["endpoint"],
+    buckets=(0, 1, 2, 3, 4, 6, 8, 16),
+)
+
+DB_SECONDS = Histogram(
+    "xdynamic_db_seconds_per_request",
+    "Time spent executing SQL per request",
+    ["endpoint"],
+    buckets=STAGE_BUCKETS,
+)
+
+LOOP_LAG_SECONDS = Histogram(
+    "xdynamic_event_loop_lag_seconds",
+    "How late the event loop woke up a periodic probe",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+LOOP_LAG_QUANTILE = Gauge(
+    "xdynamic_event_loop_lag_quantile_seconds",
+    "Event loop lag percentiles over the recent window (worst live worker)",
+    ["quantile"],
+    multiprocess_mode="livemax",
+)
+
+LOOP_STALLS = Counter(
+    "xdynamic_event_loop_stalls_total",
+    "Times the event loop was blocked longer than the lag threshold",
+)
+
+JOB_RUNS = Counter(
+    "xdynamic_job_runs_total",
+    "Background job executions",
+    ["job", "result"],  # ok | skipped (lock held elsewhere) | error
+)
+
+
+def multiprocess_enabled() -> bool:
+    return bool(os.environ.get(MULTIPROC_DIR_ENV))
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """Serialize all metrics, merging every worker when running multi-process"""
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead(pid: int) -> None:
+    """Drop live gauges of an exiting worker from the shared directory"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid)
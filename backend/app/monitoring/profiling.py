@@ -0,0 +1,176 @@
+"""On-demand profilers for the current worker (driven from the /admin router).
+
+Nothing is installed until an admin starts a capture: the inference path only
+checks ``torch_trace.active`` and the CPU profilers exist for the duration of
+a request. Only one capture may run per worker at a time.
+"""
+import asyncio
+import cProfile
+import marshal
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Iterator, Optional
+
+MAX_CAPTURE_SECONDS = 60
+MAX_TORCH_BATCHES = 100
+
+_capture_lock = threading.Lock()
+
+
+class CaptureBusy(RuntimeError):
+    """Another capture is already running in this worker"""
+
+
+@contextmanager
+def capture_slot() -> Iterator[None]:
+    if not _capture_lock.acquire(blocking=False):
+        raise CaptureBusy("A profiling capture is already running on this worker")
+    try:
+        yield
+    finally:
+        _capture_lock.release()
+
+
+async def capture_cprofile(seconds: float) -> bytes:
+    """
+    Deterministic profile of the event-loop thread for ``seconds``.
+    Returns marshalled stats loadable with ``pstats.Stats(path)``.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
+
+
+def _collapse(frame, thread_name: str) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    stack.append(thread_name)
+    return ";".join(reversed(stack))
+
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> str:
+    """
+    Statistical sampler over every thread of the process.
+    Returns collapsed stacks (``frame;frame;frame count``) for flamegraph tools.
+    """
+    own_id = threading.get_ident()
+    counts: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id != own_id:
+                counts[_collapse(frame, names.get(thread_id, str(thread_id)))] += 1
+        time.sleep(interval)
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common()) + "\n"
+
+
+async def capture_stack_samples(seconds: float, interval: float) -> bytes:
+    collapsed = await asyncio.to_thread(sample_stacks, seconds, interval)
+    return collapsed.encode("utf-8")
+
+
+class TorchTraceCapture:
+    """Runs the next N inference batches under torch.profiler and exports a Chrome trace"""
+
+    def __init__(self):
+        self.active = False
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._recorded = 0
+        self._profiler = None
+        self._trace_path: Optional[str] = None
+        self._done = threading.Event()
+
+    def arm(self, batches: int) -> None:
+        with self._lock:
+            self._remaining = batches
+            self._recorded = 0
+            self._profiler = None
+            self._trace_path = None
+            self._done.clear()
+            self.active = True
+
+    def batch(self):
+        """Context manager for one forward pass (a shared no-op while idle)"""
+        if not self.active:
+            return _NOOP
+        return self._profiled_batch()
+
+    @contextmanager
+    def _profiled_batch(self) -> Iterator[None]:
+        with self._lock:
+            if self.active and self._profiler is None:
+                self._profiler = self._start_profiler()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if self.active:
+                    self._recorded += 1
+                    self._remaining -= 1
+                    if self._remaining <= 0:
+                        self._finish()
+
+    @staticmethod
+    def _start_profiler():
+        import torch
+        from torch.profiler import ProfilerActivity, profile
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        profiler = profile(activities=activities, record_shapes=True)
+        profiler.__enter__()
+        return profiler
+
+    def _finish(self) -> None:
+        # Caller holds self._lock
+        self.active = False
+        if self._profiler is not None:
+            self._profiler.__exit__(None, None, None)
+            fd, path = tempfile.mkstemp(prefix="torch-trace-", suffix=".json")
+            os.close(fd)
+            self._profiler.export_chrome_trace(path)
+            self._trace_path = path
+            self._profiler = None
+        self._done.set()
+
+    async def collect(self, timeout: float) -> Optional[bytes]:
+        """Wait for the armed batches (or the timeout) and return the trace JSON"""
+        finished = await asyncio.to_thread(self._done.wait, timeout)
+        if not finished:
+            with self._lock:
+                if self.active:
+                    self._finish()
+        path = self._trace_path
+        self._trace_path = None
+        if not path:
+            return None
+        try:
+            with open(path, "rb") as fh:
+                return fh.read()
+        finally:
+            os.unlink(path)
+
+    @property
+    def recorded_batches(self) -> int:
+        return self._recorded
+
+
+_NOOP = nullcontext()
+
+torch_trace = TorchTraceCapture()
@@ -0,0 +1,92 @@
+"""Per-request stage timings.
+
+The timing middleware opens a RequestTimings scope for instrumented endpoints;
+code on the request path wraps its work in ``track_stage`` and the totals are
+published to the stage histogram when the request finishes. Outside of such a
+scope ``track_stage`` only costs a context-variable lookup.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from time import perf_counter
+from typing import Dict, Iterator, Optional
+
+from app.monitoring.metrics import REQUEST_STAGE_SECONDS
+
+# Server-Timing metric name -> internal stages summed into it
+SERVER_TIMING_STAGES = (
+    ("auth", ("auth",)),
+    ("quota", ("quota",)),
+    ("read", ("upload_read",)),
+    ("decode", ("decode",)),
+    ("infer", ("preprocess", "forward")),
+    ("db", ("usage_log",)),
+)
+
+
+class RequestTimings:
+    """Accumulated seconds per stage for one request"""
+
+    __slots__ = ("endpoint", "started", "stages")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Render the Server-Timing header value (durations in ms)"""
+        parts = []
+        for name, stages in SERVER_TIMING_STAGES:
+            recorded = [self.stages[stage] for stage in stages if stage in self.stages]
+            if recorded:
+                parts.append(f"{name};dur={sum(recorded) * 1000:.1f}")
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+    def observe(self) -> None:
+        """Publish stage totals (and the whole request as stage=total)"""
+        for stage, seconds in self.stages.items():
+            REQUEST_STAGE_SECONDS.labels(self.endpoint, stage).observe(seconds)
+        REQUEST_STAGE_SECONDS.labels(self.endpoint, "total").observe(self.elapsed())
+
+
+# The timings object is shared by reference, so stages recorded from sync
+# dependencies running in the threadpool land in the same request scope.
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def begin_request(endpoint: str) -> Token:
+    return _current.set(RequestTimings(endpoint))
+
+
+def end_request(token: Token) -> None:
+    _current.reset(token)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, perf_counter() - start)
@@ -1,15 +1,26 @@
-from app.repositories.user_repository import UserRepository
-from app.repositories.subscription_repository import SubscriptionRepository
-from app.repositories.transaction_repository import TransactionRepository
-from app.repositories.usage_log_repository import UsageLogRepository
+from app.repositories.user_repository import UserRepository, AsyncUserRepository
+from app.repositories.subscription_repository import SubscriptionRepository, AsyncSubscriptionRepository
+from app.repositories.transaction_repository import TransactionRepository, AsyncTransactionRepository
+from app.repositories.usage_log_repository import UsageLogRepository, AsyncUsageLogRepository
+from app.repositories.prediction_event_repository import PredictionEventRepository, AsyncPredictionEventRepository
 from app.repositories.user_settings_repository import UserSettingsRepository
+from app.repositories.system_setting_repository import SystemSettingRepository
+from app.repositories.job_lock_repository import JobLockRepository
 
 __all__ = [
     "UserRepository",
+    "AsyncUserRepository",
     "SubscriptionRepository",
+    "AsyncSubscriptionRepository",
     "TransactionRepository",
+    "AsyncTransactionRepository",
     "UsageLogRepository",
+    "AsyncUsageLogRepository",
+    "PredictionEventRepository",
+    "AsyncPredictionEventRepository",
     "UserSettingsRepository",
+    "SystemSettingRepository",
+    "JobLockRepository",
 ]
 
 
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.job_lock import JobLock
+
+
+class JobLockRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def try_acquire(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """
+        Take (or extend) the lock if it is free, expired or already ours.
+        One conditional UPDATE, or an INSERT for a lock that never existed.
+        """
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=ttl_seconds)
+        taken = self.db.execute(
+            update(JobLock)
+            .where(JobLock.name == name, or_(JobLock.expires_at < now, JobLock.owner == owner))
+            .values(owner=owner, expires_at=expires_at)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if taken:
+            self.db.commit()
+            return True
+        try:
+            self.db.add(JobLock(name=name, owner=owner, expires_at=expires_at))
+            self.db.commit()
+            return True
+        except IntegrityError:
+            # Row exists and is held by another worker
+            self.db.rollback()
+            return False
+
+    def release(self, name: str, owner: str) -> None:
+        self.db.query(JobLock).filter(JobLock.name == name, JobLock.owner == owner).delete(
+            synchronize_session=False
+        )
+        self.db.commit()
@@ -0,0 +1,71 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import case, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.prediction_event import PredictionEvent
+
+
+def class_mask(classes: Sequence[str], detected: Sequence[str]) -> int:
+    """Bitmask of ``detected`` over ``classes`` (bit i = classes[i])"""
+    return sum(1 << i for i, name in enumerate(classes) if name in detected)
+
+
+def _category_sums(classes: Sequence[str]) -> List:
+    """One SUM(CASE mask & bit) column per class, so a breakdown is a single scan"""
+    return [
+        func.coalesce(func.sum(case((PredictionEvent.class_mask.op("&")(1 << i) != 0, 1), else_=0)), 0)
+        for i in range(len(classes))
+    ]
+
+
+class PredictionEventRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def add(
+        self,
+        user_id: int,
+        blocked: bool,
+        class_mask: int,
+        max_prob: float,
+        threshold: float,
+        model_version: str,
+        image_digest: str,
+        created_at: Optional[datetime] = None,
+    ) -> PredictionEvent:
+        """Stage an event without committing (caller owns the transaction)"""
+        event = PredictionEvent(
+            user_id=user_id,
+            blocked=blocked,
+            class_mask=class_mask,
+            max_prob=max_prob,
+            threshold=threshold,
+            model_version=model_version,
+            image_digest=image_digest,
+            created_at=created_at or datetime.utcnow(),
+        )
+        self.db.add(event)
+        return event
+
+    def blocked_by_category(self, start: datetime, classes: Sequence[str]) -> Dict[str, int]:
+        """Blocked predictions since ``start`` per class (range scan on ix_prediction_events_blocked_created)"""
+        row = self.db.query(*_category_sums(classes)).filter(
+            PredictionEvent.blocked.is_(True),
+            PredictionEvent.created_at >= start,
+        ).one()
+        return dict(zip(classes, row))
+
+
+class AsyncPredictionEventRepository:
+    """PredictionEventRepository for AsyncSession (async endpoints)"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create(self, **fields) -> PredictionEvent:
+        event = PredictionEventRepository(self.db).add(**fields)
+        await self.db.flush()
+        return event
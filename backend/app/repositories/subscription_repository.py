@@ -1,6 +1,8 @@
+from sqlalchemy import case, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.subscription import Subscription, PlanType, SubscriptionStatus
-from typing import Optional, List
+from typing import Callable, Optional, List
 from datetime import datetime
 
 
@@ -18,12 +20,11 @@ class SubscriptionRepository:
             expires_at=expires_at
         )
         self.db.add(subscription)
-        self.db.commit()
-        self.db.refresh(subscription)
+        self.db.flush()
         return subscription
     
     def get_by_id(self, subscription_id: int) -> Optional[Subscription]:
-        return self.db.query(Subscription).filter(Subscription.id == subscription_id).first()
+        return self.db.get(Subscription, subscription_id)
     
     def get_active_by_user(self, user_id: int) -> Optional[Subscription]:
         """
@@ -48,24 +49,61 @@ class SubscriptionRepository:
         subscription = self.get_by_id(subscription_id)
         if subscription:
             subscription.used_quota += count
-            self.db.commit()
-            self.db.refresh(subscription)
+            self.db.flush()
         return subscription
     
+    def reserve_quota(self, subscription_id: int, count: int = 1) -> Optional[int]:
+        """
+        Atomically take `count` units in a single UPDATE, only if they still fit
+        in monthly_quota. Returns the remaining quota, or None if rejected.
+        Commits on its own: the reservation must be durable and visible to other
+        workers before the prediction runs, independent of the request's unit of work.
+        """
+        fits = Subscription.used_quota + count <= Subscription.monthly_quota
+        stmt = (
+            update(Subscription)
+            .where(Subscription.id == subscription_id, fits)
+            .values(used_quota=Subscription.used_quota + count)
+            .execution_options(synchronize_session=False)
+        )
+        if self.db.get_bind().dialect.update_returning:
+            remaining = self.db.execute(
+                stmt.returning(Subscription.monthly_quota - Subscription.used_quota)
+            ).scalar_one_or_none()
+        else:
+            remaining = None
+            if self.db.execute(stmt).rowcount:
+                remaining = self.db.query(
+                    Subscription.monthly_quota - Subscription.used_quota
+                ).filter(Subscription.id == subscription_id).scalar()
+        self.db.commit()
+        return remaining
+    
+    def refund_quota(self, subscription_id: int, count: int = 1) -> None:
+        """Give back units taken by reserve_quota (never below zero); commits like reserve_quota"""
+        self.db.execute(
+            update(Subscription)
+            .where(Subscription.id == subscription_id)
+            .values(used_quota=case(
+                (Subscription.used_quota >= count, Subscription.used_quota - count),
+                else_=0,
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+    
     def reset_usage(self, subscription_id: int) -> Optional[Subscription]:
         subscription = self.get_by_id(subscription_id)
         if subscription:
             subscription.used_quota = 0
-            self.db.commit()
-            self.db.refresh(subscription)
+            self.db.flush()
         return subscription
     
     def update_status(self, subscription_id: int, status: SubscriptionStatus) -> Optional[Subscription]:
         subscription = self.get_by_id(subscription_id)
         if subscription:
             subscription.status = status
-            self.db.commit()
-            self.db.refresh(subscription)
+            self.db.flush()
         return subscription
     
     def bulk_update_status(self, subscription_ids: List[int], status: SubscriptionStatus) -> int:
@@ -73,13 +111,140 @@ class SubscriptionRepository:
         result = self.db.query(Subscription).filter(Subscription.id.in_(subscription_ids)).update(
             {"status": status}, synchronize_session=False
         )
-        self.db.commit()
         return result
     
+    def get_due_for_expiry(self, now: datetime, limit: int) -> List[Subscription]:
+        """ACTIVE/CANCELLED subscriptions whose expires_at has passed (oldest first)"""
+        return self.db.query(Subscription).filter(
+            Subscription.status.in_((SubscriptionStatus.ACTIVE, SubscriptionStatus.CANCELLED)),
+            Subscription.expires_at < now,
+        ).order_by(Subscription.id).limit(limit).all()
+    
+    def get_user_ids_with_newer_current(self, due: List[Subscription], now: datetime) -> set:
+        """
+        Users from `due` who also hold a newer, unexpired ACTIVE/CANCELLED subscription
+        (e.g. upgraded PLUS -> PRO), i.e. whose current plan is not the one expiring.
+        """
+        latest_due = {}
+        for subscription in due:
+            latest_due[subscription.user_id] = max(subscription.created_at, latest_due.get(subscription.user_id, subscription.created_at))
+        rows = self.db.query(Subscription.user_id, Subscription.created_at).filter(
+            Subscription.user_id.in_(list(latest_due)),
+            Subscription.status.in_((SubscriptionStatus.ACTIVE, SubscriptionStatus.CANCELLED)),
+            (Subscription.expires_at.is_(None)) | (Subscription.expires_at >= now),
+        ).all()
+        return {row.user_id for row in rows if row.created_at > latest_due[row.user_id]}
+    
+    def bulk_create_free(self, user_ids: List[int], monthly_quota: int) -> None:
+        """
+        Batch INSERT of FREE subscriptions, in the caller's transaction together
+        with bulk_update_status so expiry + downgrade land atomically.
+        """
+        if not user_ids:
+            return
+        now = datetime.utcnow()
+        self.db.execute(insert(Subscription), [
+            {"user_id": user_id, "plan": PlanType.FREE, "status": SubscriptionStatus.ACTIVE,
+             "monthly_quota": monthly_quota, "used_quota": 0, "created_at": now, "updated_at": now}
+            for user_id in user_ids
+        ])
+    
+    def reset_usage_chunked(self, chunk_size: int, after_id: int = 0,
+                            on_chunk: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Set used_quota = 0 for every subscription with id > ``after_id``, one id range
+        per UPDATE/commit so writers are never blocked for long. ``on_chunk(last_id)``
+        runs in each chunk's transaction (progress saved atomically with the chunk).
+        Returns rows reset.
+        """
+        max_id = self.db.query(func.max(Subscription.id)).scalar() or 0
+        reset = 0
+        for low in range(after_id, max_id, chunk_size):
+            high = min(low + chunk_size, max_id)
+            reset += self.db.execute(
+                update(Subscription)
+                .where(Subscription.id > low, Subscription.id <= high, Subscription.used_quota != 0)
+                .values(used_quota=0)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if on_chunk is not None:
+                on_chunk(high)
+            self.db.commit()
+        return reset
+    
     def update(self, subscription: Subscription) -> Subscription:
-        self.db.commit()
-        self.db.refresh(subscription)
+        self.db.flush()
+        return subscription
+
+
+class AsyncSubscriptionRepository:
+    """SubscriptionRepository for AsyncSession (async endpoints: predict quota path)"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create(self, user_id: int, plan: PlanType, monthly_quota: int,
+                     expires_at: Optional[datetime] = None) -> Subscription:
+        subscription = Subscription(
+            user_id=user_id,
+            plan=plan,
+            status=SubscriptionStatus.ACTIVE,
+            monthly_quota=monthly_quota,
+            expires_at=expires_at
+        )
+        self.db.add(subscription)
+        await self.db.flush()
         return subscription
 
+    async def get_active_by_user(self, user_id: int) -> Optional[Subscription]:
+        """Same rule as SubscriptionRepository.get_active_by_user"""
+        return await self.db.scalar(
+            select(Subscription).where(
+                Subscription.user_id == user_id,
+                or_(
+                    Subscription.status == SubscriptionStatus.ACTIVE,
+                    Subscription.status == SubscriptionStatus.CANCELLED
+                )
+            ).order_by(Subscription.created_at.desc()).limit(1)
+        )
 
+    async def update_status(self, subscription: Subscription, status: SubscriptionStatus) -> Subscription:
+        subscription.status = status
+        await self.db.flush()
+        return subscription
 
+    async def reserve_quota(self, subscription_id: int, count: int = 1) -> Optional[int]:
+        """See SubscriptionRepository.reserve_quota"""
+        fits = Subscription.used_quota + count <= Subscription.monthly_quota
+        stmt = (
+            update(Subscription)
+            .where(Subscription.id == subscription_id, fits)
+            .values(used_quota=Subscription.used_quota + count)
+            .execution_options(synchronize_session=False)
+        )
+        if self.db.bind.dialect.update_returning:
+            remaining = (await self.db.execute(
+                stmt.returning(Subscription.monthly_quota - Subscription.used_quota)
+            )).scalar_one_or_none()
+        else:
+            remaining = None
+            if (await self.db.execute(stmt)).rowcount:
+                remaining = await self.db.scalar(
+                    select(Subscription.monthly_quota - Subscription.used_quota)
+                    .where(Subscription.id == subscription_id)
+                )
+        await self.db.commit()
+        return remaining
+
+    async def refund_quota(self, subscription_id: int, count: int = 1) -> None:
+        """See SubscriptionRepository.refund_quota"""
+        await self.db.execute(
+            update(Subscription)
+            .where(Subscription.id == subscription_id)
+            .values(used_quota=case(
+                (Subscription.used_quota >= count, Subscription.used_quota - count),
+                else_=0,
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
@@ -0,0 +1,23 @@
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.system_setting import SystemSetting
+
+
+class SystemSettingRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_value(self, key: str) -> Optional[str]:
+        setting = self.db.get(SystemSetting, key)
+        return setting.value if setting else None
+
+    def set_value(self, key: str, value: str, description: Optional[str] = None) -> SystemSetting:
+        setting = self.db.get(SystemSetting, key)
+        if setting is None:
+            setting = SystemSetting(key=key, description=description)
+            self.db.add(setting)
+        setting.value = value
+        self.db.flush()
+        return setting
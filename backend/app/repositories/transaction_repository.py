@@ -1,3 +1,5 @@
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.transaction import Transaction, TransactionType, TransactionStatus
 from typing import Optional, List
@@ -20,12 +22,11 @@ class TransactionRepository:
             description=description
         )
         self.db.add(transaction)
-        self.db.commit()
-        self.db.refresh(transaction)
+        self.db.flush()
         return transaction
     
     def get_by_id(self, transaction_id: int) -> Optional[Transaction]:
-        return self.db.query(Transaction).filter(Transaction.id == transaction_id).first()
+        return self.db.get(Transaction, transaction_id)
     
     def get_by_momo_request_id(self, request_id: str) -> Optional[Transaction]:
         return self.db.query(Transaction).filter(
@@ -49,14 +50,57 @@ class TransactionRepository:
             transaction.status = status
             if momo_transaction_id:
                 transaction.momo_transaction_id = momo_transaction_id
-            self.db.commit()
-            self.db.refresh(transaction)
+            self.db.flush()
         return transaction
     
     def update(self, transaction: Transaction) -> Transaction:
-        self.db.commit()
-        self.db.refresh(transaction)
+        self.db.flush()
         return transaction
 
 
+class AsyncTransactionRepository:
+    """TransactionRepository for AsyncSession (async endpoints)"""
 
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create(self, user_id: int, amount: float, tx_type: TransactionType,
+                     status: TransactionStatus = TransactionStatus.PENDING,
+                     momo_request_id: Optional[str] = None,
+                     description: Optional[str] = None) -> Transaction:
+        transaction = Transaction(
+            user_id=user_id,
+            amount=amount,
+            type=tx_type,
+            status=status,
+            momo_request_id=momo_request_id,
+            description=description
+        )
+        self.db.add(transaction)
+        await self.db.flush()
+        return transaction
+
+    async def get_by_id(self, transaction_id: int) -> Optional[Transaction]:
+        return await self.db.get(Transaction, transaction_id)
+
+    async def get_by_momo_request_id(self, request_id: str) -> Optional[Transaction]:
+        return await self.db.scalar(
+            select(Transaction).where(Transaction.momo_request_id == request_id).limit(1)
+        )
+
+    async def finish_pending(self, transaction_id: int, status: TransactionStatus,
+                             momo_transaction_id: Optional[str] = None) -> bool:
+        """
+        PENDING -> ``status`` in one conditional UPDATE. False if the transaction
+        was already settled (duplicate/concurrent IPN), so credits are added once.
+        """
+        values = {"status": status}
+        if momo_transaction_id:
+            values["momo_transaction_id"] = momo_transaction_id
+        result = await self.db.execute(
+            update(Transaction)
+            .where(Transaction.id == transaction_id, Transaction.status == TransactionStatus.PENDING)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        return bool(result.rowcount)
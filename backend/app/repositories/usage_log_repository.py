@@ -1,3 +1,4 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.usage_log import UsageLog
 from typing import List, Optional
@@ -8,7 +9,7 @@ class UsageLogRepository:
     def __init__(self, db: Session):
         self.db = db
     
-    def create(
+    def add(
         self,
         user_id: int,
         endpoint: str,
@@ -17,6 +18,7 @@ class UsageLogRepository:
         response_time_ms: float = None,
         meta_data: Optional[str] = None,
     ) -> UsageLog:
+        """Stage a log row without committing (caller owns the transaction)"""
         log = UsageLog(
             user_id=user_id,
             endpoint=endpoint,
@@ -26,8 +28,19 @@ class UsageLogRepository:
             meta_data=meta_data,
         )
         self.db.add(log)
-        self.db.commit()
-        self.db.refresh(log)
+        return log
+
+    def create(
+        self,
+        user_id: int,
+        endpoint: str,
+        method: str,
+        status_code: int = None,
+        response_time_ms: float = None,
+        meta_data: Optional[str] = None,
+    ) -> UsageLog:
+        log = self.add(user_id, endpoint, method, status_code, response_time_ms, meta_data)
+        self.db.flush()
         return log
     
     def get_by_user(self, user_id: int, limit: int = 100) -> List[UsageLog]:
@@ -50,3 +63,22 @@ class UsageLogRepository:
         start_of_month = datetime(now.year, now.month, 1)
         return self.count_by_user_in_period(user_id, start_of_month)
 
+
+class AsyncUsageLogRepository:
+    """UsageLogRepository for AsyncSession (async endpoints)"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create(
+        self,
+        user_id: int,
+        endpoint: str,
+        method: str,
+        status_code: int = None,
+        response_time_ms: float = None,
+        meta_data: Optional[str] = None,
+    ) -> UsageLog:
+        log = UsageLogRepository(self.db).add(user_id, endpoint, method, status_code, response_time_ms, meta_data)
+        await self.db.flush()
+        return log
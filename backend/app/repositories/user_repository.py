@@ -1,6 +1,8 @@
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.user import User
-from typing import Optional
+from typing import Optional, Set, Tuple
 
 
 class UserRepository:
@@ -17,12 +19,11 @@ class UserRepository:
             avatar=avatar
         )
         self.db.add(user)
-        self.db.commit()
-        self.db.refresh(user)
+        self.db.flush()
         return user
     
     def get_by_id(self, user_id: int) -> Optional[User]:
-        return self.db.query(User).filter(User.id == user_id).first()
+        return self.db.get(User, user_id)  # Identity map first, SELECT only if not loaded
     
     def get_by_email(self, email: str) -> Optional[User]:
         return self.db.query(User).filter(User.email == email).first()
@@ -30,18 +31,39 @@ class UserRepository:
     def get_by_google_id(self, google_id: str) -> Optional[User]:
         return self.db.query(User).filter(User.google_id == google_id).first()
     
+    def get_principal(self, user_id: int) -> Optional[Tuple[bool, bool]]:
+        """(is_admin, is_active) without loading the full row"""
+        row = self.db.query(User.is_admin, User.is_active).filter(User.id == user_id).first()
+        return (bool(row.is_admin), bool(row.is_active)) if row else None
+    
+    def get_inactive_ids(self) -> Set[int]:
+        return {row.id for row in self.db.query(User.id).filter(User.is_active == 0).all()}
+    
     def update_credits(self, user_id: int, amount: float) -> Optional[User]:
         user = self.get_by_id(user_id)
         if user:
             user.credits += amount
-            self.db.commit()
-            self.db.refresh(user)
+            self.db.flush()
         return user
     
     def update(self, user: User) -> User:
-        self.db.commit()
-        self.db.refresh(user)
+        self.db.flush()
         return user
 
 
+class AsyncUserRepository:
+    """UserRepository for AsyncSession (async endpoints)"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_by_id(self, user_id: int) -> Optional[User]:
+        return await self.db.get(User, user_id)
 
+    async def update_credits(self, user_id: int, amount: float) -> bool:
+        """Atomic ``credits = credits + amount`` (no read-modify-write race)"""
+        result = await self.db.execute(
+            update(User).where(User.id == user_id).values(credits=User.credits + amount)
+            .execution_options(synchronize_session=False)
+        )
+        return bool(result.rowcount)
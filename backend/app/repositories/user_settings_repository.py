@@ -30,13 +30,11 @@ class UserSettingsRepository:
             theme=theme,
         )
         self.db.add(settings)
-        self.db.commit()
-        self.db.refresh(settings)
+        self.db.flush()
         return settings
 
     def update_fields(self, settings: UserSettings, updates: Dict[str, Any]) -> UserSettings:
         for key, value in updates.items():
             setattr(settings, key, value)
-        self.db.commit()
-        self.db.refresh(settings)
+        self.db.flush()
         return settings
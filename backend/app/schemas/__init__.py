@@ -24,6 +24,7 @@ __all__ = [
     "PrivacySettings",
     "UserSettings",
     "UserSettingsUpdate",
+    "BlockedByCategory",
     "UserStatistics",
 ]
 
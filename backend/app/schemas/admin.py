@@ -10,6 +10,18 @@ class OverviewStats(BaseModel):
     pending_reports: int
     total_revenue: float
     blocked_images_count: int
+    active_week: int = 0
+    active_month: int = 0
+    latency_p50_ms: Optional[float] = None  # Predict model time, last 24h
+    latency_p95_ms: Optional[float] = None
+    latency_p99_ms: Optional[float] = None
+
+class EndpointLatency(BaseModel):
+    endpoint: str
+    count: int
+    p50_ms: Optional[float] = None
+    p95_ms: Optional[float] = None
+    p99_ms: Optional[float] = None
 
 class UsageDataPoint(BaseModel):
     date: str
@@ -62,9 +62,17 @@ class UserProfileUpdate(BaseModel):
     email: Optional[EmailStr] = None
 
 
+class BlockedByCategory(BaseModel):
+    """Blocked counts per extension filter category (settings.MODEL_CLASS_CATEGORIES)"""
+    sensitive: int = 0
+    violence: int = 0
+    toxicity: int = 0
+    vice: int = 0
+
+
 class UserStatistics(BaseModel):
     totalBlocked: int
     todayBlocked: int
     weeklyBlocked: int
     monthlyBlocked: int
-    byCategory: Dict[str, int]
+    byCategory: BlockedByCategory
@@ -6,15 +6,24 @@ import random
 
 from app.models.user import User
 from app.models.usage_log import UsageLog
+from app.models.usage_rollup import ALL_CATEGORIES, UsageDailyRollup
+from app.repositories.prediction_event_repository import PredictionEventRepository
+from app.services.analytics_sketches import active_users, latency_quantiles
+from app.config import get_settings
 from app.schemas.admin import (
-    OverviewStats, UsageStats, UsageDataPoint, AccuracyStats,
+    OverviewStats, EndpointLatency, UsageStats, UsageDataPoint, AccuracyStats,
     TopCategory, Activity, ActivityType, Report, ReportStatus, ReportAction,
     AdminUser, AdminUserList, AdminUserUpdate, SystemSettingItem, SystemSettingsUpdate
 )
 from app.models.transaction import Transaction, TransactionStatus, TransactionType
 from app.models.system_setting import SystemSetting
+from app.services.principal_cache import principal_cache
+from app.services.subscription_cache import subscription_cache
+from app.services.token_cache import revoked_users
 import json
 
+settings = get_settings()
+
 # Mock Data Store for Reports (In-memory for demo purposes)
 # In a real app, this would be a database table
 MOCK_REPORTS = []
@@ -46,14 +55,18 @@ class AdminService:
     def get_overview_stats(db: Session) -> OverviewStats:
         total_users = db.query(User).count()
         
-        today = datetime.utcnow().date()
-        active_today = db.query(UsageLog.user_id).filter(
-            func.date(UsageLog.created_at) == today
-        ).distinct().count()
+        # Distinct users from the daily HyperLogLogs (estimates, no usage_logs scan)
+        active_today, active_week, active_month = (active_users(db, days) for days in (1, 7, 30))
+        predict_latency = next(
+            (item["quantiles"] for item in latency_quantiles(db, 24) if item["endpoint"] == "/api/v1/predict"), {}
+        )
         
-        # Mocking blocked content count based on usage logs (assuming 10% block rate for demo)
-        total_usage = db.query(UsageLog).count()
-        content_blocked = int(total_usage * 0.12) 
+        # Counts come from the daily rollup (one row per day/endpoint/plan/blocked),
+        # not from scanning usage_logs
+        blocked_images_count = db.query(func.coalesce(func.sum(UsageDailyRollup.requests), 0)).filter(
+            UsageDailyRollup.category == ALL_CATEGORIES,
+            UsageDailyRollup.blocked.is_(True)
+        ).scalar()
         
         pending_reports = len([r for r in MOCK_REPORTS if r.status == ReportStatus.PENDING])
         
@@ -63,24 +76,34 @@ class AdminService:
             Transaction.type.in_([TransactionType.TOPUP, TransactionType.PURCHASE])
         ).scalar() or 0.0
 
-        # Calculate blocked images count
-        # We need to check meta_data for "blocked": true
-        # Since meta_data is a string, we might need to do a like query or load and filter
-        # For better performance in production, this should be a separate column or indexed JSONB
-        # For now, we'll use a simple LIKE query as a heuristic
-        blocked_images_count = db.query(UsageLog).filter(
-            UsageLog.meta_data.like('%"blocked": true%')
-        ).count()
-
         return OverviewStats(
             total_users=total_users,
             active_today=active_today,
-            content_blocked=content_blocked, # This was the mock one, maybe we should replace it?
+            content_blocked=blocked_images_count,
+            active_week=active_week,
+            active_month=active_month,
+            latency_p50_ms=predict_latency.get(0.5),
+            latency_p95_ms=predict_latency.get(0.95),
+            latency_p99_ms=predict_latency.get(0.99),
             pending_reports=pending_reports,
             total_revenue=total_revenue,
             blocked_images_count=blocked_images_count
         )
 
+    @staticmethod
+    def get_latency_stats(db: Session, hours: int = 24) -> List[EndpointLatency]:
+        """p50/p95/p99 response time per endpoint, merged from the hourly DDSketches"""
+        return [
+            EndpointLatency(
+                endpoint=item["endpoint"],
+                count=item["count"],
+                p50_ms=item["quantiles"][0.5],
+                p95_ms=item["quantiles"][0.95],
+                p99_ms=item["quantiles"][0.99],
+            )
+            for item in latency_quantiles(db, hours)
+        ]
+
     @staticmethod
     def get_usage_stats(db: Session, range_str: str = "30d") -> UsageStats:
         # Simple implementation for 30d
@@ -88,15 +111,16 @@ class AdminService:
         start_date = end_date - timedelta(days=30)
         
         logs = db.query(
-            func.date(UsageLog.created_at).label("date"),
-            func.count(UsageLog.id).label("count")
+            UsageDailyRollup.day,
+            func.sum(UsageDailyRollup.requests).label("count")
         ).filter(
-            UsageLog.created_at >= start_date
+            UsageDailyRollup.day >= start_date.date(),
+            UsageDailyRollup.category == ALL_CATEGORIES
         ).group_by(
-            func.date(UsageLog.created_at)
+            UsageDailyRollup.day
         ).all()
         
-        usage_map = {str(log.date): log.count for log in logs}
+        usage_map = {str(log.day): log.count for log in logs}
         usage_over_time = []
         
         current = start_date
@@ -125,13 +149,16 @@ class AdminService:
 
     @staticmethod
     def get_top_categories(db: Session, range_str: str = "30d") -> List[TopCategory]:
-        # Mock categories
+        """Share of each model class among blocked predictions of the last 30 days"""
+        start_date = datetime.utcnow() - timedelta(days=30)
+        counts = PredictionEventRepository(db).blocked_by_category(start_date, settings.MODEL_CLASSES)
+        total = sum(counts.values())
+        if not total:
+            return []
         return [
-            TopCategory(category="Hate Speech", percentage=30.0),
-            TopCategory(category="Violence", percentage=25.0),
-            TopCategory(category="Nudity", percentage=20.0),
-            TopCategory(category="Misinformation", percentage=15.0),
-            TopCategory(category="Spam", percentage=10.0),
+            TopCategory(category=category, percentage=round(count * 100.0 / total, 1))
+            for category, count in sorted(counts.items(), key=lambda item: item[1], reverse=True)
+            if count
         ]
 
     @staticmethod
@@ -265,8 +292,13 @@ class AdminService:
         if update_data.is_admin is not None:
             user.is_admin = update_data.is_admin
             
+        # Commit before invalidating so no reader re-caches the old principal
         db.commit()
-        db.refresh(user)
+        subscription_cache.invalidate(user_id)
+        principal_cache.invalidate(user_id)
+        if update_data.is_active is not None:
+            # Effective immediately on this worker, others pick it up on refresh
+            (revoked_users.restore if update_data.is_active else revoked_users.revoke)(user_id)
         return {"success": True, "message": "User updated successfully"}
 
     @staticmethod
@@ -293,5 +325,5 @@ class AdminService:
                 )
                 db.add(new_setting)
         
-        db.commit()
+        db.flush()
         return {"success": True, "message": "Settings updated successfully"}
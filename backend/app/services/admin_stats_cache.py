@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from app.config import get_settings
+from app.monitoring.metrics import CACHE_REQUESTS
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class _Snapshot(NamedTuple):
+    value: Any
+    computed_at: float  # time.monotonic()
+
+
+class StaleWhileRevalidateCache:
+    """
+    Cache kết quả các endpoint dashboard admin (per worker), key = (endpoint, tham số).
+    - Trong ``soft_ttl``: trả snapshot.
+    - Quá ``soft_ttl``: vẫn trả snapshot cũ ngay, tính lại ở thread nền.
+    - Chưa có hoặc quá ``hard_ttl``: tính trong request.
+    Mỗi key chỉ có một lần tính đang chạy; request đồng thời chờ chung kết quả đó.
+    """
+
+    def __init__(self, soft_ttl: float, hard_ttl: float, max_entries: int = 256, workers: int = 2):
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, _Snapshot] = {}
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Tuple[Any, float]:
+        """(value, age in seconds) for ``key``; ``compute`` must not use the caller's DB session"""
+        with self._lock:
+            now = time.monotonic()
+            snapshot = self._entries.get(key)
+            if snapshot is not None and now - snapshot.computed_at < self.hard_ttl:
+                age = now - snapshot.computed_at
+                if age >= self.soft_ttl:
+                    CACHE_REQUESTS.labels("admin_stats", "stale").inc()
+                    if key not in self._inflight:
+                        self._inflight[key] = self._background().submit(self._refresh, key, compute)
+                else:
+                    CACHE_REQUESTS.labels("admin_stats", "hit").inc()
+                return snapshot.value, age
+            CACHE_REQUESTS.labels("admin_stats", "miss").inc()
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if leader:
+            try:
+                future.set_result(self._refresh(key, compute))
+            except Exception as e:
+                future.set_exception(e)
+        value = future.result()  # Followers wait for the leader's (or the background) computation
+        return value, 0.0
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one snapshot (or all); the next request recomputes it"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _refresh(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        try:
+            value = compute()
+        except Exception as e:
+            logger.warning(f"Admin stats refresh of {key!r} failed, keeping the last snapshot: {e}")
+            with self._lock:
+                self._inflight.pop(key, None)
+            raise
+        with self._lock:
+            if len(self._entries) >= self.max_entries and key not in self._entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k].computed_at)
+                del self._entries[oldest]
+            self._entries[key] = _Snapshot(value, time.monotonic())
+            self._inflight.pop(key, None)
+        return value
+
+    def _background(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self._workers, thread_name_prefix="admin-stats-refresh")
+        return self._executor
+
+
+admin_stats_cache = StaleWhileRevalidateCache(
+    soft_ttl=settings.ADMIN_STATS_CACHE_SOFT_TTL_SECONDS,
+    hard_ttl=settings.ADMIN_STATS_CACHE_HARD_TTL_SECONDS,
+)
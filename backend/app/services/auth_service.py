@@ -1,20 +1,37 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
-import httpx
-import hashlib
-import bcrypt
 
 from app.config import get_settings
 from app.repositories.user_repository import UserRepository
 from app.repositories.subscription_repository import SubscriptionRepository
 from app.models.user import User
 from app.models.subscription import PlanType
+from app.services.http_clients import http_clients, request_with_retries
+from app.services.password_hasher import password_hasher
 
 settings = get_settings()
 
 
+def decode_access_claims(token: str) -> Optional[Tuple[int, Optional[int]]]:
+    """Verify a JWT access token and return (user_id, exp timestamp), no DB access"""
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+        user_id: str = payload.get("sub")
+        if user_id is None:
+            return None
+        return int(user_id), payload.get("exp")
+    except (JWTError, ValueError):
+        return None
+
+
+def decode_access_token(token: str) -> Optional[int]:
+    """Verify a JWT access token and return its user_id (no DB access)"""
+    claims = decode_access_claims(token)
+    return claims[0] if claims else None
+
+
 class AuthService:
     """Service xử lý authentication (đăng ký, đăng nhập, JWT)"""
     
@@ -24,22 +41,12 @@ class AuthService:
         self.subscription_repo = SubscriptionRepository(db)
     
     def hash_password(self, password: str) -> str:
-        """Mã hóa password bằng SHA-256 + bcrypt (hỗ trợ password dài không giới hạn)"""
-        # Luôn hash bằng SHA-256 trước để đảm bảo input cho bcrypt là 64 hex chars (32 bytes)
-        # Điều này cho phép password bất kỳ độ dài nào
-        password_sha256 = hashlib.sha256(password.encode('utf-8')).hexdigest()
-        # Bcrypt giới hạn 72 bytes, nhưng SHA256 hexdigest chỉ 64 chars (32 bytes)
-        # Hash bằng bcrypt trực tiếp (không dùng passlib)
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password_sha256.encode('utf-8'), salt)
-        return hashed.decode('utf-8')
+        """Mã hóa password bằng SHA-256 + bcrypt trong pool riêng (xem PasswordHasher)"""
+        return password_hasher.hash(password)
     
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Kiểm tra password có khớp với hash không"""
-        # Hash password bằng SHA-256 trước khi verify
-        password_sha256 = hashlib.sha256(plain_password.encode('utf-8')).hexdigest()
-        # Verify bằng bcrypt
-        return bcrypt.checkpw(password_sha256.encode('utf-8'), hashed_password.encode('utf-8'))
+        return password_hasher.verify(plain_password, hashed_password)
     
     def create_access_token(self, user_id: int) -> str:
         """Tạo JWT token cho user (expire sau 7 ngày)"""
@@ -50,14 +57,7 @@ class AuthService:
     
     def decode_token(self, token: str) -> Optional[int]:
         """Giải mã JWT token và trả về user_id"""
-        try:
-            payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-            user_id: str = payload.get("sub")
-            if user_id is None:
-                return None
-            return int(user_id)
-        except JWTError:
-            return None
+        return decode_access_token(token)
     
     def register(self, email: str, password: str, name: Optional[str] = None) -> User:
         """Đăng ký user mới với email/password và tạo gói FREE"""
@@ -78,18 +78,20 @@ class AuthService:
         return user
     
     def login(self, email: str, password: str) -> Optional[User]:
-        """Đăng nhập bằng email/password"""
+        """Đăng nhập bằng email/password (hash cost thấp hơn hiện tại được nâng cấp luôn)"""
         user = self.user_repo.get_by_email(email)
         if not user or not user.hashed_password:
             return None
         if not self.verify_password(password, user.hashed_password):
             return None
+        if password_hasher.needs_rehash(user.hashed_password):
+            user.hashed_password = self.hash_password(password)
+            self.user_repo.update(user)
         return user
     
     async def google_login(self, code: str) -> User:
         """Đăng nhập/đăng ký bằng Google OAuth (tự động link account nếu email đã tồn tại)"""
         # Exchange code for token
-        token_url = "https://oauth2.googleapis.com/token"
         token_data = {
             "code": code,
             "client_id": settings.GOOGLE_CLIENT_ID,
@@ -98,18 +100,22 @@ class AuthService:
             "grant_type": "authorization_code",
         }
         
-        async with httpx.AsyncClient() as client:
-            token_response = await client.post(token_url, data=token_data)
-            token_response.raise_for_status()
-            tokens = token_response.json()
-            access_token = tokens.get("access_token")
-            
-            # Get user info
-            user_info_url = "https://www.googleapis.com/oauth2/v2/userinfo"
-            headers = {"Authorization": f"Bearer {access_token}"}
-            user_info_response = await client.get(user_info_url, headers=headers)
-            user_info_response.raise_for_status()
-            user_info = user_info_response.json()
+        client = http_clients.google
+        # Auth code chỉ dùng được 1 lần: không retry khi request có thể đã tới Google
+        token_response = await request_with_retries(
+            client, "POST", settings.GOOGLE_TOKEN_URL, idempotent=False, data=token_data
+        )
+        token_response.raise_for_status()
+        tokens = token_response.json()
+        access_token = tokens.get("access_token")
+        
+        # Get user info
+        headers = {"Authorization": f"Bearer {access_token}"}
+        user_info_response = await request_with_retries(
+            client, "GET", settings.GOOGLE_USERINFO_URL, idempotent=True, headers=headers
+        )
+        user_info_response.raise_for_status()
+        user_info = user_info_response.json()
         
         google_id = user_info.get("id")
         email = user_info.get("email")
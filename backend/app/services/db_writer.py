@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.monitoring.metrics import QUEUE_DEPTH
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+WriteJob = Callable[[Session], Any]
+
+
+class SerializedWriter:
+    """
+    Một thread ghi duy nhất cho SQLite (mỗi worker): các thread request đẩy job
+    vào queue thay vì tranh nhau write lock, writer gom tối đa ``max_batch`` job
+    vào một transaction (group commit, một fsync cho cả batch).
+
+    Batch lỗi thì rollback và chạy lại từng job riêng, nên job lỗi chỉ làm fail
+    Future của nó. Job không được tự commit; kết quả trả về sau khi COMMIT xong.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], max_batch: int):
+        self._session_factory = session_factory
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Optional[Tuple[WriteJob, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Drain queued writes, then stop"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def submit(self, job: WriteJob) -> Future:
+        future: Future = Future()
+        if self._thread is None:
+            # Not started (scripts): run inline in its own transaction
+            self._execute([(job, future)])
+            return future
+        self._queue.put((job, future))
+        QUEUE_DEPTH.labels("db_writer").set(self._queue.qsize())
+        return future
+
+    def run(self, job: WriteJob) -> Any:
+        return self.submit(job).result()
+
+    async def write(self, job: WriteJob) -> Any:
+        return await asyncio.wrap_future(self.submit(job))
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            QUEUE_DEPTH.labels("db_writer").set(self._queue.qsize())
+            self._execute(batch)
+            if stopping:
+                return
+
+    def _execute(self, batch: List[Tuple[WriteJob, Future]]) -> None:
+        batch = [(job, future) for job, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            results = self._commit(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # One bad job must not fail its neighbours: redo them one transaction each
+            logger.warning(f"DB writer batch of {len(batch)} failed ({e}), retrying individually")
+            for job, future in batch:
+                try:
+                    future.set_result(self._commit([(job, future)])[0])
+                except Exception as job_error:
+                    future.set_exception(job_error)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _commit(self, batch: List[Tuple[WriteJob, Future]]) -> List[Any]:
+        # No SAVEPOINT per job: pysqlite would turn each one into its own transaction
+        db = self._session_factory()
+        try:
+            results = [job(db) for job, _ in batch]
+            db.commit()
+            return results
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+db_writer = SerializedWriter(SessionLocal, max_batch=settings.DB_WRITER_MAX_BATCH)
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import random
+from typing import Collection, Optional
+
+import httpx
+
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Raised before the request reached the server: always safe to retry
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Gateway errors worth retrying for idempotent calls
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class HttpClients:
+    """
+    Pooled httpx.AsyncClient dùng chung cho cả app (tạo trong lifespan): giữ
+    keep-alive/HTTP2 tới Google và MoMo thay vì bắt tay TCP+TLS mỗi request.
+    """
+
+    def __init__(self):
+        self._google: Optional[httpx.AsyncClient] = None
+        self._momo: Optional[httpx.AsyncClient] = None
+
+    @staticmethod
+    def _build(read_timeout: float) -> httpx.AsyncClient:
+        http2 = settings.HTTP_CLIENT_HTTP2 and _http2_available()
+        if settings.HTTP_CLIENT_HTTP2 and not http2:
+            logger.warning("HTTP/2 requested but 'h2' is not installed (pip install httpx[http2]); using HTTP/1.1")
+        return httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(
+                connect=settings.HTTP_CLIENT_CONNECT_TIMEOUT,
+                read=read_timeout,
+                write=read_timeout,
+                pool=settings.HTTP_CLIENT_POOL_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE,
+                keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    def start(self) -> None:
+        if self._google is None:
+            self._google = self._build(settings.GOOGLE_HTTP_TIMEOUT)
+        if self._momo is None:
+            self._momo = self._build(settings.MOMO_HTTP_TIMEOUT)
+
+    async def stop(self) -> None:
+        for client in (self._google, self._momo):
+            if client is not None:
+                await client.aclose()
+        self._google = self._momo = None
+
+    @property
+    def google(self) -> httpx.AsyncClient:
+        if self._google is None:
+            self.start()  # Outside the lifespan (scripts, tests)
+        return self._google
+
+    @property
+    def momo(self) -> httpx.AsyncClient:
+        if self._momo is None:
+            self.start()
+        return self._momo
+
+
+async def request_with_retries(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    *,
+    idempotent: bool,
+    retries: Optional[int] = None,
+    retry_statuses: Collection[int] = RETRY_STATUSES,
+    **kwargs,
+) -> httpx.Response:
+    """
+    Gửi request với retry có giới hạn (exponential backoff + full jitter).
+    Lỗi kết nối (request chưa tới server) luôn được retry; timeout đọc và lỗi
+    502/503/504 chỉ retry khi ``idempotent`` (vd. đổi OAuth code không được gửi lại).
+    """
+    retries = settings.HTTP_CLIENT_RETRIES if retries is None else retries
+    attempt = 0
+    while True:
+        try:
+            response = await client.request(method, url, **kwargs)
+            if not (idempotent and response.status_code in retry_statuses and attempt < retries):
+                return response
+            reason = f"HTTP {response.status_code}"
+        except CONNECT_ERRORS as e:
+            if attempt >= retries:
+                raise
+            reason = repr(e)
+        except httpx.TimeoutException as e:
+            if not idempotent or attempt >= retries:
+                raise
+            reason = repr(e)
+        delay = random.uniform(0, settings.HTTP_CLIENT_BACKOFF_BASE * (2 ** attempt))
+        attempt += 1
+        logger.warning("%s %s failed (%s), retry %d/%d in %.2fs", method, url, reason, attempt, retries, delay)
+        await asyncio.sleep(delay)
+
+
+http_clients = HttpClients()
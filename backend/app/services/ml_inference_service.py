@@ -5,9 +5,13 @@ from torchvision import models
 from PIL import Image
 from typing import List, Dict
 from pathlib import Path
+import hashlib
 import io
 
 from app.config import get_settings
+from app.monitoring.metrics import INFERENCE_BATCH_SIZE
+from app.monitoring.profiling import torch_trace
+from app.monitoring.timing import track_stage
 
 settings = get_settings()
 BACKEND_ROOT = Path(__file__).resolve().parents[2]
@@ -44,6 +48,7 @@ class MLInferenceService:
         self.model = None
         self.transform = None
         self.class_names = settings.MODEL_CLASSES
+        self.model_version = settings.MODEL_VERSION
         self._load_model()
     
     def _load_model(self):
@@ -57,6 +62,8 @@ class MLInferenceService:
             if not model_path.is_absolute():
                 model_path = BACKEND_ROOT / model_path
             state_dict = torch.load(model_path, map_location=self.device)
+            if not self.model_version:
+                self.model_version = hashlib.sha256(model_path.read_bytes()).hexdigest()[:12]
             self.model.load_state_dict(state_dict)
             
             self.model.to(self.device)
@@ -77,15 +84,18 @@ class MLInferenceService:
             raise RuntimeError("Model not loaded")
         
         # Load and preprocess image
-        try:
-            image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        except Exception:
-            raise ValueError("Invalid image format")
+        with track_stage("decode"):
+            try:
+                image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+            except Exception:
+                raise ValueError("Invalid image format")
         
-        input_tensor = self.transform(image).unsqueeze(0).to(self.device)
+        with track_stage("preprocess"):
+            input_tensor = self.transform(image).unsqueeze(0).to(self.device)
         
         # Inference
-        with torch.no_grad():
+        INFERENCE_BATCH_SIZE.observe(input_tensor.shape[0])
+        with track_stage("forward"), torch.no_grad(), torch_trace.batch():
             logits = self.model(input_tensor)
             probabilities = torch.sigmoid(logits).cpu().numpy()[0].tolist()
         
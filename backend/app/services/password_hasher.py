@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+MIN_ROUNDS = 12  # Calibration never goes below the OWASP bcrypt minimum
+MAX_ROUNDS = 16
+CALIBRATION_ROUNDS = 10
+
+
+class HasherOverloaded(RuntimeError):
+    """Too many password hashes queued; callers answer 503"""
+
+
+def _prehash(password: str) -> bytes:
+    # SHA-256 trước để input cho bcrypt luôn là 64 hex chars (bcrypt giới hạn 72 bytes)
+    return hashlib.sha256(password.encode("utf-8")).hexdigest().encode("utf-8")
+
+
+def hash_password(password: str, rounds: int = 12) -> str:
+    """Mã hóa password bằng SHA-256 + bcrypt (hỗ trợ password dài không giới hạn)"""
+    return bcrypt.hashpw(_prehash(password), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Kiểm tra password có khớp với hash không"""
+    return bcrypt.checkpw(_prehash(plain_password), hashed_password.encode("utf-8"))
+
+
+def hash_rounds(hashed_password: str) -> int:
+    """Cost factor of a ``$2b$12$...`` hash"""
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+def calibrate_rounds(target_seconds: float) -> int:
+    """Highest bcrypt cost whose hash takes about ``target_seconds`` on this machine"""
+    started = time.perf_counter()
+    hash_password("calibration", CALIBRATION_ROUNDS)
+    elapsed = max(time.perf_counter() - started, 1e-4)
+    # Each extra round doubles the work
+    rounds = CALIBRATION_ROUNDS + int(math.floor(math.log2(target_seconds / elapsed)))
+    return max(MIN_ROUNDS, min(MAX_ROUNDS, rounds))
+
+
+class PasswordHasher:
+    """
+    Bcrypt trong executor riêng (thread hoặc process), tách khỏi threadpool của
+    các endpoint sync. Tối đa ``max_pending`` job (đang chạy + chờ); vượt quá thì
+    raise HasherOverloaded thay vì để login dồn ứ làm nghẽn cả server.
+    """
+
+    def __init__(self, workers: int, max_pending: int, rounds: int, target_ms: float, use_processes: bool):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = max(rounds, MIN_ROUNDS) if rounds else None  # None: calibrate on first use
+        self.target_ms = target_ms
+        self.use_processes = use_processes
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        if self.rounds is None:
+            self.rounds = calibrate_rounds(self.target_ms / 1000)
+            logger.info("bcrypt cost calibrated to %d for a %.0f ms target", self.rounds, self.target_ms)
+        if self._executor is None:
+            executor_cls = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            self._executor = executor_cls(max_workers=self.workers)
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def hash(self, password: str) -> str:
+        return self._run(hash_password, password, self._rounds())
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self._run(verify_password, plain_password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        # Upgrade only: workers calibrated slightly lower never downgrade a hash
+        return hash_rounds(hashed_password) < self._rounds()
+
+    def _rounds(self) -> int:
+        if self.rounds is None:
+            self.start()
+        return self.rounds
+
+    def _run(self, func, *args):
+        """
+        Run ``func`` in the hasher pool and wait for it. Called from sync endpoints
+        (Starlette threadpool), never from the event loop.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HasherOverloaded("Too many concurrent sign-ins, please retry shortly")
+            self._pending += 1
+        try:
+            if self._executor is None:
+                self.start()
+            return self._executor.submit(func, *args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    target_ms=settings.PASSWORD_HASH_TARGET_MS,
+    use_processes=settings.PASSWORD_HASH_USE_PROCESSES,
+)
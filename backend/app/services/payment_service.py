@@ -1,25 +1,25 @@
 import hashlib
 import hmac
 import uuid
-import httpx
 from typing import Dict, Any
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
-from app.repositories.user_repository import UserRepository
-from app.repositories.transaction_repository import TransactionRepository
+from app.repositories.user_repository import AsyncUserRepository
+from app.repositories.transaction_repository import AsyncTransactionRepository
 from app.models.transaction import TransactionType, TransactionStatus
+from app.services.http_clients import http_clients, request_with_retries
 
 settings = get_settings()
 
 
 class PaymentService:
-    """Service xử lý payment qua MoMo (captureWallet, verify IPN, cộng tiền vào ví)."""
+    """Service xử lý payment qua MoMo (captureWallet, verify IPN, cộng tiền vào ví). Dùng AsyncSession."""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
-        self.user_repo = UserRepository(db)
-        self.transaction_repo = TransactionRepository(db)
+        self.user_repo = AsyncUserRepository(db)
+        self.transaction_repo = AsyncTransactionRepository(db)
 
     @staticmethod
     def _sign(secret: str, raw: str) -> str:
@@ -36,7 +36,7 @@ class PaymentService:
         request_id = f"REQ_{uuid.uuid4().hex}"
 
         # Lưu giao dịch pending
-        self.transaction_repo.create(
+        transaction = await self.transaction_repo.create(
             user_id=user_id,
             amount=float(amount),
             tx_type=TransactionType.TOPUP,
@@ -44,6 +44,8 @@ class PaymentService:
             momo_request_id=request_id,
             description=f"Topup {amount} VND",
         )
+        # Durable before MoMo can call the IPN back
+        await self.db.commit()
 
         # Chuẩn bị tham số ký
         partner_code = settings.MOMO_PARTNER_CODE
@@ -87,17 +89,17 @@ class PaymentService:
             "lang": "vi",
         }
 
-        # Gửi request
-        async with httpx.AsyncClient(timeout=httpx.Timeout(30.0)) as client:
-            resp = await client.post(settings.MOMO_ENDPOINT, json=payload)
-            resp.raise_for_status()
-            result = resp.json()
+        # Gửi request (MoMo chống trùng theo orderId/requestId nên retry được)
+        resp = await request_with_retries(
+            http_clients.momo, "POST", settings.MOMO_ENDPOINT, idempotent=True, json=payload
+        )
+        resp.raise_for_status()
+        result = resp.json()
 
         # Check kết quả
         if result.get("resultCode") != 0:
-            tx = self.transaction_repo.get_by_momo_request_id(request_id)
-            if tx and tx.status == TransactionStatus.PENDING:
-                self.transaction_repo.update_status(tx.id, TransactionStatus.FAILED)
+            await self.transaction_repo.finish_pending(transaction.id, TransactionStatus.FAILED)
+            await self.db.commit()  # Keep the FAILED mark although the request errors out
             raise RuntimeError(f"MoMo error: {result.get('message')}")
 
         return {
@@ -129,13 +131,13 @@ class PaymentService:
         expected_signature = self._sign(settings.MOMO_SECRET_KEY, raw_signature)
         return expected_signature == ipn_data.get("signature")
 
-    def process_ipn(self, ipn_data: Dict[str, Any]) -> bool:
+    async def process_ipn(self, ipn_data: Dict[str, Any]) -> bool:
         """Xử lý callback từ MoMo: verify + cập nhật trạng thái"""
         if not self.verify_ipn_signature(ipn_data):
             raise ValueError("Invalid IPN signature")
 
         request_id = ipn_data.get("requestId")
-        tx = self.transaction_repo.get_by_momo_request_id(request_id)
+        tx = await self.transaction_repo.get_by_momo_request_id(request_id)
         if not tx:
             raise ValueError(f"Transaction not found: {request_id}")
 
@@ -143,13 +145,14 @@ class PaymentService:
             return True
 
         if ipn_data.get("resultCode") == 0:
-            self.transaction_repo.update_status(
+            # Only the IPN that moves it out of PENDING credits the wallet
+            if await self.transaction_repo.finish_pending(
                 tx.id,
                 TransactionStatus.SUCCESS,
                 momo_transaction_id=str(ipn_data.get("transId")),
-            )
-            self.user_repo.update_credits(tx.user_id, tx.amount)
+            ):
+                await self.user_repo.update_credits(tx.user_id, tx.amount)
             return True
         else:
-            self.transaction_repo.update_status(tx.id, TransactionStatus.FAILED)
+            await self.transaction_repo.finish_pending(tx.id, TransactionStatus.FAILED)
             return False
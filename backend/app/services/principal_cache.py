@@ -0,0 +1,51 @@
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from app.config import get_settings
+from app.monitoring.metrics import CACHE_REQUESTS
+
+settings = get_settings()
+
+
+class Principal(NamedTuple):
+    """Authorization facts of a user, without the full User row"""
+    user_id: int
+    is_admin: bool
+    is_active: bool
+
+
+class PrincipalCache:
+    """
+    Cache (is_admin, is_active) theo user_id cho router /admin, TTL ngắn.
+    AdminService.update_user_status invalidate ngay trên worker hiện tại; worker
+    khác thấy promote/ban chậm nhất ``ttl`` giây.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[int, Tuple[Principal, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[1] > time.monotonic():
+            CACHE_REQUESTS.labels("principal", "hit").inc()
+            return entry[0]
+        CACHE_REQUESTS.labels("principal", "miss").inc()
+        return None
+
+    def put(self, principal: Principal) -> None:
+        with self._lock:
+            now = time.monotonic()
+            # Admins are few; dropping expired entries on write keeps the dict small
+            if len(self._entries) > 1000:
+                self._entries = {uid: e for uid, e in self._entries.items() if e[1] > now}
+            self._entries[principal.user_id] = (principal, now + self.ttl)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+principal_cache = PrincipalCache(ttl=settings.ADMIN_PRINCIPAL_CACHE_TTL_SECONDS)
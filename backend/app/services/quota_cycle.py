@@ -0,0 +1,72 @@
+import logging
+import threading
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models.system_setting import QUOTA_CYCLE_KEY
+from app.repositories.system_setting_repository import SystemSettingRepository
+from app.services.subscription_service import get_quota_allocator
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class QuotaCycleWatcher:
+    """
+    Theo dõi quota cycle (system_settings ``quota_cycle``) trên mỗi worker. Job reset
+    quota chỉ chạy ở một worker; các worker khác thấy cycle đổi chậm nhất sau
+    ``refresh_interval`` giây và reset ledger/lease của mình (baseline used_quota cũ).
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], refresh_interval: float):
+        self._session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self._cycle: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name="quota-cycle-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def observe(self, cycle: Optional[str]) -> bool:
+        """Record ``cycle``; reset the local allocator if it moved on. True if it did."""
+        with self._lock:
+            previous, self._cycle = self._cycle, cycle
+            if previous is None or previous == cycle:
+                return False  # First look at the cycle: the allocator is still empty
+            allocator = get_quota_allocator()
+            if allocator is not None:
+                allocator.reset()
+        logger.info(f"Quota cycle {previous} -> {cycle}, local quota allocator reset")
+        return True
+
+    def refresh(self) -> None:
+        db = self._session_factory()
+        try:
+            cycle = SystemSettingRepository(db).get_value(QUOTA_CYCLE_KEY)
+        finally:
+            db.close()
+        self.observe(cycle)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Quota cycle refresh failed")
+
+
+quota_cycle_watcher = QuotaCycleWatcher(SessionLocal, refresh_interval=settings.QUOTA_CYCLE_REFRESH_SECONDS)
@@ -0,0 +1,213 @@
+import logging
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.monitoring.metrics import QUEUE_DEPTH
+from app.repositories.subscription_repository import AsyncSubscriptionRepository, SubscriptionRepository
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class _Lease:
+    __slots__ = ("units", "db_remaining", "rate", "last_seen", "renewing")
+
+    def __init__(self, now: float):
+        self.units = 0  # checked out from the DB, not yet spent
+        self.db_remaining = 0  # quota left in the DB after the last checkout
+        self.rate = 0.0  # requests/second (exponentially decayed)
+        self.last_seen = now
+        self.renewing = False
+
+    def touch(self, now: float, count: int, tau: float) -> None:
+        self.rate = self.rate * math.exp(-(now - self.last_seen) / tau) + count / tau
+        self.last_seen = now
+
+
+class QuotaLeaseManager:
+    """
+    Quota lease cho deploy nhiều node dùng chung DB.
+
+    Node check out một block N lượt bằng 1 câu UPDATE atomic (reserve_quota), tiêu
+    trong RAM và gia hạn ở background khi block còn dưới 1/4. Kích thước block
+    theo tốc độ request của từng subscription (``rate * target_seconds``, kẹp trong
+    [min_units, max_units]) nên user bận hiếm khi chạm DB, user rảnh gần như không
+    giữ gì. Lease không dùng quá ``ttl`` giây và lúc shutdown sẽ trả lại lượt thừa.
+    Không bao giờ vượt monthly_quota vì mọi lượt đều được trừ trong DB trước.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], target_seconds: float,
+                 min_units: int, max_units: int, ttl: float, tick: float = 1.0):
+        self._session_factory = session_factory
+        self.target_seconds = target_seconds
+        self.min_units = min_units
+        self.max_units = max_units
+        self.ttl = ttl
+        self.tick = tick
+        self._leases: Dict[int, _Lease] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="quota-lease", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop renewing and hand every unspent unit back to the DB"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            leftovers = [(sid, lease.units) for sid, lease in self._leases.items() if lease.units > 0]
+            self._leases.clear()
+        self._return(leftovers)
+
+    def try_reserve(self, subscription_id: int, monthly_quota: int, used_quota: int,
+                    count: int = 1) -> Optional[int]:
+        """
+        Tiêu quota từ lease (checkout block mới nếu hết). Trả về quota còn lại
+        (ước tính), hoặc None nếu DB không đủ cho block -> caller giữ chỗ chính xác.
+        """
+        lease, remaining, size = self._spend(subscription_id, count)
+        if remaining is not None or not size:
+            return remaining
+        return self._credit(lease, size, self._checkout(subscription_id, size + count))
+
+    async def try_reserve_async(self, repo: AsyncSubscriptionRepository, subscription_id: int,
+                                monthly_quota: int, used_quota: int, count: int = 1) -> Optional[int]:
+        """try_reserve cho async endpoint: checkout qua AsyncSubscriptionRepository, không block event loop"""
+        lease, remaining, size = self._spend(subscription_id, count)
+        if remaining is not None or not size:
+            return remaining
+        return self._credit(lease, size, await repo.reserve_quota(subscription_id, size + count))
+
+    def _spend(self, subscription_id: int, count: int) -> Tuple[_Lease, Optional[int], int]:
+        """(lease, remaining, 0) if served from the lease, else (lease, None, block size to check out)"""
+        now = time.monotonic()
+        with self._lock:
+            lease = self._leases.get(subscription_id)
+            if lease is None:
+                lease = self._leases[subscription_id] = _Lease(now)
+            lease.touch(now, count, self.target_seconds)
+            if lease.units >= count:
+                lease.units -= count
+                if lease.units < self._lease_size(lease) // 4 and not lease.renewing:
+                    lease.renewing = True
+                    self._wakeup.set()
+                return lease, lease.db_remaining + lease.units, 0
+            # size 0 = idle subscription: a plain reservation is exactly one checkout
+            return lease, None, self._lease_size(lease)
+
+    def _credit(self, lease: _Lease, size: int, remaining: Optional[int]) -> Optional[int]:
+        """Add a block checked out for ``size`` units (plus the caller's) to ``lease``"""
+        if remaining is None:
+            return None
+        with self._lock:
+            lease.units += size
+            lease.db_remaining = remaining
+            return remaining + lease.units
+
+    def refund(self, subscription_id: int, count: int = 1) -> bool:
+        """Units refunded by a failed request go back into the local lease"""
+        with self._lock:
+            lease = self._leases.get(subscription_id)
+            if lease is None:
+                return False
+            lease.units += count
+            return True
+
+    def reset(self) -> None:
+        """Drop leases without returning them (used_quota was just reset to 0)"""
+        with self._lock:
+            self._leases.clear()
+
+    def usage_delta(self, subscription_id: int) -> int:
+        """Real usage minus the DB used_quota: units leased by this worker but not spent yet"""
+        with self._lock:
+            lease = self._leases.get(subscription_id)
+            return -lease.units if lease else 0
+
+    def leased_total(self) -> int:
+        with self._lock:
+            return sum(lease.units for lease in self._leases.values())
+
+    def _lease_size(self, lease: _Lease) -> int:
+        size = math.ceil(lease.rate * self.target_seconds)
+        return max(self.min_units, min(self.max_units, size))
+
+    def _checkout(self, subscription_id: int, units: int) -> Optional[int]:
+        db = self._session_factory()
+        try:
+            return SubscriptionRepository(db).reserve_quota(subscription_id, units)
+        finally:
+            db.close()
+
+    def _return(self, leftovers: List[Tuple[int, int]]) -> None:
+        if not leftovers:
+            return
+        db = self._session_factory()
+        try:
+            repo = SubscriptionRepository(db)
+            for subscription_id, units in leftovers:
+                repo.refund_quota(subscription_id, units)
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(self.tick)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self._renew()
+                self._expire()
+            except Exception:
+                logger.exception("Quota lease maintenance failed")
+            QUEUE_DEPTH.labels("quota_leased").set(self.leased_total())
+
+    def _renew(self) -> None:
+        with self._lock:
+            wanted = [(sid, self._lease_size(lease)) for sid, lease in self._leases.items() if lease.renewing]
+        stranded = []
+        for subscription_id, size in wanted:
+            remaining = self._checkout(subscription_id, size) if size else None
+            with self._lock:
+                lease = self._leases.get(subscription_id)
+                if lease is None:
+                    # Expired or reset meanwhile; don't strand what we just took
+                    if remaining is not None:
+                        stranded.append((subscription_id, size))
+                    continue
+                lease.renewing = False
+                if remaining is not None:
+                    lease.units += size
+                    lease.db_remaining = remaining
+        self._return(stranded)
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        with self._lock:
+            idle = [sid for sid, lease in self._leases.items() if lease.last_seen < cutoff]
+            leftovers = [(sid, self._leases.pop(sid).units) for sid in idle]
+        self._return([(sid, units) for sid, units in leftovers if units > 0])
+
+
+quota_lease_manager = QuotaLeaseManager(
+    SessionLocal,
+    target_seconds=settings.QUOTA_LEASE_TARGET_SECONDS,
+    min_units=settings.QUOTA_LEASE_MIN_UNITS,
+    max_units=settings.QUOTA_LEASE_MAX_UNITS,
+    ttl=settings.QUOTA_LEASE_TTL_SECONDS,
+)
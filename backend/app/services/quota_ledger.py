@@ -0,0 +1,245 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import bindparam, case, select, update
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models.subscription import Subscription
+from app.models.system_setting import QUOTA_CYCLE_KEY, QUOTA_RESET_PROGRESS_KEY, SystemSetting
+from app.repositories.subscription_repository import AsyncSubscriptionRepository
+from app.monitoring.metrics import QUEUE_DEPTH
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("monthly_quota", "db_used", "pending", "in_flight", "last_used")
+
+    def __init__(self, monthly_quota: int, db_used: int):
+        self.monthly_quota = monthly_quota
+        self.db_used = db_used
+        self.pending = 0  # consumed locally, not yet written
+        self.in_flight = 0  # being written by the current flush
+        self.last_used = time.monotonic()
+
+    def used(self) -> int:
+        return self.db_used + self.in_flight + self.pending
+
+
+class QuotaLedger:
+    """
+    Write-behind quota counters cho các subscription có quota lớn (PLUS/PRO).
+
+    Quota được trừ trong RAM và cộng dồn vào subscriptions.used_quota bằng một
+    câu UPDATE batch mỗi ``flush_interval`` giây (hoặc sớm hơn khi một subscription
+    tích đủ ``max_pending // 2`` lượt) và khi shutdown. Subscription còn ít hơn
+    ``safety_margin`` lượt thì ledger từ chối để caller giữ chỗ trực tiếp trong DB
+    (chính xác tuyệt đối gần giới hạn).
+
+    Overshoot tối đa khi nhiều worker dùng chung subscription:
+    workers * max_pending - safety_margin (<= 0 với cấu hình mặc định tới 10 worker).
+
+    Delta tích trước lần reset quota tháng không được cộng vào cycle mới: flush bỏ
+    batch nếu quota cycle trong DB đã đổi (kể cả khi reset mới chạy dở).
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], flush_interval: float,
+                 max_pending: int, safety_margin: int, idle_ttl: float = 600.0):
+        self._session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.safety_margin = safety_margin
+        self.idle_ttl = idle_ttl
+        self._entries: Dict[int, _Entry] = {}
+        self._cycle: Optional[str] = None  # Quota cycle the pending deltas belong to
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="quota-ledger-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flusher and write out everything still pending"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def try_reserve(self, subscription_id: int, monthly_quota: int, used_quota: int,
+                    count: int = 1) -> Optional[int]:
+        """
+        Trừ quota trong RAM. Trả về số quota còn lại, hoặc None nếu ledger không
+        nhận (gần hết quota / quá nhiều lượt chưa flush) -> caller giữ chỗ trong DB.
+        """
+        with self._lock:
+            entry = self._entries.get(subscription_id)
+            if entry is None:
+                # Tracked only once accepted: a DB reservation must never be refunded here
+                entry = _Entry(monthly_quota, used_quota)
+            else:
+                entry.monthly_quota = monthly_quota
+                # used_quota only grows between resets; never move the baseline back
+                entry.db_used = max(entry.db_used, used_quota)
+            if entry.pending + count > self.max_pending:
+                return None
+            remaining = entry.monthly_quota - entry.used() - count
+            if remaining < self.safety_margin:
+                return None
+            entry.pending += count
+            entry.last_used = time.monotonic()
+            self._entries[subscription_id] = entry
+            if entry.pending >= self.max_pending // 2:
+                self._wakeup.set()
+        return remaining
+
+    async def try_reserve_async(self, repo: AsyncSubscriptionRepository, subscription_id: int,
+                                monthly_quota: int, used_quota: int, count: int = 1) -> Optional[int]:
+        """try_reserve cho async endpoint (ledger chỉ chạm RAM, ``repo`` không dùng)"""
+        return self.try_reserve(subscription_id, monthly_quota, used_quota, count)
+
+    def refund(self, subscription_id: int, count: int = 1) -> bool:
+        """
+        Trả lại quota đã giữ chỗ qua ledger (delta âm, used_quota không xuống dưới 0 khi
+        flush). False nếu ledger không còn theo dõi subscription -> caller refund trong DB.
+        """
+        with self._lock:
+            entry = self._entries.get(subscription_id)
+            if entry is None:
+                return False
+            entry.pending -= count
+            return True
+
+    def reset(self) -> None:
+        """Drop baselines and unflushed deltas: they belong to the quota cycle just reset"""
+        with self._lock:
+            self._entries.clear()
+
+    def usage_delta(self, subscription_id: int) -> int:
+        """Real usage minus the DB used_quota: units consumed by this worker, not flushed yet"""
+        with self._lock:
+            entry = self._entries.get(subscription_id)
+            return entry.pending + entry.in_flight if entry else 0
+
+    def pending_total(self) -> int:
+        with self._lock:
+            return sum(entry.pending for entry in self._entries.values())
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Quota ledger flush failed, deltas kept for retry")
+
+    def flush(self) -> int:
+        """Write all pending deltas in one batched UPDATE; returns rows updated"""
+        with self._flush_lock:
+            with self._lock:
+                batch: List[dict] = []
+                for subscription_id, entry in self._entries.items():
+                    if entry.pending:
+                        entry.in_flight, entry.pending = entry.pending, 0
+                        batch.append({"sid": subscription_id, "delta": entry.in_flight})
+                self._evict_idle()
+            if not batch:
+                return 0
+
+            try:
+                fresh = self._write(batch)
+            except Exception:
+                with self._lock:
+                    for row in batch:
+                        entry = self._entries.get(row["sid"])
+                        if entry is not None:
+                            entry.pending += entry.in_flight
+                            entry.in_flight = 0
+                raise
+
+            if fresh is None:
+                logger.warning(f"Quota cycle moved to {self._cycle}, dropped {len(batch)} pre-reset ledger deltas")
+                self.reset()
+                return 0
+
+            with self._lock:
+                for row in batch:
+                    entry = self._entries.get(row["sid"])
+                    if entry is not None:
+                        entry.in_flight = 0
+                        if row["sid"] in fresh:
+                            entry.db_used, entry.monthly_quota = fresh[row["sid"]]
+            QUEUE_DEPTH.labels("quota_ledger").set(self.pending_total())
+            return len(batch)
+
+    def _write(self, batch: List[dict]) -> Optional[Dict[int, tuple]]:
+        """UPDATE the batch; None (rolled back) if the quota cycle changed since the last flush"""
+        table = Subscription.__table__
+        used = table.c.used_quota + bindparam("delta")
+        db = self._session_factory()
+        try:
+            db.execute(
+                update(table)
+                .where(table.c.id == bindparam("sid"))
+                .values(used_quota=case((used < 0, 0), else_=used)),  # Refunds never go below zero
+                batch,
+            )
+            # Read after the UPDATE: a reset chunk committing now is either seen or blocked
+            cycle = self._db_cycle(db)
+            if self._cycle and cycle != self._cycle:
+                db.rollback()
+                self._cycle = cycle
+                return None
+            self._cycle = cycle
+            # Read back totals, which include usage flushed by other workers
+            rows = db.execute(
+                select(table.c.id, table.c.used_quota, table.c.monthly_quota)
+                .where(table.c.id.in_([row["sid"] for row in batch]))
+            ).all()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return {row.id: (row.used_quota, row.monthly_quota) for row in rows}
+
+    @staticmethod
+    def _db_cycle(db: Session) -> str:
+        """Newest quota cycle in the DB, counting a reset that is still in progress"""
+        values = dict(db.execute(
+            select(SystemSetting.key, SystemSetting.value)
+            .where(SystemSetting.key.in_((QUOTA_CYCLE_KEY, QUOTA_RESET_PROGRESS_KEY)))
+        ).all())
+        in_progress = (values.get(QUOTA_RESET_PROGRESS_KEY) or "").partition(":")[0]
+        return max(values.get(QUOTA_CYCLE_KEY) or "", in_progress)
+
+    def _evict_idle(self) -> None:
+        # Caller holds self._lock
+        cutoff = time.monotonic() - self.idle_ttl
+        idle = [sid for sid, entry in self._entries.items()
+                if not entry.pending and not entry.in_flight and entry.last_used < cutoff]
+        for subscription_id in idle:
+            del self._entries[subscription_id]
+
+
+quota_ledger = QuotaLedger(
+    SessionLocal,
+    flush_interval=settings.QUOTA_LEDGER_FLUSH_INTERVAL_MS / 1000,
+    max_pending=settings.QUOTA_LEDGER_MAX_PENDING,
+    safety_margin=settings.QUOTA_LEDGER_SAFETY_MARGIN,
+)
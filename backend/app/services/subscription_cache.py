@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from app.config import get_settings
+from app.models.subscription import PlanType, Subscription, SubscriptionStatus
+from app.monitoring.metrics import CACHE_REQUESTS
+
+settings = get_settings()
+
+
+class SubscriptionSnapshot(NamedTuple):
+    """Detached copy of the resolved active subscription"""
+    id: int
+    user_id: int
+    plan: PlanType
+    status: SubscriptionStatus
+    monthly_quota: int
+    used_quota: int  # As loaded; only a baseline, the DB/ledger/lease own the live value
+    expires_at: Optional[datetime]
+
+    @classmethod
+    def from_model(cls, subscription: Subscription) -> "SubscriptionSnapshot":
+        return cls(
+            id=subscription.id,
+            user_id=subscription.user_id,
+            plan=subscription.plan,
+            status=subscription.status,
+            monthly_quota=subscription.monthly_quota,
+            used_quota=subscription.used_quota or 0,
+            expires_at=subscription.expires_at,
+        )
+
+
+class ActiveSubscriptionCache:
+    """
+    Cache subscription đang active theo user (LRU, mỗi worker một bản).
+
+    Entry hết hạn sau ``ttl`` giây hoặc đúng lúc ``expires_at`` của gói, tùy cái
+    nào tới trước, để lần đọc kế tiếp đi qua get_active_subscription và auto-downgrade.
+    purchase_plan, cancel_subscription, expiry và admin edit gọi invalidate; worker
+    khác thấy thay đổi chậm nhất ``ttl`` giây.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[SubscriptionSnapshot]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                CACHE_REQUESTS.labels("subscription", "hit").inc()
+                return entry[0]
+            if entry is not None:
+                del self._entries[user_id]
+        CACHE_REQUESTS.labels("subscription", "miss").inc()
+        return None
+
+    def peek(self, user_id: int) -> Optional[SubscriptionSnapshot]:
+        """Lookup without LRU/metrics bookkeeping (used by the rate limiter)"""
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def put(self, subscription: Subscription) -> SubscriptionSnapshot:
+        snapshot = SubscriptionSnapshot.from_model(subscription)
+        lifetime = self.ttl
+        if snapshot.expires_at is not None:
+            lifetime = min(lifetime, (snapshot.expires_at - datetime.utcnow()).total_seconds())
+        if lifetime <= 0:
+            return snapshot
+        with self._lock:
+            self._entries[snapshot.user_id] = (snapshot, time.monotonic() + lifetime)
+            self._entries.move_to_end(snapshot.user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+subscription_cache = ActiveSubscriptionCache(
+    ttl=settings.SUBSCRIPTION_CACHE_TTL_SECONDS,
+    max_entries=settings.SUBSCRIPTION_CACHE_MAX_ENTRIES,
+)
@@ -1,17 +1,27 @@
 from datetime import datetime, timedelta
 from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.config import get_settings
+from app.database import run_after_commit
 from app.repositories.user_repository import UserRepository
-from app.repositories.subscription_repository import SubscriptionRepository
+from app.repositories.subscription_repository import SubscriptionRepository, AsyncSubscriptionRepository
 from app.repositories.transaction_repository import TransactionRepository
 from app.models.subscription import Subscription, PlanType, SubscriptionStatus
 from app.models.transaction import TransactionType, TransactionStatus
+from app.services.quota_ledger import quota_ledger
+from app.services.quota_lease import quota_lease_manager
+from app.services.subscription_cache import SubscriptionSnapshot, subscription_cache
 
 settings = get_settings()
 
 
+def get_quota_allocator():
+    """Ledger/lease manager theo QUOTA_STRATEGY (None = giữ chỗ trực tiếp trong DB)"""
+    return {"lease": quota_lease_manager, "ledger": quota_ledger}.get(settings.QUOTA_STRATEGY)
+
+
 class SubscriptionService:
     """Service quản lý subscription (FREE/PLUS/PRO), check quota, mua gói"""
     
@@ -46,13 +56,41 @@ class SubscriptionService:
             # Auto-downgrade to FREE if was ACTIVE or CANCELLED
             if subscription.status in (SubscriptionStatus.ACTIVE, SubscriptionStatus.CANCELLED):
                 self.subscription_repo.update_status(subscription.id, SubscriptionStatus.EXPIRED)
-                return self.subscription_repo.create(
+                free = self.subscription_repo.create(
                     user_id=user_id, plan=PlanType.FREE,
                     monthly_quota=settings.PLAN_FREE_MONTHLY_QUOTA
                 )
+                # Own commit: quota leases/ledger reserve on the new row from other sessions
+                self.db.commit()
+                subscription_cache.invalidate(user_id)
+                return free
         
         return subscription
     
+    def get_used_quota(self, subscription: Subscription) -> int:
+        """
+        used_quota để hiển thị cho user: giá trị trong DB cộng phần ledger chưa flush,
+        trừ phần lease đã check out nhưng chưa dùng (của worker này).
+        """
+        used = subscription.used_quota or 0
+        allocator = get_quota_allocator()
+        if allocator is not None:
+            used += allocator.usage_delta(subscription.id)
+        return min(max(used, 0), subscription.monthly_quota)
+    
+    def get_active_snapshot(self, user_id: int) -> Optional[SubscriptionSnapshot]:
+        """
+        Như get_active_subscription nhưng đọc từ cache (hot path: predict, profile).
+        used_quota trong snapshot có thể cũ, dùng get_active_subscription nếu cần số thật.
+        """
+        snapshot = subscription_cache.get(user_id)
+        if snapshot is None:
+            subscription = self.get_active_subscription(user_id)
+            if subscription is None:
+                return None
+            snapshot = subscription_cache.put(subscription)
+        return snapshot
+    
     def purchase_plan(self, user_id: int, plan: str) -> Subscription:
         """Mua gói PLUS/PRO bằng credits trong ví (30 ngày)"""
         if plan not in ("plus", "pro"):
@@ -96,7 +134,8 @@ class SubscriptionService:
             description=f"Purchase {plan.upper()} plan"
         )
         
-        # Cancel current and create new subscription
+        # Cancel current and create new subscription (cache dropped once the request commits)
+        run_after_commit(self.db, lambda: subscription_cache.invalidate(user_id))
         if current_subscription:
             self.subscription_repo.update_status(current_subscription.id, SubscriptionStatus.CANCELLED)
         
@@ -119,6 +158,7 @@ class SubscriptionService:
             raise ValueError("Cannot cancel FREE plan")
         
         # Mark as cancelled - user can still use until expires_at
+        run_after_commit(self.db, lambda: subscription_cache.invalidate(user_id))
         self.subscription_repo.update_status(current_subscription.id, SubscriptionStatus.CANCELLED)
         
         return current_subscription  # Return cancelled subscription
@@ -128,16 +168,21 @@ class SubscriptionService:
         subscription = self.subscription_repo.get_active_by_user(user_id)
         if subscription and subscription.expires_at and subscription.status == SubscriptionStatus.ACTIVE:
             if subscription.expires_at < datetime.utcnow():
+                run_after_commit(self.db, lambda: subscription_cache.invalidate(user_id))
                 self.subscription_repo.update_status(subscription.id, SubscriptionStatus.EXPIRED)
     
     def check_quota(self, user_id: int) -> dict:
-        """Kiểm tra user còn quota để gọi API hay không"""
-        subscription = self.get_active_subscription(user_id)
+        """
+        Kiểm tra user còn quota để gọi API hay không. used_quota đọc từ DB (+ ledger/lease
+        của worker này), không lấy từ snapshot cache vốn có thể cũ tới SUBSCRIPTION_CACHE_TTL_SECONDS.
+        """
+        snapshot = self.get_active_snapshot(user_id)
+        subscription = self.subscription_repo.get_by_id(snapshot.id) if snapshot else None
         
         if not subscription:
             return {"allowed": False, "reason": "No active subscription", "remaining": 0}
         
-        remaining = subscription.monthly_quota - subscription.used_quota
+        remaining = subscription.monthly_quota - self.get_used_quota(subscription)
         
         return {
             "allowed": remaining > 0,
@@ -146,7 +191,113 @@ class SubscriptionService:
             **({"reason": "Quota exceeded"} if remaining <= 0 else {})
         }
     
+    def reserve_quota(self, user_id: int, count: int = 1) -> dict:
+        """
+        Giữ chỗ quota trước khi predict: check + trừ quota trong 1 câu UPDATE (atomic),
+        request đồng thời không thể vượt monthly_quota. Gọi refund_quota nếu predict lỗi.
+        """
+        subscription = self.get_active_snapshot(user_id)
+        
+        if not subscription:
+            return {"allowed": False, "reason": "No active subscription", "remaining": 0}
+        
+        subscription_id = subscription.id
+        remaining = None
+        allocator = get_quota_allocator()
+        if allocator is not None:
+            # Trừ trong RAM từ lease/ledger, chỉ chạm DB theo block (xem QuotaLeaseManager, QuotaLedger)
+            remaining = allocator.try_reserve(
+                subscription_id, subscription.monthly_quota, subscription.used_quota, count
+            )
+        via_allocator = remaining is not None
+        if remaining is None:
+            remaining = self.subscription_repo.reserve_quota(subscription_id, count)
+        if remaining is None:
+            return {"allowed": False, "reason": "Quota exceeded", "remaining": 0, "subscription_id": subscription_id,
+                    "plan": subscription.plan.value}
+        
+        return {"allowed": True, "remaining": remaining, "subscription_id": subscription_id,
+                "plan": subscription.plan.value, "via_allocator": via_allocator}
+    
+    def refund_quota(self, subscription_id: int, count: int = 1, via_allocator: bool = False):
+        """
+        Trả lại quota đã giữ chỗ khi request thất bại. ``via_allocator`` lấy từ kết quả
+        reserve_quota: chỉ trả qua lease/ledger nếu chính nó đã giữ chỗ.
+        """
+        allocator = get_quota_allocator()
+        if via_allocator and allocator is not None and allocator.refund(subscription_id, count):
+            return
+        self.subscription_repo.refund_quota(subscription_id, count)
+    
     def increment_usage(self, subscription_id: int):
         """Tăng số lần đã dùng API (dùng sau mỗi lần predict)"""
         self.subscription_repo.increment_usage(subscription_id, 1)
 
+
+class AsyncSubscriptionService:
+    """
+    Quota path của SubscriptionService trên AsyncSession (endpoint predict):
+    cùng quy tắc active/auto-downgrade, cache và allocator, nhưng không block event loop.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.subscription_repo = AsyncSubscriptionRepository(db)
+
+    async def get_active_subscription(self, user_id: int) -> Optional[Subscription]:
+        """See SubscriptionService.get_active_subscription"""
+        subscription = await self.subscription_repo.get_active_by_user(user_id)
+
+        if subscription and subscription.expires_at and subscription.expires_at < datetime.utcnow():
+            if subscription.status in (SubscriptionStatus.ACTIVE, SubscriptionStatus.CANCELLED):
+                await self.subscription_repo.update_status(subscription, SubscriptionStatus.EXPIRED)
+                free = await self.subscription_repo.create(
+                    user_id=user_id, plan=PlanType.FREE,
+                    monthly_quota=settings.PLAN_FREE_MONTHLY_QUOTA
+                )
+                await self.db.commit()
+                subscription_cache.invalidate(user_id)
+                return free
+
+        return subscription
+
+    async def get_active_snapshot(self, user_id: int) -> Optional[SubscriptionSnapshot]:
+        snapshot = subscription_cache.get(user_id)
+        if snapshot is None:
+            subscription = await self.get_active_subscription(user_id)
+            if subscription is None:
+                return None
+            snapshot = subscription_cache.put(subscription)
+        return snapshot
+
+    async def reserve_quota(self, user_id: int, count: int = 1) -> dict:
+        """See SubscriptionService.reserve_quota"""
+        subscription = await self.get_active_snapshot(user_id)
+
+        if not subscription:
+            return {"allowed": False, "reason": "No active subscription", "remaining": 0}
+
+        subscription_id = subscription.id
+        remaining = None
+        allocator = get_quota_allocator()
+        if allocator is not None:
+            # In-memory; an empty lease checks out through this request's AsyncSession
+            remaining = await allocator.try_reserve_async(
+                self.subscription_repo, subscription_id, subscription.monthly_quota, subscription.used_quota, count
+            )
+        via_allocator = remaining is not None
+        if remaining is None:
+            remaining = await self.subscription_repo.reserve_quota(subscription_id, count)
+        if remaining is None:
+            return {"allowed": False, "reason": "Quota exceeded", "remaining": 0, "subscription_id": subscription_id,
+                    "plan": subscription.plan.value}
+
+        return {"allowed": True, "remaining": remaining, "subscription_id": subscription_id,
+                "plan": subscription.plan.value, "via_allocator": via_allocator}
+
+    async def refund_quota(self, subscription_id: int, count: int = 1, via_allocator: bool = False):
+        """See SubscriptionService.refund_quota"""
+        allocator = get_quota_allocator()
+        if via_allocator and allocator is not None and allocator.refund(subscription_id, count):
+            return
+        await self.subscription_repo.refund_quota(subscription_id, count)
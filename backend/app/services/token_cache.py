@@ -0,0 +1,111 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, FrozenSet, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.monitoring.metrics import CACHE_REQUESTS
+from app.repositories.user_repository import UserRepository
+from app.services.auth_service import decode_access_claims
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class VerifiedTokenCache:
+    """
+    LRU sha256(token) -> (user_id, exp) cho các JWT đã verify, để mỗi request
+    không phải verify HMAC lại cùng một token 7 ngày. Token hết hạn bị coi là miss
+    (và verify lại sẽ fail như bình thường).
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def verify(self, token: str) -> Optional[int]:
+        digest = hashlib.sha256(token.encode("utf-8")).digest()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(digest)
+                CACHE_REQUESTS.labels("auth_token", "hit").inc()
+                return entry[0]
+        CACHE_REQUESTS.labels("auth_token", "miss").inc()
+
+        claims = decode_access_claims(token)
+        if claims is None:
+            return None
+        user_id, exp = claims
+        if exp is not None:
+            with self._lock:
+                self._entries[digest] = (user_id, float(exp))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return user_id
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RevocationList:
+    """
+    Tập user bị khóa (is_active = 0), đọc lại từ DB mỗi ``refresh_interval`` giây
+    ở background thay vì query mỗi request. Admin khóa/mở user trên worker này có
+    hiệu lực ngay (revoke/restore); worker khác chậm nhất một chu kỳ refresh.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], refresh_interval: float):
+        self._session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self._revoked: FrozenSet[int] = frozenset()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name="revocation-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def is_revoked(self, user_id: int) -> bool:
+        return user_id in self._revoked
+
+    def revoke(self, user_id: int) -> None:
+        self._revoked = self._revoked | {user_id}
+
+    def restore(self, user_id: int) -> None:
+        self._revoked = self._revoked - {user_id}
+
+    def refresh(self) -> None:
+        db = self._session_factory()
+        try:
+            # Swapped atomically: readers never see a half-built set
+            self._revoked = frozenset(UserRepository(db).get_inactive_ids())
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Revocation list refresh failed, keeping the previous list")
+
+
+token_cache = VerifiedTokenCache(max_entries=settings.AUTH_TOKEN_CACHE_SIZE)
+revoked_users = RevocationList(SessionLocal, refresh_interval=settings.AUTH_REVOCATION_REFRESH_SECONDS)
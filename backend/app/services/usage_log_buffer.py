@@ -0,0 +1,326 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Deque, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+
+from app.config import get_settings
+from app.database import BACKEND_ROOT, engine
+from app.models.prediction_event import PredictionEvent
+from app.models.system_setting import SystemSetting
+from app.models.usage_log import UsageLog
+from app.monitoring.metrics import QUEUE_DEPTH
+from app.services.usage_rollup import run_rollup
+from app.services.user_stats import record_prediction_stats
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+REPLAY_KEY_PREFIX = "usage_spill_replay:"  # + digest of the file's first line -> byte offset replayed
+
+_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class UsageLogBuffer:
+    """
+    Write-behind cho usage_logs: predict chỉ append event vào buffer trong RAM
+    (không chạm DB), thread nền ghi cả batch bằng một INSERT executemany mỗi
+    ``flush_interval`` giây hoặc khi đủ ``max_batch`` event, và khi shutdown.
+    PredictionEvent đi kèm (nếu có) và counter thống kê của user được ghi trong
+    cùng transaction.
+
+    DB lỗi (locked, disk full, ...) thì batch được append vào file JSONL riêng
+    của worker (``<spill>.<pid>.jsonl``) và replay sau lần flush thành công kế
+    tiếp; file của worker đã chết (kể cả file đang replay/đã claim dở dang)
+    được worker khác nhận lúc start. Offset đã replay được lưu trong cùng
+    transaction với mỗi chunk nên replay bị ngắt không ghi lặp; dòng hỏng (worker
+    chết giữa lúc ghi) được chuyển sang ``<spill>.corrupt``.
+    Buffer giữ tối đa ``max_buffered`` event: khi thread flush bị kẹt trên DB,
+    event cũ nhất bị bỏ (có log) thay vì để RAM tăng mãi.
+    Log xuất hiện trong DB/statistics chậm tối đa ~``flush_interval`` giây.
+    """
+
+    def __init__(self, bind: Engine, spill_path: Path, flush_interval: float,
+                 max_batch: int, max_buffered: int,
+                 after_insert: Optional[Callable[[int], object]] = None):
+        self._bind = bind
+        self._after_insert = after_insert  # Usage rollups, after the INSERT commits (best-effort)
+        self.spill_path = spill_path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_buffered = max_buffered
+        self._rows: Deque[dict] = deque(maxlen=max_buffered)
+        self._dropped = 0  # Rows pushed out of the full buffer since the last warning
+        self._last_drop_log = 0.0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._spill_lock = threading.Lock()  # Appends vs. claiming the file for replay
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._spill_name = re.compile(
+            rf"{re.escape(spill_path.stem)}\.(\d+){re.escape(spill_path.suffix)}"
+            r"(?:\.claimed-by-(\d+))?(?:\.replaying)?"
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        self._claim_orphaned_spills()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="usage-log-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flusher and write out (or spill) everything still buffered"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+
+    def record(self, user_id: int, endpoint: str, method: str, status_code: Optional[int] = None,
+               response_time_ms: Optional[float] = None, meta_data: Optional[str] = None,
+               prediction: Optional[dict] = None) -> None:
+        """Queue one usage_logs row (and its prediction_events row); never blocks on the DB"""
+        row = {
+            "user_id": user_id,
+            "endpoint": endpoint,
+            "method": method,
+            "status_code": status_code,
+            "response_time_ms": response_time_ms,
+            "meta_data": meta_data,
+            "created_at": datetime.utcnow(),
+            "prediction": prediction,  # PredictionEvent columns except user_id/created_at
+        }
+        with self._lock:
+            if len(self._rows) == self.max_buffered:
+                # Flusher stuck on the DB: the deque drops the oldest row on append
+                self._dropped += 1
+            self._rows.append(row)
+            buffered = len(self._rows)
+            dropped = self._dropped
+            now = time.monotonic()
+            if dropped and now - self._last_drop_log >= 60:
+                self._dropped, self._last_drop_log = 0, now
+            else:
+                dropped = 0
+        if buffered >= self.max_batch:
+            self._wakeup.set()
+        if dropped:
+            logger.error(f"Usage log buffer full ({self.max_buffered} rows), dropped the {dropped} oldest")
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def flush(self) -> int:
+        """Insert everything buffered; spills to disk if the DB write fails. Returns rows written."""
+        with self._flush_lock:
+            with self._lock:
+                rows = list(self._rows)
+                self._rows.clear()
+            QUEUE_DEPTH.labels("usage_log_buffer").set(0)
+            if not rows:
+                return 0
+            written = 0
+            for start in range(0, len(rows), self.max_batch):
+                batch = rows[start:start + self.max_batch]
+                try:
+                    self._insert(batch)
+                    written += len(batch)
+                except Exception as e:
+                    logger.error(f"Usage log flush of {len(batch)} rows failed, spilling to disk: {e}")
+                    self._spill(rows[start:])
+                    return written
+            self._replay(self._own_spill())
+            return written
+
+    def _insert(self, rows: List[dict], progress: Optional[Callable[[Connection], None]] = None) -> None:
+        logs = [{k: v for k, v in row.items() if k != "prediction"} for row in rows]
+        events = [
+            {**row["prediction"], "user_id": row["user_id"], "created_at": row["created_at"]}
+            for row in rows if row.get("prediction")
+        ]
+        with self._bind.begin() as conn:
+            conn.execute(insert(UsageLog.__table__), logs)  # executemany
+            if events:
+                conn.execute(insert(PredictionEvent.__table__), events)
+                record_prediction_stats(conn, events)
+            if progress is not None:
+                progress(conn)
+        if self._after_insert is not None:
+            # Analytics must never roll back (and re-spill) the logs; the usage_rollup job catches up
+            try:
+                self._after_insert(len(rows))
+            except Exception as e:
+                logger.warning(f"Usage rollup after flush failed, left to the usage_rollup job: {e}")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Usage log flusher error: {e}")
+            QUEUE_DEPTH.labels("usage_log_buffer").set(self.pending())
+
+    # --- spill file -----------------------------------------------------
+
+    def _own_spill(self) -> Path:
+        return self.spill_path.with_name(f"{self.spill_path.stem}.{os.getpid()}{self.spill_path.suffix}")
+
+    def _spill(self, rows: List[dict]) -> None:
+        with self._spill_lock, open(self._own_spill(), "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps({**row, "created_at": row["created_at"].isoformat()}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _replay(self, path: Path) -> None:
+        """
+        Insert the rows of a spill file chunk by chunk, saving the byte offset reached
+        in each chunk's transaction: a replay cut short resumes after the last committed
+        chunk. Unparsable lines go to the corrupt file; rows that fail to insert go
+        back to our own spill file.
+        """
+        replaying = path.with_name(f"{path.name}.replaying")
+        with self._spill_lock:
+            if not path.exists():
+                return
+            os.replace(path, replaying)  # New spills start a fresh file meanwhile
+        with open(replaying, "rb") as f:
+            data = f.read()
+        # Keyed by content, not name: the file is renamed when another worker claims it
+        key = REPLAY_KEY_PREFIX + hashlib.sha256(data.split(b"\n", 1)[0]).hexdigest()[:32]
+        offset = self._replay_offset(key)
+        rows, corrupt = self._parse_spill(data, offset)
+        if corrupt:
+            logger.error(f"{len(corrupt)} unreadable lines in {path.name}, moved to {self._corrupt_path().name}")
+            with open(self._corrupt_path(), "ab") as f:
+                f.writelines(line + b"\n" for line in corrupt)
+        start = 0
+        try:
+            for start in range(0, len(rows), self.max_batch):
+                chunk = rows[start:start + self.max_batch]
+                self._insert([row for row, _ in chunk], progress=lambda conn: self._save_offset(conn, key, chunk[-1][1]))
+        except Exception as e:
+            logger.error(f"Replaying {path.name} failed, will retry: {e}")
+            self._spill([row for row, _ in rows[start:]])
+        else:
+            logger.info("Replayed %d spilled usage log rows from %s", len(rows), path.name)
+        replaying.unlink()
+        try:
+            with self._bind.begin() as conn:
+                conn.execute(delete(SystemSetting.__table__).where(SystemSetting.__table__.c.key == key))
+        except Exception as e:
+            # Harmless leftover: the key only matches a file with this exact first line
+            logger.warning(f"Could not clear the replay offset of {path.name}: {e}")
+
+    def _corrupt_path(self) -> Path:
+        return self.spill_path.with_name(f"{self.spill_path.name}.corrupt")
+
+    @staticmethod
+    def _parse_spill(data: bytes, offset: int) -> Tuple[List[Tuple[dict, int]], List[bytes]]:
+        """(row, end offset of its line) for every line after ``offset``, plus the unparsable lines"""
+        rows, corrupt = [], []
+        position = offset
+        for line in data[offset:].splitlines(keepends=True):
+            position += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+                row["created_at"] = datetime.fromisoformat(row["created_at"])
+            except (ValueError, KeyError, TypeError):
+                corrupt.append(line)  # e.g. half-written by a worker that died mid-spill
+                continue
+            rows.append((row, position))
+        return rows, corrupt
+
+    def _replay_offset(self, key: str) -> int:
+        table = SystemSetting.__table__
+        with self._bind.connect() as conn:
+            value = conn.execute(select(table.c.value).where(table.c.key == key)).scalar()
+        return int(value or 0)
+
+    @staticmethod
+    def _save_offset(conn: Connection, key: str, offset: int) -> None:
+        stmt = _INSERTS[conn.dialect.name](SystemSetting.__table__).values(
+            key=key, value=str(offset), description="Usage log spill file: bytes already replayed"
+        )
+        conn.execute(stmt.on_conflict_do_update(index_elements=["key"], set_={"value": str(offset)}))
+
+    def _claim_orphaned_spills(self) -> None:
+        """
+        Adopt spill files left by dead workers (atomic rename: one claimer wins):
+        ``<spill>.<pid>.jsonl`` plus the ``.replaying`` / ``.claimed-by-<pid>``
+        files of a replay that died halfway. Owner is the last pid in the name;
+        ours only counts for the plain file (we have not started a replay yet).
+        """
+        pattern = f"{self.spill_path.stem}.*{self.spill_path.suffix}*"
+        me = os.getpid()
+        for path in sorted(self.spill_path.parent.glob(pattern)):
+            match = self._spill_name.fullmatch(path.name)
+            if match is None:
+                continue
+            writer, claimer = match.groups()
+            owner = int(claimer or writer)
+            in_replay = claimer is not None or path.name.endswith(".replaying")
+            if (owner == me and not in_replay) or (owner != me and _pid_alive(owner)):
+                continue
+            base = f"{self.spill_path.stem}.{writer}{self.spill_path.suffix}"
+            claimed = path.with_name(f"{base}.claimed-by-{me}")
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                continue  # Another worker claimed it first
+            try:
+                with self._flush_lock:
+                    self._replay(claimed)
+            except Exception:
+                # Never block startup on one bad file; it is claimed again next boot
+                logger.exception(f"Replaying orphaned spill file {path.name} failed")
+
+def _spill_path() -> Path:
+    path = Path(settings.USAGE_LOG_SPILL_PATH)
+    return path if path.is_absolute() else BACKEND_ROOT / path
+
+
+usage_log_buffer = UsageLogBuffer(
+    engine,
+    spill_path=_spill_path(),
+    flush_interval=settings.USAGE_LOG_FLUSH_INTERVAL_SECONDS,
+    max_batch=settings.USAGE_LOG_FLUSH_BATCH,
+    max_buffered=settings.USAGE_LOG_MAX_BUFFERED,
+    # Headroom for rows written by other paths since the last flush; the job covers the rest
+    after_insert=lambda inserted: run_rollup(engine, inserted + settings.JOB_BATCH_SIZE),
+)
@@ -0,0 +1,152 @@
+"""Incremental usage_logs rollups (per day and per hour) for admin analytics.
+
+usage_logs rows with id above a watermark (system_settings key
+``usage_rollup_last_id``) are aggregated and upserted into the rollup tables,
+and the watermark advances in the same transaction, so every row is counted
+exactly once. Runs right after each UsageLogBuffer flush (own transaction,
+best-effort, once the logs are committed) and from the ``usage_rollup`` job, which also covers rows written
+by other paths and backfills history in chunks. The analytics sketches
+(app.services.analytics_sketches) are updated in the same step.
+"""
+import json
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Table, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+
+from app.models.system_setting import SystemSetting
+from app.models.usage_log import UsageLog
+from app.models.usage_rollup import ALL_CATEGORIES, UsageDailyRollup, UsageHourlyRollup
+from app.services.analytics_sketches import update_sketches
+
+WATERMARK_KEY = "usage_rollup_last_id"
+UNKNOWN_PLAN = "unknown"
+
+_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def parse_meta(meta_data: Optional[str]) -> dict:
+    try:
+        meta = json.loads(meta_data) if meta_data else {}
+    except ValueError:
+        return {}
+    return meta if isinstance(meta, dict) else {}
+
+
+def prediction_outcome(meta: dict) -> Tuple[bool, List[str]]:
+    """
+    (blocked, detected classes) of a predict usage_logs row. ``active`` (detected
+    classes) is the reliable signal; rows written before it only have ``blocked``,
+    which was stored inverted (``not active``) and carries no classes.
+    """
+    if "active" in meta:
+        active = meta["active"] or []
+        return bool(active), list(active) if isinstance(active, list) else []
+    if "blocked" in meta:
+        return not meta["blocked"], []
+    return False, []
+
+
+def event_dimensions(meta_data: Optional[str]) -> Tuple[str, bool, List[str]]:
+    """(plan, blocked, detected classes) of a usage_logs row"""
+    meta = parse_meta(meta_data)
+    blocked, detected = prediction_outcome(meta)
+    return meta.get("plan") or UNKNOWN_PLAN, blocked, detected
+
+
+def upsert_counts(conn: Connection, table: Table, key_columns: Tuple[str, ...], counts: Dict[tuple, int],
+                  column: str = "requests") -> None:
+    """INSERT ... ON CONFLICT DO UPDATE ``column = column + excluded.column`` for each key"""
+    if not counts:
+        return
+    stmt = _INSERTS[conn.dialect.name](table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key_columns),
+        set_={column: table.c[column] + stmt.excluded[column]},
+    )
+    conn.execute(stmt, [{**dict(zip(key_columns, key)), column: n} for key, n in counts.items()])
+
+
+def _set_watermark(conn: Connection, last_id: int) -> None:
+    table = SystemSetting.__table__
+    stmt = _INSERTS[conn.dialect.name](table).values(
+        key=WATERMARK_KEY, value=str(last_id), description="Last usage_logs.id folded into the usage rollups"
+    )
+    conn.execute(stmt.on_conflict_do_update(index_elements=["key"], set_={"value": str(last_id)}))
+
+
+def aggregate(rows: Iterable) -> Tuple[Counter, Counter]:
+    """Daily and hourly counts keyed by (bucket, endpoint, plan, blocked, category)"""
+    daily, hourly = Counter(), Counter()
+    for row in rows:
+        plan, blocked, categories = event_dimensions(row.meta_data)
+        created_at: datetime = row.created_at
+        day, hour = created_at.date(), created_at.replace(minute=0, second=0, microsecond=0)
+        for category in [ALL_CATEGORIES, *categories]:
+            daily[(day, row.endpoint, plan, blocked, category)] += 1
+            hourly[(hour, row.endpoint, plan, blocked, category)] += 1
+    return daily, hourly
+
+
+def rollup_usage_logs(conn: Connection, max_rows: int) -> int:
+    """
+    Fold up to ``max_rows`` not-yet-rolled-up usage_logs rows into the rollups.
+    Does not commit. The caller's transaction must already hold the write lock
+    when the watermark is read (rollup_transaction): with_for_update only locks
+    on PostgreSQL. Returns rows folded.
+    """
+    settings_table = SystemSetting.__table__
+    watermark = conn.execute(
+        select(settings_table.c.value).where(settings_table.c.key == WATERMARK_KEY).with_for_update()
+    ).scalar()
+    last_id = int(watermark or 0)
+
+    logs = UsageLog.__table__
+    rows = conn.execute(
+        select(logs.c.id, logs.c.user_id, logs.c.endpoint, logs.c.created_at, logs.c.response_time_ms,
+               logs.c.meta_data)
+        .where(logs.c.id > last_id)
+        .order_by(logs.c.id)
+        .limit(max_rows)
+    ).all()
+    if not rows:
+        return 0
+
+    daily, hourly = aggregate(rows)
+    upsert_counts(conn, UsageDailyRollup.__table__, ("day", "endpoint", "plan", "blocked", "category"), daily)
+    upsert_counts(conn, UsageHourlyRollup.__table__, ("hour", "endpoint", "plan", "blocked", "category"), hourly)
+    update_sketches(conn, rows)
+    _set_watermark(conn, rows[-1].id)
+    return len(rows)
+
+
+@contextmanager
+def rollup_transaction(bind: Engine) -> Iterator[Connection]:
+    """
+    Write transaction for rollup_usage_logs. On SQLite it starts with BEGIN IMMEDIATE:
+    a deferred transaction that reads the watermark first fails with SQLITE_BUSY_SNAPSHOT
+    (not retried by busy_timeout) when another writer commits before its first write.
+    """
+    if bind.dialect.name != "sqlite":
+        with bind.begin() as conn:
+            yield conn
+        return
+    # Driver-level autocommit so BEGIN/COMMIT are ours (pysqlite would defer BEGIN to the first write)
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+        conn.exec_driver_sql("COMMIT")
+
+
+def run_rollup(bind: Engine, max_rows: int) -> int:
+    """rollup_usage_logs in its own write transaction; returns rows folded"""
+    with rollup_transaction(bind) as conn:
+        return rollup_usage_logs(conn, max_rows)
@@ -7,7 +7,6 @@ from app.models.subscription import PlanType
 from app.models.user import User
 from app.repositories.user_repository import UserRepository
 from app.repositories.user_settings_repository import UserSettingsRepository
-from app.repositories.usage_log_repository import UsageLogRepository
 from app.schemas.user import (
     UserProfile,
     UserProfileUpdate,
@@ -16,6 +15,7 @@ from app.schemas.user import (
     UserStatistics,
 )
 from app.services.subscription_service import SubscriptionService
+from app.services.user_stats import read_user_stats
 
 
 class UserService:
@@ -42,7 +42,6 @@ class UserService:
         self.db = db
         self.user_repo = UserRepository(db)
         self.settings_repo = UserSettingsRepository(db)
-        self.usage_log_repo = UsageLogRepository(db)
         self.subscription_service = SubscriptionService(db)
 
     def _merge_settings(self, raw_settings) -> dict:
@@ -73,7 +72,7 @@ class UserService:
         return settings
 
     def _build_profile(self, user: User) -> UserProfile:
-        subscription = self.subscription_service.get_active_subscription(user.id)
+        subscription = self.subscription_service.get_active_snapshot(user.id)
         plan_type = subscription.plan.value if subscription else PlanType.FREE.value
         plan_label = {
             PlanType.FREE.value: "Free",
@@ -122,8 +121,7 @@ class UserService:
         if "avatar" in updates:
             user.avatar = updates.get("avatar")
 
-        self.db.commit()
-        self.db.refresh(user)
+        self.db.flush()  # Surface a duplicate email here rather than at request end
         return self._build_profile(user)
 
     def get_settings(self, user_id: int) -> UserSettings:
@@ -157,16 +155,17 @@ class UserService:
         return UserSettings(**merged)
 
     def get_statistics(self, user_id: int) -> UserStatistics:
-        now = datetime.utcnow()
-        start_today = datetime(now.year, now.month, now.day)
-        start_week = now - timedelta(days=7)
-        start_month = datetime(now.year, now.month, 1)
+        today = datetime.utcnow().date()
+        start_week = today - timedelta(days=6)  # Last 7 days including today (day buckets)
+        start_month = today.replace(day=1)
 
+        # Blocked predictions from the per-user counters; byCategory uses the extension's filter keys
+        counts = read_user_stats(self.db, user_id, {"today": today, "week": start_week, "month": start_month})
         stats = UserStatistics(
-            totalBlocked=self.usage_log_repo.count_total(user_id),
-            todayBlocked=self.usage_log_repo.count_by_user_in_period(user_id, start_today),
-            weeklyBlocked=self.usage_log_repo.count_by_user_in_period(user_id, start_week),
-            monthlyBlocked=self.usage_log_repo.count_by_user_in_period(user_id, start_month),
-            byCategory={"sensitive": 0, "violence": 0, "toxicity": 0, "vice": 0},
+            totalBlocked=counts["total"],
+            todayBlocked=counts["periods"]["today"],
+            weeklyBlocked=counts["periods"]["week"],
+            monthlyBlocked=counts["periods"]["month"],
+            byCategory=counts["by_category"],
         )
         return stats
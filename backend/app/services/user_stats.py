@@ -0,0 +1,73 @@
+"""Per-user statistics counters (/api/user/statistics).
+
+Every blocked prediction adds 1 to the user's bucket for its UTC day and to the
+lifetime bucket (day ALL_TIME), both once for ALL_CATEGORIES and once per
+detected class. The upsert runs in the transaction that inserts the
+prediction_events row, so counters and events always agree.
+"""
+from collections import Counter
+from datetime import date
+from typing import Dict, Iterable, Sequence
+
+from sqlalchemy import or_, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models.user_stat_counter import ALL_CATEGORIES, ALL_TIME, UserStatCounter
+from app.services.usage_rollup import upsert_counts
+
+settings = get_settings()
+
+_KEY = ("user_id", "day", "category")
+
+
+def stat_increments(events: Iterable[dict], classes: Sequence[str]) -> Counter:
+    """Counter increments keyed by (user_id, day, category) for prediction_events rows"""
+    counts = Counter()
+    for event in events:
+        if not event["blocked"]:
+            continue
+        categories = [ALL_CATEGORIES] + [
+            name for i, name in enumerate(classes) if event["class_mask"] & (1 << i)
+        ]
+        day = event["created_at"].date()
+        for category in categories:
+            counts[(event["user_id"], day, category)] += 1
+            counts[(event["user_id"], ALL_TIME, category)] += 1
+    return counts
+
+
+def record_prediction_stats(conn: Connection, events: Iterable[dict]) -> None:
+    """Add prediction_events rows (as dicts) to the counters; caller owns the transaction"""
+    upsert_counts(conn, UserStatCounter.__table__, _KEY,
+                  stat_increments(events, settings.MODEL_CLASSES), column="blocked")
+
+
+def read_user_stats(db: Session, user_id: int, since: Dict[str, date]) -> dict:
+    """
+    Lifetime and per-period blocked counts of a user plus lifetime counts per
+    filter category (model classes mapped by MODEL_CLASS_CATEGORIES), from the lifetime bucket and the day buckets since the oldest period start
+    (a few dozen primary-key rows).
+    """
+    oldest = min(since.values())
+    rows = db.execute(
+        select(UserStatCounter.day, UserStatCounter.category, UserStatCounter.blocked).where(
+            UserStatCounter.user_id == user_id,
+            or_(UserStatCounter.day == ALL_TIME, UserStatCounter.day >= oldest),
+        )
+    ).all()
+    periods = dict.fromkeys(since, 0)
+    by_category = dict.fromkeys(settings.MODEL_CLASS_CATEGORIES.values(), 0)
+    total = 0
+    for day, category, blocked in rows:
+        if day == ALL_TIME:
+            if category == ALL_CATEGORIES:
+                total = blocked
+            elif category in settings.MODEL_CLASS_CATEGORIES:
+                by_category[settings.MODEL_CLASS_CATEGORIES[category]] += blocked
+        elif category == ALL_CATEGORIES:
+            for name, start in since.items():
+                if day >= start:
+                    periods[name] += blocked
+    return {"total": total, "periods": periods, "by_category": by_category}
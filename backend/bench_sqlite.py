@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark ghi SQLite: profile mặc định vs profile production (WAL + pragmas) vs single writer
+Sử dụng: python bench_sqlite.py [--threads 16] [--writes 200] [--dir /tmp]
+
+Mỗi thread ghi usage_logs như endpoint predict (một INSERT + COMMIT mỗi lượt) vào
+một file DB tạm, đo số commit/giây, latency p50/p99 và số lỗi "database is locked".
+"""
+import argparse
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.config import get_settings
+from app.database import Base, sqlite_pragmas
+from app.models import UsageLog
+from app.services.db_writer import SerializedWriter
+
+settings = get_settings()
+
+# SQLite's own defaults, what the engine ran with before the profile existed
+DEFAULT_PRAGMAS = ["PRAGMA journal_mode=DELETE", "PRAGMA synchronous=FULL"]
+
+
+def _engine(path: Path, pragmas):
+    engine = create_engine(
+        f"sqlite:///{path.as_posix()}",
+        connect_args={"check_same_thread": False},
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _apply(dbapi_connection, connection_record):
+        for pragma in pragmas:
+            dbapi_connection.execute(pragma)
+
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def _row(i: int) -> UsageLog:
+    return UsageLog(user_id=1 + i % 50, endpoint="/api/v1/predict", method="POST",
+                    status_code=200, response_time_ms=12.5, meta_data='{"blocked": false, "classes": []}')
+
+
+def _run(name: str, threads: int, writes: int, write_one) -> None:
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(tid: int):
+        local = []
+        barrier.wait()
+        for i in range(writes):
+            started = time.perf_counter()
+            try:
+                write_one(tid * writes + i)
+            except OperationalError:
+                with lock:
+                    errors[0] += 1
+                continue
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000 if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0
+    print(f"{name:<24} {len(latencies) / elapsed:>10.0f} {p50:>9.2f} {p99:>9.2f} {errors[0]:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite write throughput per engine profile")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=200, help="Writes per thread")
+    parser.add_argument("--dir", default=None, help="Directory for the scratch DB files (same disk as data/)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        print(f"{args.threads} threads x {args.writes} writes, one INSERT per write")
+        print(f"{'profile':<24} {'writes/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'locked':>7}")
+
+        for name, pragmas in (("default (DELETE/FULL)", DEFAULT_PRAGMAS), ("production (WAL)", sqlite_pragmas())):
+            engine = _engine(Path(tmp) / f"{name.split()[0]}.db", pragmas)
+            Session = sessionmaker(bind=engine)
+
+            def write_one(i, Session=Session):
+                db = Session()
+                try:
+                    db.add(_row(i))
+                    db.commit()
+                finally:
+                    db.close()
+
+            _run(name, args.threads, args.writes, write_one)
+            engine.dispose()
+
+        engine = _engine(Path(tmp) / "writer.db", sqlite_pragmas())
+        writer = SerializedWriter(sessionmaker(bind=engine), max_batch=settings.DB_WRITER_MAX_BATCH)
+        writer.start()
+        _run("production + writer", args.threads, args.writes, lambda i: writer.run(lambda db: db.add(_row(i))))
+        writer.stop()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
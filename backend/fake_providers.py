@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fake Google OAuth + MoMo server để load test login/topup offline
+Sử dụng: python fake_providers.py [--port 9100] [--latency-ms 50] [--no-ipn]
+
+Trỏ backend vào server này (.env hoặc biến môi trường):
+    GOOGLE_TOKEN_URL=http://127.0.0.1:9100/google/token
+    GOOGLE_USERINFO_URL=http://127.0.0.1:9100/google/userinfo
+    MOMO_ENDPOINT=http://127.0.0.1:9100/momo/v2/gateway/api/create
+
+Mỗi OAuth code khác nhau là một user Google khác nhau (code "u42" -> u42@fake.example.com).
+Sau mỗi lần tạo thanh toán MoMo, server gọi lại MOMO_IPN_URL với IPN đã ký
+(resultCode 0) như MoMo thật, trừ khi chạy với --no-ipn.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import time
+import uuid
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Form, Header, HTTPException, Request
+
+from app.config import get_settings
+
+settings = get_settings()
+app = FastAPI(title="Fake Google/MoMo providers")
+config = {"latency": 0.0, "ipn": True}
+
+
+async def _latency():
+    if config["latency"]:
+        await asyncio.sleep(config["latency"])
+
+
+@app.post("/google/token")
+async def google_token(code: str = Form(...), grant_type: str = Form("authorization_code")):
+    await _latency()
+    if grant_type != "authorization_code":
+        raise HTTPException(status_code=400, detail="unsupported_grant_type")
+    return {"access_token": f"fake-{code}", "token_type": "Bearer", "expires_in": 3599}
+
+
+@app.get("/google/userinfo")
+async def google_userinfo(authorization: str = Header(...)):
+    await _latency()
+    code = authorization.removeprefix("Bearer fake-")
+    return {
+        "id": hashlib.sha256(code.encode()).hexdigest()[:21],
+        "email": f"{code}@fake.example.com",
+        "name": f"Fake {code}",
+        "picture": None,
+    }
+
+
+def _sign(raw: str) -> str:
+    return hmac.new(settings.MOMO_SECRET_KEY.encode(), raw.encode(), hashlib.sha256).hexdigest()
+
+
+async def _send_ipn(payload: dict):
+    """Gọi IPN về backend giống MoMo (cùng thứ tự field ký như PaymentService.verify_ipn_signature)"""
+    await asyncio.sleep(0.2)
+    ipn = {
+        "partnerCode": payload["partnerCode"],
+        "orderId": payload["orderId"],
+        "requestId": payload["requestId"],
+        "amount": int(payload["amount"]),
+        "orderInfo": payload["orderInfo"],
+        "orderType": "momo_wallet",
+        "transId": int(time.time() * 1000),
+        "resultCode": 0,
+        "message": "Successful.",
+        "payType": "qr",
+        "responseTime": int(time.time() * 1000),
+        "extraData": payload["extraData"],
+    }
+    raw = (
+        f"accessKey={settings.MOMO_ACCESS_KEY}&amount={ipn['amount']}&extraData={ipn['extraData']}"
+        f"&message={ipn['message']}&orderId={ipn['orderId']}&orderInfo={ipn['orderInfo']}"
+        f"&orderType={ipn['orderType']}&partnerCode={ipn['partnerCode']}&payType={ipn['payType']}"
+        f"&requestId={ipn['requestId']}&responseTime={ipn['responseTime']}&resultCode={ipn['resultCode']}"
+        f"&transId={ipn['transId']}"
+    )
+    ipn["signature"] = _sign(raw)
+    try:
+        async with httpx.AsyncClient(timeout=10) as client:
+            await client.post(payload["ipnUrl"], json=ipn)
+    except httpx.HTTPError as e:
+        print(f"[WARNING] IPN to {payload['ipnUrl']} failed: {e}")
+
+
+@app.post("/momo/v2/gateway/api/create")
+async def momo_create(request: Request):
+    await _latency()
+    payload = await request.json()
+    raw = (
+        f"accessKey={settings.MOMO_ACCESS_KEY}&amount={payload['amount']}&extraData={payload['extraData']}"
+        f"&ipnUrl={payload['ipnUrl']}&orderId={payload['orderId']}&orderInfo={payload['orderInfo']}"
+        f"&partnerCode={payload['partnerCode']}&redirectUrl={payload['redirectUrl']}"
+        f"&requestId={payload['requestId']}&requestType={payload['requestType']}"
+    )
+    if not hmac.compare_digest(_sign(raw), payload.get("signature", "")):
+        return {"resultCode": 11, "message": "Signature mismatch", "orderId": payload.get("orderId")}
+    if config["ipn"]:
+        asyncio.get_running_loop().create_task(_send_ipn(payload))
+    pay_token = uuid.uuid4().hex
+    return {
+        "partnerCode": payload["partnerCode"],
+        "orderId": payload["orderId"],
+        "requestId": payload["requestId"],
+        "amount": int(payload["amount"]),
+        "responseTime": int(time.time() * 1000),
+        "message": "Successful.",
+        "resultCode": 0,
+        "payUrl": f"http://fake-momo.local/pay/{pay_token}",
+        "qrCodeUrl": f"momo://fake/{pay_token}",
+        "deeplink": f"momo://app?token={pay_token}",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Google OAuth/MoMo server for offline load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Artificial latency per provider call")
+    parser.add_argument("--no-ipn", action="store_true", help="Do not call back MOMO_IPN_URL")
+    args = parser.parse_args()
+
+    config["latency"] = args.latency_ms / 1000
+    config["ipn"] = not args.no_ipn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,9 @@
 Script chạy server FastAPI
 Sử dụng: python run.py [options]
 """
+import os
 import sys
+import shutil
 import argparse
 import uvicorn
 from pathlib import Path
@@ -110,6 +112,34 @@ def init_database():
         sys.exit(1)
 
 
+def check_indexes():
+    """Chạy migration rồi kiểm tra EXPLAIN QUERY PLAN của các query nóng (SQLite)"""
+    from app.database import engine
+    from app.migrations import check_query_plans, current_version
+    init_database()
+    print(f"[INFO] Schema version: {current_version(engine)}")
+    failed = 0
+    for check in check_query_plans(engine):
+        print(f"[{'OK' if check.ok else 'ERROR'}] {check.name}: expects {check.index}")
+        for step in check.plan:
+            print(f"       {step}")
+        failed += not check.ok
+    if failed:
+        print(f"[ERROR] {failed} query không dùng index mong đợi")
+        sys.exit(1)
+
+
+def prepare_metrics_dir(settings) -> Path:
+    """Tạo thư mục rỗng cho Prometheus multiprocess (mỗi worker ghi metrics vào đây)"""
+    metrics_dir = Path(settings.METRICS_MULTIPROC_DIR)
+    if not metrics_dir.is_absolute():
+        metrics_dir = BACKEND_ROOT / metrics_dir
+    # Xóa dữ liệu của lần chạy trước để counter không bị cộng dồn
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    return metrics_dir
+
+
 def main():
     """Main function"""
     parser = argparse.ArgumentParser(
@@ -122,6 +152,7 @@ Ví dụ:
   python run.py --reload           # Chạy với auto-reload (dev mode)
   python run.py --host 0.0.0.0     # Cho phép truy cập từ bên ngoài
   python run.py --workers 4        # Chạy với 4 workers (production)
+  python run.py --check-indexes    # Migrate + kiểm tra query plan của các query nóng
         """
     )
     
@@ -172,6 +203,12 @@ Ví dụ:
         help="Chỉ khởi tạo database rồi thoát"
     )
     
+    parser.add_argument(
+        "--check-indexes",
+        action="store_true",
+        help="Migrate, kiểm tra EXPLAIN QUERY PLAN của các query nóng rồi thoát (exit 1 nếu thiếu index)"
+    )
+    
     args = parser.parse_args()
     
     # Kiểm tra môi trường
@@ -184,6 +221,10 @@ Ví dụ:
         print("\n[OK] Xong! Database đã được khởi tạo.")
         return
     
+    if args.check_indexes:
+        check_indexes()
+        return
+    
     # Cấu hình uvicorn
     config = {
         "app": "app.main:app",
@@ -208,6 +249,8 @@ Ví dụ:
         print(f"[DOCS] Docs: http://{args.host}:{args.port}/docs")
         print("\n[TIP] Nhấn Ctrl+C để dừng server\n")
         config["workers"] = args.workers
+        # Workers kế thừa biến môi trường này -> /metrics gộp số liệu của tất cả worker
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = str(prepare_metrics_dir(get_settings()))
     
     # Single worker mode
     else:
@@ -0,0 +1,74 @@
+"""
+Shared fixtures: the real app on a throwaway SQLite database and a randomly
+initialised model file. Background threads that would issue SQL on their own
+(jobs, usage log flusher, revocation refresh) are slowed down so statement
+counts only reflect the requests under test.
+"""
+import io
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_ROOT))
+
+_TMP = Path(tempfile.mkdtemp(prefix="xdynamic-tests-"))
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_TMP / 'app.db'}",
+    "MODEL_PATH": str(_TMP / "model.pth"),
+    "USAGE_LOG_SPILL_PATH": str(_TMP / "usage_spill.jsonl"),
+    "RATE_LIMIT_SQLITE_PATH": str(_TMP / "ratelimit.db"),
+    "METRICS_MULTIPROC_DIR": str(_TMP / "metrics"),
+    "JOBS_ENABLED": "false",
+    "RATE_LIMIT_ENABLED": "false",  # Many logins from one client IP
+    "USAGE_LOG_FLUSH_INTERVAL_SECONDS": "3600",
+    "AUTH_REVOCATION_REFRESH_SECONDS": "3600",
+    "PASSWORD_BCRYPT_ROUNDS": "12",
+})
+
+
+def _write_model(path: Path) -> None:
+    import torch
+    from app.config import get_settings
+    from app.services.ml_inference_service import MultilabelMobileNetV2
+    model = MultilabelMobileNetV2(num_classes=len(get_settings().MODEL_CLASSES), pretrained=False)
+    torch.save(model.state_dict(), path)
+
+
+_write_model(_TMP / "model.pth")
+
+
+def png_bytes() -> bytes:
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 10, 10)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def predict(client, headers):
+    return client.post("/api/v1/predict", files={"file": ("x.png", png_bytes(), "image/png")}, headers=headers)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def register_and_login(client, email: str) -> dict:
+    """Authorization headers of a new user (FREE plan)"""
+    credentials = {"email": email, "password": "secret123"}
+    assert client.post("/api/auth/register", json=credentials).status_code in (200, 201)
+    response = client.post("/api/auth/login", json=credentials)
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    return register_and_login(client, "tester@example.com")
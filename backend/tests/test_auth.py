@@ -0,0 +1,28 @@
+"""Sign-up/sign-in must not run bcrypt or DB work on the event loop"""
+import asyncio
+
+from app.controllers import auth_controller
+from app.services.password_hasher import MIN_ROUNDS, PasswordHasher, calibrate_rounds, hash_rounds
+from tests.conftest import register_and_login
+
+
+def test_password_endpoints_run_in_threadpool():
+    assert not asyncio.iscoroutinefunction(auth_controller.register)
+    assert not asyncio.iscoroutinefunction(auth_controller.login)
+
+
+def test_bcrypt_cost_floor():
+    assert MIN_ROUNDS == 12
+    assert calibrate_rounds(target_seconds=0.0001) == MIN_ROUNDS
+    hasher = PasswordHasher(workers=1, max_pending=1, rounds=4, target_ms=1, use_processes=False)
+    try:
+        assert hash_rounds(hasher.hash("secret123")) == MIN_ROUNDS
+    finally:
+        hasher.stop()
+
+
+def test_register_and_login(client):
+    headers = register_and_login(client, "auth@example.com")
+    assert client.get("/api/auth/me", headers=headers).json()["email"] == "auth@example.com"
+    wrong = client.post("/api/auth/login", json={"email": "auth@example.com", "password": "nope"})
+    assert wrong.status_code == 401
@@ -0,0 +1,50 @@
+"""/api/user/statistics: frontend category keys, and history backfilled from legacy usage_logs"""
+import json
+from datetime import datetime
+
+from sqlalchemy import create_engine, func, select
+
+from app.migrations.versions import baseline, legacy_prediction_events
+from app.models.prediction_event import PredictionEvent
+from app.models.usage_log import UsageLog
+from app.models.user import User
+from app.models.user_stat_counter import ALL_CATEGORIES, ALL_TIME, UserStatCounter
+from tests.conftest import register_and_login
+
+
+def test_statistics_use_frontend_category_keys(client):
+    headers = register_and_login(client, "stats-keys@example.com")
+    data = client.get("/api/user/statistics", headers=headers).json()["data"]
+    assert set(data["byCategory"]) == {"sensitive", "violence", "toxicity", "vice"}
+
+
+def _log(user_id, meta):
+    return {"user_id": user_id, "endpoint": "/api/v1/predict", "method": "POST", "status_code": 200,
+            "created_at": datetime(2024, 1, 2, 3, 4), "meta_data": json.dumps(meta)}
+
+
+def test_backfill_from_legacy_meta_data(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        baseline(conn)
+        conn.execute(User.__table__.insert(), [{"id": 1, "email": "legacy@example.com"}])
+        conn.execute(UsageLog.__table__.insert(), [
+            # Rows logged with the inverted "blocked" flag (not active) and the full class list
+            _log(1, {"blocked": False, "classes": ["Máu me", "Vũ khí", "Chiến tranh", "Nhạy cảm"]}),
+            _log(1, {"blocked": True, "classes": ["Máu me", "Vũ khí", "Chiến tranh", "Nhạy cảm"]}),
+            # Rows logged with the inverted "blocked" flag and "active" holding the detected classes
+            _log(1, {"blocked": False, "active": ["Vũ khí", "Nhạy cảm"], "plan": "free"}),
+            _log(1, {"blocked": True, "active": [], "plan": "free"}),
+        ])
+
+    for _ in range(2):  # Idempotent
+        with engine.begin() as conn:
+            legacy_prediction_events(conn)
+
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(PredictionEvent)).scalar() == 4
+        counters = dict(conn.execute(
+            select(UserStatCounter.category, UserStatCounter.blocked)
+            .where(UserStatCounter.user_id == 1, UserStatCounter.day == ALL_TIME)
+        ).all())
+    assert counters == {ALL_CATEGORIES: 2, "Vũ khí": 1, "Nhạy cảm": 1}
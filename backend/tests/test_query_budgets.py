@@ -0,0 +1,43 @@
+"""Hot routes must stay within their QUERY_BUDGETS entry (app/monitoring/db_stats.py)"""
+import itertools
+
+import pytest
+
+from app.monitoring.db_stats import QUERY_BUDGETS, assert_query_budget
+from tests.conftest import predict, register_and_login
+
+_emails = (f"budget{i}@example.com" for i in itertools.count())
+
+GET_ROUTES = [route for route in QUERY_BUDGETS if route != "/api/v1/predict"]
+
+
+def test_every_budgeted_route_is_covered():
+    assert set(QUERY_BUDGETS) == {"/api/v1/predict", *GET_ROUTES}
+
+
+@pytest.mark.parametrize("route", GET_ROUTES)
+def test_get_route_budget_cold(client, route):
+    """First call of a new user: nothing cached yet"""
+    headers = register_and_login(client, next(_emails))
+    with assert_query_budget(route):
+        assert client.get(route, headers=headers).status_code == 200
+
+
+@pytest.mark.parametrize("route", GET_ROUTES)
+def test_get_route_budget_warm(client, auth_headers, route):
+    client.get(route, headers=auth_headers)
+    with assert_query_budget(route):
+        assert client.get(route, headers=auth_headers).status_code == 200
+
+
+def test_predict_budget_cold(client):
+    headers = register_and_login(client, next(_emails))
+    with assert_query_budget("/api/v1/predict"):
+        assert predict(client, headers).status_code == 200
+
+
+def test_predict_budget_warm(client, auth_headers):
+    predict(client, auth_headers)
+    for _ in range(3):
+        with assert_query_budget("/api/v1/predict"):
+            assert predict(client, auth_headers).status_code == 200
@@ -0,0 +1,17 @@
+"""Hot queries must be answered from their indexes (EXPLAIN QUERY PLAN, SQLite)"""
+import pytest
+
+from app.database import engine
+from app.migrations.query_plans import HOT_QUERIES, check_query_plans
+
+
+@pytest.fixture(scope="module")
+def plan_checks(client):
+    # ``client`` runs the lifespan, i.e. every migration and its indexes
+    return {check.name: check for check in check_query_plans(engine)}
+
+
+@pytest.mark.parametrize("name", [name for name, _, _ in HOT_QUERIES])
+def test_hot_query_uses_index(plan_checks, name):
+    check = plan_checks[name]
+    assert check.ok, f"{name} does not use {check.index}: {check.plan}"
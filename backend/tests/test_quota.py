@@ -0,0 +1,119 @@
+"""Quota shown to the user must match the requests actually made, whatever the allocator holds"""
+import pytest
+
+from app.config import get_settings
+from app.services.quota_lease import quota_lease_manager
+from tests.conftest import predict, register_and_login
+
+
+@pytest.mark.parametrize("strategy", ["ledger", "lease", "direct"])
+def test_reported_used_quota(client, monkeypatch, strategy):
+    monkeypatch.setattr(get_settings(), "QUOTA_STRATEGY", strategy)
+    monkeypatch.setattr(quota_lease_manager, "min_units", 5)  # Force a lease bigger than the usage
+    headers = register_and_login(client, f"quota-{strategy}@example.com")
+    for _ in range(3):
+        assert predict(client, headers).status_code == 200
+
+    current = client.get("/api/subscription/current", headers=headers).json()
+    assert current["used_quota"] == 3
+
+
+def test_check_quota_ignores_stale_snapshot(client):
+    from app.database import SessionLocal
+    from app.models.user import User
+    from app.services.subscription_service import SubscriptionService
+    headers = register_and_login(client, "quota-check@example.com")
+    client.get("/api/user/profile", headers=headers)  # Caches the snapshot (used_quota = 0)
+    for _ in range(2):
+        assert predict(client, headers).status_code == 200
+
+    with SessionLocal() as db:
+        user_id = db.query(User.id).filter(User.email == "quota-check@example.com").scalar()
+        quota = SubscriptionService(db).check_quota(user_id)
+    assert quota["allowed"]
+    assert quota["remaining"] == get_settings().PLAN_FREE_MONTHLY_QUOTA - 2
+
+
+def test_lease_refill_uses_the_async_session(client, monkeypatch):
+    def sync_checkout(*args):
+        raise AssertionError("predict checked out a lease with a sync session on the event loop")
+
+    monkeypatch.setattr(get_settings(), "QUOTA_STRATEGY", "lease")
+    monkeypatch.setattr(quota_lease_manager, "min_units", 5)
+    monkeypatch.setattr(quota_lease_manager, "_checkout", sync_checkout)
+    headers = register_and_login(client, "quota-lease-async@example.com")
+    for _ in range(7):  # Crosses a lease boundary
+        assert predict(client, headers).status_code == 200
+
+
+def _ledger_subscription(email, used_quota=0):
+    from app.database import SessionLocal
+    from app.models.subscription import PlanType, Subscription
+    from app.models.user import User
+    with SessionLocal() as db:
+        user = User(email=email)
+        db.add(user)
+        db.flush()
+        subscription = Subscription(user_id=user.id, plan=PlanType.PRO, monthly_quota=100, used_quota=used_quota)
+        db.add(subscription)
+        db.commit()
+        return subscription.id
+
+
+def _used_quota(subscription_id):
+    from app.database import SessionLocal
+    from app.models.subscription import Subscription
+    with SessionLocal() as db:
+        return db.get(Subscription, subscription_id).used_quota
+
+
+def test_ledger_refunds_only_its_own_reservations(client):
+    from app.database import SessionLocal
+    from app.models.subscription import Subscription
+    from app.services.quota_ledger import QuotaLedger
+    ledger = QuotaLedger(SessionLocal, flush_interval=3600, max_pending=10, safety_margin=5)
+    sid = _ledger_subscription("ledger-refund@example.com")
+
+    assert ledger.try_reserve(sid, 100, 97) is None  # Too close to the limit: reserved in the DB
+    assert not ledger.refund(sid)
+
+    assert ledger.try_reserve(sid, 100, 0) == 99
+    ledger.flush()
+    assert _used_quota(sid) == 1
+    with SessionLocal() as db:  # used_quota reset under the ledger
+        db.get(Subscription, sid).used_quota = 0
+        db.commit()
+    assert ledger.refund(sid)
+    ledger.flush()
+    assert _used_quota(sid) == 0  # Clamped, never negative
+
+
+def test_ledger_drops_deltas_from_before_the_reset(client):
+    from app.database import SessionLocal
+    from app.models.subscription import Subscription
+    from app.models.system_setting import QUOTA_RESET_PROGRESS_KEY
+    from app.repositories.system_setting_repository import SystemSettingRepository
+    from app.services.quota_ledger import QuotaLedger
+    ledger = QuotaLedger(SessionLocal, flush_interval=3600, max_pending=10, safety_margin=5)
+    sid = _ledger_subscription("ledger-reset@example.com")
+    with SessionLocal() as db:
+        progress = SystemSettingRepository(db).get_value(QUOTA_RESET_PROGRESS_KEY)
+        SystemSettingRepository(db).set_value(QUOTA_RESET_PROGRESS_KEY, "9999-11:0")
+        db.commit()
+    try:
+        ledger.try_reserve(sid, 100, 0)
+        ledger.flush()  # Learns the current cycle
+        ledger.try_reserve(sid, 100, 0, count=3)
+        with SessionLocal() as db:
+            # The monthly reset of the next cycle has started on another worker
+            SystemSettingRepository(db).set_value(QUOTA_RESET_PROGRESS_KEY, f"9999-12:{sid}")
+            db.get(Subscription, sid).used_quota = 0
+            db.commit()
+
+        assert ledger.flush() == 0
+        assert _used_quota(sid) == 0
+        assert ledger.usage_delta(sid) == 0
+    finally:
+        with SessionLocal() as db:
+            SystemSettingRepository(db).set_value(QUOTA_RESET_PROGRESS_KEY, progress or "")
+            db.commit()
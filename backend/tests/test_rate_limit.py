@@ -0,0 +1,64 @@
+"""Rate limit buckets: shared (SQLite) store off the event loop and failing open, IP + user checks"""
+import sqlite3
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import pytest
+
+from app.middleware.rate_limit import MemoryBucketStore, SqliteBucketStore, per_minute
+from app.middleware.rate_limit_middleware import RateLimitMiddleware
+
+
+def test_locked_store_falls_back_to_memory(tmp_path):
+    store = SqliteBucketStore(str(tmp_path / "buckets.db"), timeout=0.05)
+    limit = per_minute(60, burst=2)
+    holder = sqlite3.connect(store.path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")  # Another worker stuck holding the write lock
+    try:
+        decisions = [store.take("ip:auth:1.2.3.4", limit) for _ in range(3)]
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+    # Still throttled, by this worker's own buckets
+    assert [d.allowed for d in decisions] == [True, True, False]
+    assert store.take("ip:auth:5.6.7.8", limit).remaining == 1  # Shared store back in use
+
+
+def test_middleware_with_shared_store(tmp_path):
+    app = FastAPI()
+
+    @app.get("/api/auth/ping")
+    def ping():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, store=SqliteBucketStore(str(tmp_path / "buckets.db")))
+    with TestClient(app) as client:
+        statuses = [client.get("/api/auth/ping").status_code for _ in range(12)]
+    assert statuses[:10] == [200] * 10  # auth burst
+    assert statuses[-1] == 429
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_rejected_request_costs_no_ip_token(tmp_path, shared):
+    store = SqliteBucketStore(str(tmp_path / "buckets.db")) if shared else MemoryBucketStore()
+    ip, user = ("ip:predict:1.2.3.4", per_minute(60, burst=5)), ("user:predict:1", per_minute(60, burst=1))
+    assert all(d.allowed for d in store.take_all([ip, user]))
+
+    decisions = store.take_all([ip, user])  # Over the user's plan limit
+    assert [d.allowed for d in decisions] == [True, False]
+    assert store.take(*ip).remaining == 3  # Only the accepted request was charged
+
+
+def test_health_is_not_throttled():
+    app = FastAPI()
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    app.add_middleware(RateLimitMiddleware, store=MemoryBucketStore())
+    with TestClient(app) as client:
+        responses = [client.get("/health") for _ in range(120)]  # Above the default IP burst (100)
+    assert all(r.status_code == 200 for r in responses)
+    assert "ratelimit-limit" not in responses[0].headers
@@ -0,0 +1,39 @@
+"""The subscription cache is only invalidated once the change is committed"""
+from app.database import SessionLocal
+from app.models.subscription import PlanType, Subscription, SubscriptionStatus
+from app.models.user import User
+from app.services.subscription_cache import subscription_cache
+from tests.conftest import register_and_login
+
+
+def _committed_plans(user_id):
+    with SessionLocal() as db:
+        return {(s.plan, s.status) for s in db.query(Subscription).filter(Subscription.user_id == user_id)}
+
+
+def test_purchase_and_cancel_invalidate_after_commit(client, monkeypatch):
+    email = "cache-commit@example.com"
+    headers = register_and_login(client, email)
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.email == email).one()
+        user.credits = 10 ** 6
+        user_id = user.id
+        db.commit()
+
+    seen = []
+    invalidate = subscription_cache.invalidate
+
+    def recording_invalidate(key):
+        if key == user_id:
+            seen.append(_committed_plans(user_id))
+        invalidate(key)
+
+    monkeypatch.setattr(subscription_cache, "invalidate", recording_invalidate)
+    client.get("/api/user/profile", headers=headers)  # Cache the FREE snapshot
+    assert client.post("/api/subscription/purchase", json={"plan": "plus"}, headers=headers).status_code == 200
+    assert (PlanType.PLUS, SubscriptionStatus.ACTIVE) in seen[-1]
+    assert client.get("/api/user/profile", headers=headers).json()["data"]["planType"] == "plus"
+
+    assert client.post("/api/subscription/cancel", headers=headers).status_code == 200
+    assert (PlanType.PLUS, SubscriptionStatus.CANCELLED) in seen[-1]
+
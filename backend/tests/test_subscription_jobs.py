@@ -0,0 +1,51 @@
+"""Monthly quota reset: resumable per chunk and broadcast to every worker's allocator"""
+from datetime import datetime
+
+from app.database import SessionLocal
+from app.jobs.subscription_jobs import QUOTA_RESET_PROGRESS_KEY, current_quota_cycle, reset_monthly_quota
+from app.models.subscription import PlanType, Subscription
+from app.models.user import User
+from app.repositories.system_setting_repository import SystemSettingRepository
+from app.services import quota_cycle
+from app.services.quota_cycle import QUOTA_CYCLE_KEY, QuotaCycleWatcher
+
+
+class _Allocator:
+    resets = 0
+
+    def reset(self):
+        self.resets += 1
+
+
+def test_reset_resumes_and_is_broadcast(client, monkeypatch):
+    allocator = _Allocator()
+    monkeypatch.setattr(quota_cycle, "get_quota_allocator", lambda: allocator)
+    monkeypatch.setattr("app.jobs.subscription_jobs.quota_cycle_watcher", QuotaCycleWatcher(SessionLocal, 3600))
+    other_worker = QuotaCycleWatcher(SessionLocal, 3600)
+
+    with SessionLocal() as db:
+        user = User(email="reset-job@example.com")
+        db.add(user)
+        db.flush()
+        subscriptions = [Subscription(user_id=user.id, plan=PlanType.FREE, monthly_quota=100, used_quota=7)
+                         for _ in range(3)]
+        db.add_all(subscriptions)
+        db.flush()
+        done, pending = subscriptions[0].id, [s.id for s in subscriptions[1:]]
+        cycle = current_quota_cycle(datetime.utcnow())
+        settings_repo = SystemSettingRepository(db)
+        settings_repo.set_value(QUOTA_CYCLE_KEY, "2000-01")
+        # An earlier run of this cycle stopped after subscription ``done``
+        settings_repo.set_value(QUOTA_RESET_PROGRESS_KEY, f"{cycle}:{done}")
+        db.commit()
+    other_worker.refresh()
+
+    with SessionLocal() as db:
+        assert reset_monthly_quota(db)["cycle"] == cycle
+    with SessionLocal() as db:
+        assert db.get(Subscription, done).used_quota == 7  # Not reset twice
+        assert all(db.get(Subscription, sid).used_quota == 0 for sid in pending)
+        assert SystemSettingRepository(db).get_value(QUOTA_RESET_PROGRESS_KEY).startswith(f"{cycle}:")
+
+    other_worker.refresh()
+    assert allocator.resets == 1  # Seen by the other worker on its next refresh
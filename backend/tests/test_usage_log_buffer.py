@@ -0,0 +1,108 @@
+"""Usage log spill files: recovered after any crash, never written on the caller's thread"""
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from app.database import engine
+from app.models.usage_log import UsageLog
+from app.services.usage_log_buffer import UsageLogBuffer
+
+
+@pytest.fixture
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _buffer(tmp_path, **kwargs) -> UsageLogBuffer:
+    options = {"flush_interval": 3600, "max_batch": 100, "max_buffered": 1000, **kwargs}
+    return UsageLogBuffer(engine, spill_path=tmp_path / "spill.jsonl", **options)
+
+
+def _logs(endpoint: str) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(UsageLog).where(UsageLog.endpoint == endpoint)).scalar()
+
+
+def _spill_lines(endpoint: str, rows: int) -> str:
+    return "".join(
+        json.dumps({"user_id": 1, "endpoint": endpoint, "method": "POST", "status_code": 200,
+                    "response_time_ms": float(i), "meta_data": None,
+                    "created_at": datetime.utcnow().isoformat(), "prediction": None}) + "\n"
+        for i in range(rows)
+    )
+
+
+def _write_spill(path, endpoint: str, rows: int) -> None:
+    path.write_text(_spill_lines(endpoint, rows))
+
+
+def test_interrupted_replays_are_claimed(client, tmp_path, dead_pid):
+    _write_spill(tmp_path / f"spill.{dead_pid}.jsonl.replaying", "/spill/replaying", 2)
+    _write_spill(tmp_path / f"spill.1.jsonl.claimed-by-{dead_pid}", "/spill/claimed", 3)
+    _write_spill(tmp_path / f"spill.1.jsonl.claimed-by-{dead_pid}.replaying", "/spill/claimed-replaying", 4)
+
+    _buffer(tmp_path)._claim_orphaned_spills()
+
+    assert (_logs("/spill/replaying"), _logs("/spill/claimed"), _logs("/spill/claimed-replaying")) == (2, 3, 4)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_truncated_last_line_is_quarantined(client, tmp_path, dead_pid):
+    # Worker died in the middle of _spill: the last line is half-written
+    spill = tmp_path / f"spill.{dead_pid}.jsonl.claimed-by-{dead_pid}.replaying"
+    spill.write_text(_spill_lines("/spill/truncated", 2) + '{"user_id": 1, "endp')
+
+    buffer = _buffer(tmp_path)
+    buffer.start()  # Must not raise
+    buffer.stop()
+
+    assert _logs("/spill/truncated") == 2
+    assert (tmp_path / "spill.jsonl.corrupt").read_text() == '{"user_id": 1, "endp\n'
+    assert [p.name for p in tmp_path.iterdir()] == ["spill.jsonl.corrupt"]
+
+
+def test_replay_resumes_after_committed_chunks(client, tmp_path, dead_pid):
+    """A replay that died after committing its first chunk does not insert it again"""
+    spill = tmp_path / f"spill.{dead_pid}.jsonl.replaying"
+    _write_spill(spill, "/spill/resume", 5)
+    buffer = _buffer(tmp_path, max_batch=2)
+    real_insert = buffer._insert
+    calls = []
+
+    def crash_after_first_chunk(rows, progress=None):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise SystemExit  # Worker killed between chunks
+        real_insert(rows, progress)
+
+    buffer._insert = crash_after_first_chunk
+    with pytest.raises(SystemExit):
+        buffer._claim_orphaned_spills()
+    assert _logs("/spill/resume") == 2
+
+    leftover, = tmp_path.iterdir()
+    os.rename(leftover, tmp_path / f"spill.{dead_pid}.jsonl.replaying")  # As if claimed by a dead worker
+    _buffer(tmp_path, max_batch=2)._claim_orphaned_spills()
+    assert _logs("/spill/resume") == 5
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_full_buffer_drops_oldest_without_spilling(client, tmp_path):
+    buffer = _buffer(tmp_path, max_buffered=3)
+    for i in range(5):
+        buffer.record(user_id=1, endpoint="/spill/bounded", method="POST", response_time_ms=float(i))
+    assert buffer.pending() == 3
+    assert not buffer._own_spill().exists()  # record() never writes the file
+
+    assert buffer.flush() == 3  # Healthy DB: a plain batched insert, no spill/replay round trip
+    assert not buffer._own_spill().exists()
+    with engine.connect() as conn:
+        kept = conn.execute(select(UsageLog.response_time_ms).where(UsageLog.endpoint == "/spill/bounded")).scalars()
+        assert sorted(kept) == [2.0, 3.0, 4.0]
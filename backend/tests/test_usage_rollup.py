@@ -0,0 +1,62 @@
+"""Usage rollups run after the logs are committed, in their own (write-locked) transaction"""
+import threading
+
+from sqlalchemy import func, select
+
+from app.database import engine
+from app.models.system_setting import SystemSetting
+from app.models.usage_log import UsageLog
+from app.services.usage_log_buffer import UsageLogBuffer
+from app.services.usage_rollup import WATERMARK_KEY, rollup_transaction, run_rollup
+
+
+def _count(endpoint: str) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(UsageLog).where(UsageLog.endpoint == endpoint)).scalar()
+
+
+def test_failing_rollup_keeps_the_logs(client, tmp_path):
+    def poisoned_rollup(inserted):
+        raise ValueError("bad sketch")
+
+    buffer = UsageLogBuffer(engine, spill_path=tmp_path / "spill.jsonl", flush_interval=3600,
+                            max_batch=100, max_buffered=1000, after_insert=poisoned_rollup)
+    for _ in range(3):
+        buffer.record(user_id=1, endpoint="/rollup/poison", method="POST")
+    assert buffer.flush() == 3
+    assert _count("/rollup/poison") == 3
+    assert not buffer._own_spill().exists()
+
+    run_rollup(engine, 10 ** 6)  # The job catches up
+    with engine.connect() as conn:
+        watermark = conn.execute(select(func.max(UsageLog.id))).scalar()
+        assert conn.execute(select(SystemSetting.value).where(SystemSetting.key == WATERMARK_KEY)).scalar() == str(watermark)
+
+
+def test_rollup_transaction_holds_the_write_lock(client):
+    """A rollup that has read the watermark blocks other writers until it commits"""
+    entered, release = threading.Event(), threading.Event()
+    written = []
+
+    def rollup():
+        with rollup_transaction(engine) as conn:
+            conn.exec_driver_sql("SELECT 1")
+            entered.set()
+            release.wait(5)
+
+    def writer():
+        with engine.begin() as conn:
+            conn.execute(UsageLog.__table__.insert().values(user_id=1, endpoint="/rollup/lock", method="GET"))
+        written.append(True)
+
+    holder = threading.Thread(target=rollup)
+    holder.start()
+    assert entered.wait(5)
+    other = threading.Thread(target=writer)
+    other.start()
+    other.join(0.3)
+    assert not written  # Waiting on the lock (busy_timeout), not racing the rollup
+    release.set()
+    holder.join()
+    other.join(5)
+    assert written